@@ -0,0 +1,47 @@
+import argparse
+import json
+import sys
+from typing import Sequence
+
+# Compares two benchmarks.run reports by per-unit time:
+#   python -m benchmarks.compare baseline.json candidate.json --threshold 0.1
+# exits with status 1 when any benchmark got slower by more than the threshold.
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> tuple[list[str], bool]:
+    lines = [f"{'benchmark':<40} {'baseline us':>12} {'candidate us':>12} {'change':>8}"]
+    regressed = False
+    for name, new in candidate["results"].items():
+        old = baseline["results"].get(name)
+        if old is None or not old["per_unit_us"]:
+            lines.append(f"{name:<40} {'-':>12} {new['per_unit_us']:>12.3f} {'new':>8}")
+            continue
+        change = new["per_unit_us"] / old["per_unit_us"] - 1
+        flag = ""
+        if change > threshold:
+            flag, regressed = "  slower", True
+        elif change < -threshold:
+            flag = "  faster"
+        lines.append(f"{name:<40} {old['per_unit_us']:>12.3f} {new['per_unit_us']:>12.3f} {change:>+8.1%}{flag}")
+    if baseline["config"] != candidate["config"]:
+        lines.append("note: the runs used different configurations")
+    return lines, regressed
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    arguments = argparse.ArgumentParser(description="Compare two funnel benchmark reports")
+    arguments.add_argument("baseline")
+    arguments.add_argument("candidate")
+    arguments.add_argument("--threshold", type=float, default=0.1, help="relative slowdown counted as a regression")
+    options = arguments.parse_args(argv)
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    with open(options.candidate) as f:
+        candidate = json.load(f)
+    lines, regressed = compare(baseline, candidate, options.threshold)
+    print("\n".join(lines))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
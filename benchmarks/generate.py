@@ -0,0 +1,130 @@
+import random
+from typing import Any
+
+# Synthetic filters and rows for the benchmarks. A filter is generated once as an abstract
+# tree and rendered per row shape, so every shape is measured with the same conditions:
+#   flat     {"i0": 3, "s0": "ab", ...}                       paths "i0", "s0"
+#   nested   {"num": {"i0": 3, ...}, "text": {"s0": "ab", ...}}  paths "num.i0", "text.s0"
+#   objects  Record(num=Group(i0=3, ...), text=Group(...))     paths "num.i0", "text.s0"
+#   tuples   {"num": (3, ...), "text": ("ab", ...)}            paths "num.0", "text.0"
+# Only flat filters reference columns the SQL and Mongo backends can compile.
+
+NUMERIC = ("i0", "i1", "i2", "x0")
+TEXT = ("s0", "s1", "s2")
+SHAPES = ("flat", "nested", "objects", "tuples")
+MIXES = ("compare", "string", "mixed")
+
+_WORDS = ("alpha", "beta", "gamma", "delta", "epsilon", "ab", "abc", "bca", "cab", "")
+_COMPARE_OPS = ("eq", "ne", "gt", "lt", "ge", "le")
+_STRING_OPS = ("eq", "ne", "startswith", "endswith", "like")
+
+# ("cond", template, fields, literal) | ("bool", op, children)
+type Tree = tuple
+
+
+class Group:
+    __slots__ = NUMERIC + TEXT
+
+    def __init__(self, **values: Any):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+class Record:
+    __slots__ = ("num", "text")
+
+    def __init__(self, num: Group, text: Group):
+        self.num = num
+        self.text = text
+
+
+def _path(field: str, shape: str) -> str:
+    if shape == "flat":
+        return field
+    group, names = ("num", NUMERIC) if field in NUMERIC else ("text", TEXT)
+    return f"{group}.{names.index(field)}" if shape == "tuples" else f"{group}.{field}"
+
+
+def _literal(value: Any) -> str:
+    if value is None:
+        return "null"
+    return f"'{value}'" if isinstance(value, str) else str(value)
+
+
+def _condition(rng: random.Random, mix: str) -> Tree:
+    kind = mix if mix != "mixed" else rng.choice(("compare", "string", "null", "function"))
+    if kind == "compare":
+        return "cond", "{0} " + rng.choice(_COMPARE_OPS) + " {lit}", (rng.choice(NUMERIC),), rng.randint(0, 100)
+    if kind == "string":
+        return "cond", "{0} " + rng.choice(_STRING_OPS) + " {lit}", (rng.choice(TEXT),), rng.choice(_WORDS[:-1])
+    if kind == "null":
+        return "cond", "{0} " + rng.choice(("eq", "ne")) + " {lit}", (rng.choice(NUMERIC + TEXT),), None
+    fn = rng.choice(("length", "tolower", "toupper", "trim"))
+    if fn == "length":
+        return "cond", "length({0}) " + rng.choice(_COMPARE_OPS) + " {lit}", (rng.choice(TEXT),), rng.randint(0, 7)
+    return "cond", fn + "({0}) eq {lit}", (rng.choice(TEXT),), rng.choice(_WORDS[:-1])
+
+
+def _tree(rng: random.Random, depth: int, width: int, mix: str, op: str) -> Tree:
+    if depth == 0:
+        return _condition(rng, mix)
+    child_op = "OR" if op == "AND" else "AND"
+    return "bool", op, [_tree(rng, depth - 1, width, mix, child_op) for _ in range(width)]
+
+
+def render(tree: Tree, shape: str = "flat") -> str:
+    if tree[0] == "cond":
+        _, template, fields, literal = tree
+        return template.format(*(_path(field, shape) for field in fields), lit=_literal(literal))
+    _, op, children = tree
+    parts = [render(child, shape) if child[0] == "cond" else f"({render(child, shape)})" for child in children]
+    return f" {op} ".join(parts)
+
+
+def generate_trees(
+    n: int, *, depth: int = 2, width: int = 3, mix: str = "mixed", seed: int = 0
+) -> list[Tree]:
+    # depth 0 is a single condition; each level joins `width` subtrees, alternating AND/OR
+    if mix not in MIXES:
+        raise ValueError(f"mix must be one of {', '.join(MIXES)}")
+    rng = random.Random(seed)
+    return [_tree(rng, depth, width, mix, rng.choice(("AND", "OR"))) for _ in range(n)]
+
+
+def generate_filters(
+    n: int, *, depth: int = 2, width: int = 3, mix: str = "mixed", shape: str = "flat", seed: int = 0
+) -> list[str]:
+    return [render(tree, shape) for tree in generate_trees(n, depth=depth, width=width, mix=mix, seed=seed)]
+
+
+def _values(rng: random.Random, null_rate: float) -> dict[str, Any]:
+    values: dict[str, Any] = {}
+    for name in NUMERIC:
+        value = rng.uniform(0, 100) if name.startswith("x") else rng.randint(0, 100)
+        values[name] = None if rng.random() < null_rate else value
+    for name in TEXT:
+        values[name] = None if rng.random() < null_rate else rng.choice(_WORDS)
+    return values
+
+
+def shape_row(values: dict[str, Any], shape: str) -> Any:
+    if shape == "flat":
+        return dict(values)
+    num = {name: values[name] for name in NUMERIC}
+    text = {name: values[name] for name in TEXT}
+    if shape == "nested":
+        return {"num": num, "text": text}
+    if shape == "objects":
+        return Record(Group(**num), Group(**text))
+    if shape == "tuples":
+        return {"num": tuple(num.values()), "text": tuple(text.values())}
+    raise ValueError(f"shape must be one of {', '.join(SHAPES)}")
+
+
+def generate_values(n: int, *, null_rate: float = 0.05, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)
+    return [_values(rng, null_rate) for _ in range(n)]
+
+
+def generate_rows(n: int, *, shape: str = "flat", null_rate: float = 0.05, seed: int = 0) -> list[Any]:
+    return [shape_row(values, shape) for values in generate_values(n, null_rate=null_rate, seed=seed)]
@@ -0,0 +1,277 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+import pyparsing as pp
+from sqlalchemy import Float, Integer, String, create_engine, func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from benchmarks.generate import MIXES, NUMERIC, SHAPES, TEXT, generate_trees, generate_values, render, shape_row
+from parser import _ASTBuilder, _build_grammar, canonical_filter, enable_packrat, parse_ast
+from parser.mongodb import MongoDbFilterParser
+from parser.nodes import OPERATORS, Node
+from parser.optimizer import optimize
+from parser.pratt import PrattGrammar
+from parser.py_ast_dict import DictASTFilterParser, _PythonFilterParser, compile_predicate
+from parser.sqlalchemy import SqlAlchemyFilterParser
+
+# Offline benchmarks: no database server is needed (SQL runs against in-memory SQLite and
+# Mongo queries are only built, not executed). Every suite reports the best and median of
+# `repeat` timed passes; results go to stdout or --output as JSON, and
+#   python -m benchmarks.compare old.json new.json
+# compares two runs.
+#
+#   python -m benchmarks.run --filters 200 --rows 20000 --depth 2 --width 3 --mix mixed -o run.json
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class BenchRow(_Base):
+    __tablename__ = "bench_rows"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    i0: Mapped[int | None] = mapped_column(Integer)
+    i1: Mapped[int | None] = mapped_column(Integer)
+    i2: Mapped[int | None] = mapped_column(Integer)
+    x0: Mapped[float | None] = mapped_column(Float)
+    s0: Mapped[str | None] = mapped_column(String)
+    s1: Mapped[str | None] = mapped_column(String)
+    s2: Mapped[str | None] = mapped_column(String)
+
+
+def timed(fn: Callable[[], Any], *, units: int, repeat: int) -> dict[str, Any]:
+    # `units` is what one call of fn processes (filters, rows, filter x row pairs)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        times.append(time.perf_counter_ns() - start)
+    best = min(times)
+    return {
+        "units": units,
+        "repeat": repeat,
+        "best_ms": best / 1e6,
+        "median_ms": statistics.median(times) / 1e6,
+        "per_unit_us": best / units / 1e3 if units else 0.0,
+        "units_per_s": units * 1e9 / best if best else 0.0,
+    }
+
+
+def _supported(compile: Callable[[Node], Any], nodes: Sequence[Node]) -> tuple[list[Node], int]:
+    # the nodes a backend compiles; the rest are counted as unsupported and left out
+    supported = []
+    for node in nodes:
+        try:
+            compile(node)
+        except Exception:
+            continue
+        supported.append(node)
+    return supported, len(nodes) - len(supported)
+
+
+# -------- suites --------
+def bench_grammar(repeat: int) -> dict[str, Any]:
+    return {
+        "grammar.pyparsing": timed(lambda: _build_grammar(OPERATORS), units=1, repeat=repeat),
+        "grammar.pratt": timed(lambda: PrattGrammar(OPERATORS), units=1, repeat=repeat),
+        "grammar.ast_builder": timed(_ASTBuilder, units=1, repeat=repeat),
+    }
+
+
+def bench_parse(filters: list[str], repeat: int) -> dict[str, Any]:
+    # uncached parses: the fast path (falling back to pyparsing where it must) and pyparsing
+    # alone, then the cached parse_ast lookup every backend's create_filter starts with
+    builder = _ASTBuilder()
+    canonical = [canonical_filter(filter_string) for filter_string in filters]
+    for filter_string in filters:
+        parse_ast(filter_string)
+
+    def pyparsing_only():
+        for filter_string in canonical:
+            builder.parse_single_expression(builder.filter_expression.parse_string(filter_string))
+
+    def pyparsing_packrat():
+        # enable_packrat is process-wide, so it is switched off again for the other suites
+        enable_packrat()
+        try:
+            pyparsing_only()
+        finally:
+            pp.ParserElement.disable_memoization()
+
+    return {
+        "parse.canonicalize": timed(lambda: [canonical_filter(f) for f in filters], units=len(filters), repeat=repeat),
+        "parse.fast_path": timed(lambda: [builder.parse(f) for f in canonical], units=len(filters), repeat=repeat),
+        "parse.pyparsing": timed(pyparsing_only, units=len(filters), repeat=repeat),
+        "parse.pyparsing.packrat": timed(pyparsing_packrat, units=len(filters), repeat=repeat),
+        "parse.cached": timed(lambda: [parse_ast(f) for f in filters], units=len(filters), repeat=repeat),
+    }
+
+
+def bench_compile(filters: list[str], engine, repeat: int) -> dict[str, Any]:
+    # AST -> backend query/predicate, without the parse (nodes are parsed up front) and
+    # without the backends' compiled-filter caches
+    nodes = [parse_ast(filter_string) for filter_string in filters]
+    mongo = MongoDbFilterParser()
+    sql = SqlAlchemyFilterParser(BenchRow)
+    closures = _PythonFilterParser()
+    backends: dict[str, Callable[[Node], Any]] = {
+        "compile.mongodb": mongo.create_filter,
+        "compile.sqlalchemy": lambda node: str(sql.add_filter(node, select(BenchRow)).compile(dialect=engine.dialect)),
+        "compile.dict_ast.codegen": lambda node: compile_predicate(optimize(node)),
+        "compile.dict_ast.closures": closures.create_filter,
+    }
+    results = {}
+    for name, compile in backends.items():
+        supported, unsupported = _supported(compile, nodes)
+        result = timed(lambda: [compile(node) for node in supported], units=len(supported), repeat=repeat)
+        results[name] = result | {"unsupported": unsupported}
+    return results
+
+
+def bench_evaluate(trees: list, values: list[dict[str, Any]], engine, repeat: int) -> dict[str, Any]:
+    # throughput in filter x row evaluations per second
+    results = {}
+    for mode, parser in (("codegen", DictASTFilterParser()), ("closures", DictASTFilterParser(codegen=False))):
+        for shape in SHAPES:
+            rows = [shape_row(row, shape) for row in values]
+            filters = [parse_ast(render(tree, shape)) for tree in trees]
+            nodes, unsupported = _supported(parser.create_predicate, filters)
+            predicates = [parser.create_predicate(node) for node in nodes]
+
+            def evaluate():
+                for predicate in predicates:
+                    for row in rows:
+                        predicate(row)
+
+            result = timed(evaluate, units=len(predicates) * len(rows), repeat=repeat)
+            results[f"evaluate.dict_ast.{mode}.{shape}"] = result | {"unsupported": unsupported}
+
+        # rows scanned per second through apply_filter, the call most callers make
+        rows = [shape_row(row, "flat") for row in values]
+        nodes, unsupported = _supported(parser.create_predicate, [parse_ast(render(tree)) for tree in trees])
+
+        def apply():
+            for node in nodes:
+                parser.apply_filter(node, rows)
+
+        result = timed(apply, units=len(nodes) * len(rows), repeat=repeat)
+        results[f"evaluate.dict_ast.apply_filter.{mode}"] = result | {"unsupported": unsupported}
+    codegen, closures = results["evaluate.dict_ast.apply_filter.codegen"], results["evaluate.dict_ast.apply_filter.closures"]
+    codegen["speedup_vs_closures"] = codegen["units_per_s"] / closures["units_per_s"] if closures["units_per_s"] else 0.0
+
+    sql = SqlAlchemyFilterParser(BenchRow)
+    with Session(engine) as session:
+        session.add_all(BenchRow(id=i, **row) for i, row in enumerate(values))
+        session.commit()
+        nodes = [parse_ast(render(tree)) for tree in trees]
+        count = select(func.count()).select_from(BenchRow)
+        supported, unsupported = _supported(lambda node: session.execute(sql.add_filter(node, count)), nodes)
+        queries = [sql.add_filter(node, count) for node in supported]
+
+        def evaluate_sql():
+            for query in queries:
+                session.execute(query).scalar()
+
+        result = timed(evaluate_sql, units=len(queries) * len(values), repeat=repeat)
+        results["evaluate.sqlite"] = result | {"unsupported": unsupported}
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    *,
+    filters: int = 200,
+    rows: int = 20_000,
+    depth: int = 2,
+    width: int = 3,
+    mix: str = "mixed",
+    repeat: int = 5,
+    seed: int = 0,
+    suites: Sequence[str] = ("grammar", "parse", "compile", "evaluate"),
+) -> dict[str, Any]:
+    config = {
+        "filters": filters,
+        "rows": rows,
+        "depth": depth,
+        "width": width,
+        "mix": mix,
+        "repeat": repeat,
+        "seed": seed,
+        "suites": list(suites),
+    }
+    trees = generate_trees(filters, depth=depth, width=width, mix=mix, seed=seed)
+    flat = [render(tree) for tree in trees]
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    results: dict[str, Any] = {}
+    if "grammar" in suites:
+        results |= bench_grammar(repeat)
+    if "parse" in suites:
+        results |= bench_parse(flat, repeat)
+    if "compile" in suites:
+        results |= bench_compile(flat, engine, repeat)
+    if "evaluate" in suites:
+        results |= bench_evaluate(trees, generate_values(rows, seed=seed), engine, repeat)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "fields": {"numeric": list(NUMERIC), "text": list(TEXT)},
+        },
+        "config": config,
+        "results": results,
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    arguments = argparse.ArgumentParser(description="Offline funnel benchmarks")
+    arguments.add_argument("--filters", type=int, default=200)
+    arguments.add_argument("--rows", type=int, default=20_000)
+    arguments.add_argument("--depth", type=int, default=2)
+    arguments.add_argument("--width", type=int, default=3)
+    arguments.add_argument("--mix", choices=MIXES, default="mixed")
+    arguments.add_argument("--repeat", type=int, default=5)
+    arguments.add_argument("--seed", type=int, default=0)
+    arguments.add_argument(
+        "--suite", action="append", choices=("grammar", "parse", "compile", "evaluate"), dest="suites"
+    )
+    arguments.add_argument("-o", "--output", help="write the JSON here instead of stdout")
+    options = arguments.parse_args(argv)
+    report = run(
+        filters=options.filters,
+        rows=options.rows,
+        depth=options.depth,
+        width=options.width,
+        mix=options.mix,
+        repeat=options.repeat,
+        seed=options.seed,
+        suites=options.suites or ("grammar", "parse", "compile", "evaluate"),
+    )
+    output = json.dumps(report, indent=2)
+    if options.output:
+        Path(options.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
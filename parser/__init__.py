@@ -1,11 +1,107 @@
 import re
+import time as _time
 from datetime import datetime, time
-from typing import Any, Callable, Protocol, Sequence, TypeVar
+from functools import lru_cache
+from threading import Lock
+from typing import Any, Callable, Iterable, Protocol, Sequence, TypeVar
 
 import pyparsing as pp
 
+from .limits import check_filter
+from .nodes import BOOL_OPERATORS, FUNCTIONS, OPERATORS, BinOp, BoolOp, Call, Column, Literal, Node, Param, walk
+from .optimizer import optimize
+from .pratt import FastPathError, get_pratt_grammar
+
 type IDENTIFIER_PARSER_FUNC = Callable[[str], Any]
 
+PACKRAT_CACHE_SIZE = 1024
+
+# field references in filters and in $select lists
+IDENTIFIER_PATTERN = r"[a-z][\w\.]*"
+
+
+def enable_packrat(cache_size: int = PACKRAT_CACHE_SIZE) -> None:
+    # Process-wide and opt-in (see get_grammar): pyparsing 3's infixNotation already parses
+    # nested AND/OR in linear time, and for this grammar the memo bookkeeping costs more than
+    # it saves.
+    pp.ParserElement.enablePackrat(cache_size_limit=cache_size)
+
+
+def _build_grammar(op_names: tuple[str, ...]) -> pp.ParserElement:
+    # Define basic elements
+    operator_ = pp.Regex("|".join(op_names)).setName("operator")
+    number = pp.Regex(r"[\d\.]+")
+    identifier = pp.Regex(IDENTIFIER_PATTERN)
+    str_value = pp.QuotedString("'", unquoteResults=False, escChar="\\") | pp.QuotedString(
+        '"', unquoteResults=False, escChar="\\"
+    )
+    date_value = pp.Regex(r"\d{4}-\d{1,2}-\d{1,2}")
+    collection_value = pp.Suppress("[") + pp.delimitedList(identifier | str_value) + pp.Suppress("]")
+    l_par = pp.Suppress("(")
+    r_par = pp.Suppress(")")
+    function_call = pp.Forward()
+    arg = function_call | identifier | date_value | number | collection_value | str_value
+    function_call = pp.Group(identifier + l_par + pp.Optional(pp.delimitedList(arg)) + r_par)
+    param = function_call | arg
+    condition = pp.Group(param + operator_ + param)
+
+    # Define a full filter expression supporting 'and'/'or'
+    return pp.infixNotation(
+        condition,
+        [
+            ("AND", 2, pp.opAssoc.LEFT),
+            ("OR", 2, pp.opAssoc.LEFT),
+        ],
+    )
+
+
+# -------- grammar registry --------
+# A grammar only depends on the operator names, so all parser instances (and all backends
+# sharing the same operators) reuse one build. The key keeps op_map order because the
+# operator regex is an ordered alternation.
+_grammars: dict[tuple[str, ...], pp.ParserElement] = {}
+_grammars_lock = Lock()
+
+
+def get_grammar(op_names: Iterable[str]) -> pp.ParserElement:
+    # Grammars run without packrat unless enable_packrat was called: with it, uncached
+    # pyparsing parses take about twice as long (parse.pyparsing vs parse.pyparsing.packrat
+    # in benchmarks/packrat.json, from `python -m benchmarks.run --suite parse`).
+    key = tuple(op_names)
+    grammar = _grammars.get(key)
+    if grammar is None:
+        with _grammars_lock:
+            grammar = _grammars.get(key)
+            if grammar is None:
+                grammar = _grammars[key] = _build_grammar(key)
+    return grammar
+
+
+# -------- $select --------
+_select_list = pp.delimitedList(pp.Regex(IDENTIFIER_PATTERN)) + pp.StringEnd()
+
+
+@lru_cache(maxsize=256)
+def _parse_select(select: str) -> tuple[str, ...]:
+    try:
+        fields = _select_list.parseString(select)
+    except pp.ParseException as e:
+        raise ValueError(f"Invalid $select {select!r}: {e}") from e
+    return tuple(dict.fromkeys(fields))
+
+
+def parse_select(fields: str | Sequence[str]) -> tuple[str, ...]:
+    # "name, data.kind" or ["name", "data.kind"] -> ("name", "data.kind"), duplicates dropped
+    if isinstance(fields, str):
+        return _parse_select(fields)
+    return tuple(dict.fromkeys(field for item in fields for field in _parse_select(item)))
+
+
+def _conjoin(conjuncts: list[Node]) -> Node | None:
+    if not conjuncts:
+        return None
+    return conjuncts[0] if len(conjuncts) == 1 else BoolOp("AND", tuple(conjuncts))
+
 
 class QueryGenerator(Protocol):
 
@@ -17,6 +113,11 @@ class QueryGenerator(Protocol):
 
 
 class FilterParser(QueryGenerator):
+    # optimizer switches (see parser/optimizer.py), overridden by backends they do not fit
+    fold_constants = True
+    detect_contradictions = True
+    # instrumentation (see parser/observe.py); None keeps every call path unchanged
+    observer = None
 
     def __init__(
         self,
@@ -24,50 +125,34 @@ class FilterParser(QueryGenerator):
         ident_parsers: list[tuple[str, IDENTIFIER_PARSER_FUNC]] | None = None,
         op_map: dict[str, Callable[..., Any]],
         func_map: dict[str, Callable[..., Any]],
+        fast_path: bool = True,
     ):
 
         self.parsers = ident_parsers or [
             (r"^'?\d{2,4}-\d{1,2}-\d{1,2}'?$", lambda s: datetime.strptime(s.strip("'"), "%Y-%m-%d")),
-            (r"^'?\d{1,2}:\d{1,2}(:\d{1,2})?'?", lambda s: time.fromisoformat(s.strip("'"))),
-            (r"^\d+$", lambda s: int(s.strip("'"))),
-            (r"^\d+\.\d+$", lambda s: float(s.strip("'"))),
-            (r"^'.+'$", lambda s: s.strip("'")),
-            ("true|false", lambda s: True if s.lower() == "true" else False),
-            ("null", lambda s: None),
+            (r"^'?\d{1,2}:\d{1,2}(:\d{1,2})?'?$", lambda s: time.fromisoformat(s.strip("'"))),
+            (r"^[+-]?\d+$", lambda s: int(s.strip("'"))),
+            (r"^[+-]?\d+\.\d+$", lambda s: float(s.strip("'"))),
+            (r"^(?i:true|false)$", lambda s: s.lower() == "true"),
+            (r"^null$", lambda s: None),
+            (r"^'.*'$", lambda s: s.strip("'")),
         ]
         self.func_map = func_map
         self.op_map = op_map
+        self.filter_expression = get_grammar(self.op_map)
+        self.fast_grammar = get_pratt_grammar(self.op_map) if fast_path else None
 
-        # Define basic elements
-        operator_ = pp.Regex("|".join(self.op_map.keys())).setName("operator")
-        number = pp.Regex(r"[\d\.]+")
-        identifier = pp.Regex(r"[a-z][\w\.]*")
-        str_value = pp.QuotedString("'", unquoteResults=False, escChar="\\") | pp.QuotedString(
-            '"', unquoteResults=False, escChar="\\"
-        )
-        date_value = pp.Regex(r"\d{4}-\d{1,2}-\d{1,2}")
-        collection_value = pp.Suppress("[") + pp.delimitedList(identifier | str_value) + pp.Suppress("]")
-        l_par = pp.Suppress("(")
-        r_par = pp.Suppress(")")
-        function_call = pp.Forward()
-        arg = function_call | identifier | date_value | number | collection_value | str_value
-        function_call = pp.Group(identifier + l_par + pp.Optional(pp.delimitedList(arg)) + r_par)
-        param = function_call | arg
-        condition = pp.Group(param + operator_ + param)
-
-        # Define a full filter expression supporting 'and'/'or'
-        self.filter_expression = pp.infixNotation(
-            condition,
-            [
-                ("AND", 2, pp.opAssoc.LEFT),
-                ("OR", 2, pp.opAssoc.LEFT),
-            ],
-        )
+    def _literal_matchers(self) -> list[tuple[Callable, IDENTIFIER_PARSER_FUNC]]:
+        # `parsers` is public and gets replaced wholesale, so recompile when it changes
+        cached = self.__dict__.get("_matchers")
+        if cached is None or cached[0] is not self.parsers:
+            cached = self._matchers = (self.parsers, [(re.compile(p).match, fn) for p, fn in self.parsers])
+        return cached[1]
 
     def parse_identifier(self, val: str | pp.ParseResults) -> Any:
         if isinstance(val, str):
-            for pattern, parser in self.parsers:
-                if re.match(pattern, val):
+            for match, parser in self._literal_matchers():
+                if match(val):
                     return parser(val)
             return self.get_column(val)
         if isinstance(val, Sequence):
@@ -97,6 +182,190 @@ class FilterParser(QueryGenerator):
                         raise NotImplementedError(f"Invalid operator {expr[1]} in OData expression")
         return None
 
-    def create_filter(self, filter_string: str):
-        parsed = self.filter_expression.parseString(filter_string)
-        return self.parse_single_expression(parsed)
+    # Same folding as parse_single_expression, over the plain-list trees of the fast path
+    def _fold_operand(self, val: str | list) -> Any:
+        if type(val) is str:
+            return self.parse_identifier(val)
+        if len(val) == 1:
+            return self._fold_operand(val[0])
+        return self._fold(val)
+
+    def _fold(self, expr: list) -> Any:
+        head = expr[0]
+        if type(head) is str and head.lower() in self.func_map:
+            return self.func_map[head.lower()](*[self._fold_operand(arg) for arg in expr[1:]])
+        if expr[1] in self.op_map:
+            return self.op_map[expr[1]](*[self._fold_operand(operand) for operand in expr[::2]])
+        raise NotImplementedError(f"Invalid operator {expr[1]} in OData expression")
+
+    def _parse_tree(self, filter_string: str) -> tuple[Any, bool]:
+        if self.fast_grammar is not None:
+            try:
+                return self.fast_grammar.parse(filter_string), True
+            except FastPathError:
+                pass
+        return self.filter_expression.parseString(filter_string), False
+
+    def parse(self, filter_string: str):
+        # direct string -> backend objects fold, without going through the shared AST
+        check_filter(filter_string)
+        return self._parse(filter_string)
+
+    def _parse(self, filter_string: str):
+        # parse() without the limits check, for entry points that have already run it
+        observer = self.observer
+        if observer is None:
+            tree, fast = self._parse_tree(filter_string)
+            return self._fold(tree) if fast else self.parse_single_expression(tree)
+        start = _time.perf_counter()
+        tree, fast = self._parse_tree(filter_string)
+        parsed = _time.perf_counter()
+        result = self._fold(tree) if fast else self.parse_single_expression(tree)
+        backend = type(self).__name__
+        observer.phase(backend, "grammar", parsed - start, filter_string)
+        observer.phase(backend, "fold", _time.perf_counter() - parsed, filter_string)
+        return result
+
+    # -------- AST compilation --------
+    def compile(self, node: Node) -> Any:
+        if isinstance(node, Literal):
+            return node.value
+        if isinstance(node, Column):
+            return self.get_column(node.name)
+        if isinstance(node, Param):
+            return self.get_param(node)
+        if isinstance(node, Call):
+            funcs = self.__dict__.get("_funcs")
+            if funcs is None:
+                funcs = self._funcs = {name.lower(): fn for name, fn in self.func_map.items()}
+            if node.name not in funcs:
+                raise NotImplementedError(f"Invalid function {node.name} in OData expression")
+            return funcs[node.name](*[self.compile(arg) for arg in node.args])
+        if node.op not in self.op_map:
+            raise NotImplementedError(f"Invalid operator {node.op} in OData expression")
+        return self.op_map[node.op](*[self.compile(operand) for operand in node.operands])
+
+    def get_param(self, param: Param):
+        raise NotImplementedError(f"{type(self).__name__} does not support bind parameters")
+
+    def create_projection(self, fields: str | Sequence[str]):
+        raise NotImplementedError(f"{type(self).__name__} does not support $select")
+
+    def create_filter(self, filter_string: str | Node):
+        if self.observer is not None:
+            return self._observed_create_filter(filter_string)
+        node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+        return self.compile(
+            optimize(node, fold_constants=self.fold_constants, contradictions=self.detect_contradictions)
+        )
+
+    def _observed_create_filter(self, filter_string: str | Node):
+        start = _time.perf_counter()
+        node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+        parsed = _time.perf_counter()
+        node = optimize(node, fold_constants=self.fold_constants, contradictions=self.detect_contradictions)
+        optimized = _time.perf_counter()
+        result = self.compile(node)
+        compiled = _time.perf_counter()
+        backend, text = type(self).__name__, filter_string if isinstance(filter_string, str) else repr(filter_string)
+        nodes = sum(1 for _ in walk(node))
+        self.observer.phase(backend, "parse", parsed - start, text)
+        self.observer.phase(backend, "optimize", optimized - parsed, text, nodes)
+        self.observer.phase(backend, "compile", compiled - optimized, text, nodes)
+        return result
+
+    def observe(self, observer) -> None:
+        # observer: a parser.observe.FilterObserver, or None to stop reporting
+        self.observer = observer
+
+    # -------- pushdown --------
+    def supports(self, node: Node) -> bool:
+        # whether compile() evaluates this (non-boolean) condition natively; backends narrow
+        # it with their capability tables
+        funcs = self.__dict__.get("_funcs")
+        if funcs is None:
+            funcs = self._funcs = {name.lower(): fn for name, fn in self.func_map.items()}
+        return all(
+            (not isinstance(sub, BinOp) or sub.op in self.op_map) and (not isinstance(sub, Call) or sub.name in funcs)
+            for sub in walk(node)
+        )
+
+    def _relax(self, node: Node) -> Node | None:
+        # the strongest supported condition implied by node, None when there is none
+        if isinstance(node, BoolOp):
+            parts = [self._relax(operand) for operand in node.operands]
+            if node.op == "OR" and None in parts:
+                return None
+            parts = [part for part in parts if part is not None]
+            if not parts:
+                return None
+            return parts[0] if len(parts) == 1 else BoolOp(node.op, tuple(parts))
+        return node if self.supports(node) else None
+
+    def split_filter(self, filter_string: str | Node) -> tuple[Node | None, Node | None]:
+        # (pushed, residual) with filter == pushed AND residual: conjuncts the backend supports
+        # are pushed whole; for the others the implied supported part is pushed as a
+        # pre-filter and the conjunct itself is left to evaluate in Python
+        node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+        node = optimize(node, fold_constants=self.fold_constants, contradictions=self.detect_contradictions)
+        conjuncts = node.operands if isinstance(node, BoolOp) and node.op == "AND" else (node,)
+        pushed, residual = [], []
+        for conjunct in conjuncts:
+            relaxed = self._relax(conjunct)
+            if relaxed is not None:
+                pushed.append(relaxed)
+            if relaxed is not conjunct:
+                residual.append(conjunct)
+        return _conjoin(pushed), _conjoin(residual)
+
+
+class _ASTBuilder(FilterParser):
+    # a FilterParser whose callbacks build nodes, so the AST inherits every folding rule
+    def __init__(self):
+        super().__init__(
+            op_map={
+                op: (lambda *a, op=op: BoolOp(op, a)) if op in BOOL_OPERATORS else (lambda *a, op=op: BinOp(op, a))
+                for op in OPERATORS
+            },
+            func_map={name: (lambda *a, name=name: Call(name, a)) for name in FUNCTIONS},
+        )
+        self.parsers = [(pattern, lambda s, fn=fn: Literal(fn(s))) for pattern, fn in self.parsers]
+
+    def get_column(self, col: str):
+        return Column(col)
+
+
+_builder = _ASTBuilder()
+
+_TOKENS = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[^\s'"]+|\s+|.""")
+_KEYWORDS = {"and": "AND", "or": "OR"}
+
+
+def canonical_filter(filter_string: str) -> str:
+    # whitespace collapsed and AND/OR upper-cased, leaving quoted strings alone; the grammar
+    # only knows upper-case AND/OR and would stop silently at a lower-case one
+    tokens = [token for token in _TOKENS.findall(filter_string) if not token.isspace()]
+    return " ".join(_KEYWORDS.get(token.lower(), token) for token in tokens)
+
+
+@lru_cache(maxsize=1024)
+def parse_ast(filter_string: str) -> Node:
+    # parsed once per distinct string and shared by every backend compiling it; strings over
+    # the limits (see limits.py) raise FilterComplexityError before any parsing
+    check_filter(filter_string)
+    return _canonical_ast(canonical_filter(filter_string))
+
+
+# ASTs loaded from a FilterStore (see store.py), keyed by canonical filter string and
+# held strongly so their hash-consed nodes stay interned
+_preloaded: dict[str, Node] = {}
+
+
+def preload_ast(filter_string: str, node: Node) -> None:
+    _preloaded[canonical_filter(filter_string)] = node
+
+
+@lru_cache(maxsize=1024)
+def _canonical_ast(filter_string: str) -> Node:
+    node = _preloaded.get(filter_string)
+    return node if node is not None else _builder._parse(filter_string)
@@ -0,0 +1,185 @@
+from functools import lru_cache
+from typing import Any, Callable, NamedTuple
+
+import pyparsing as pp
+
+from parser import IDENTIFIER_PATTERN
+from parser.limits import check_filter
+from parser.nodes import FUNCTIONS, Call, Column, Literal, Node, columns, ordering_family
+
+# OData-style $apply aggregation, shared by the backends:
+#   groupby((type, year(created) as y), aggregate(duration with sum as total, $count as n))
+#   aggregate(duration with avg as mean, name with max as last)
+#   groupby((type))
+# Group keys and aggregated values are columns or function calls over them (func_map names).
+# Methods follow SQL: count(x) counts non-null values, sum/min/max/avg skip nulls (sum and avg
+# also skip non-numbers, min and max values outside the ordering family of the first one they
+# kept) and give null for a group without any value; $count counts rows.
+# Without groupby the result is a single row, also over no rows at all.
+
+METHODS = ("sum", "min", "max", "avg", "count")
+
+
+class Aggregate(NamedTuple):
+    alias: str
+    method: str
+    expression: Node | None  # None for $count
+
+
+class Aggregation(NamedTuple):
+    groupby: tuple[tuple[str, Node], ...]  # (alias, expression)
+    aggregates: tuple[Aggregate, ...]
+
+    def columns(self) -> set[str]:
+        # the row paths the expressions read
+        expressions = [expression for _, expression in self.groupby]
+        expressions += [item.expression for item in self.aggregates if item.expression is not None]
+        return {name for expression in expressions for name in columns(expression)}
+
+
+def _build_grammar() -> pp.ParserElement:
+    identifier = pp.Regex(IDENTIFIER_PATTERN)
+    alias = pp.Regex(r"[A-Za-z_][\w\.]*")
+    number = pp.Regex(r"[+-]?\d+(\.\d+)?").set_parse_action(lambda t: Literal(float(t[0]) if "." in t[0] else int(t[0])))
+    string = pp.QuotedString("'", esc_char="\\").set_parse_action(lambda t: Literal(t[0]))
+    l_par, r_par = pp.Suppress("("), pp.Suppress(")")
+    expression = pp.Forward()
+    call = (identifier + l_par + pp.Optional(pp.DelimitedList(expression)) + r_par).set_parse_action(
+        lambda t: Call(t[0].lower(), tuple(t[1:]))
+    )
+    column = identifier.copy().set_parse_action(lambda t: Column(t[0]))
+    expression <<= call | column | number | string
+    as_ = pp.Suppress(pp.CaselessKeyword("as"))
+    key = pp.Group(expression + pp.Optional(as_ + alias))
+    method = pp.MatchFirst([pp.CaselessKeyword(name) for name in METHODS])
+    item = pp.Group(pp.Literal("$count") + as_ + alias) | pp.Group(
+        expression + pp.Suppress(pp.CaselessKeyword("with")) + method + as_ + alias
+    )
+    aggregate = pp.Group(pp.Suppress(pp.CaselessKeyword("aggregate")) + l_par + pp.DelimitedList(item) + r_par)
+    groupby = (
+        pp.Suppress(pp.CaselessKeyword("groupby"))
+        + l_par
+        + pp.Group(l_par + pp.DelimitedList(key) + r_par)
+        + pp.Optional(pp.Suppress(",") + aggregate)
+        + r_par
+    )
+    return (groupby | pp.Group(pp.Empty()) + aggregate) + pp.StringEnd()
+
+
+_apply = _build_grammar()
+
+
+def _text(node: Node) -> str:
+    if isinstance(node, Column):
+        return node.name
+    if isinstance(node, Call):
+        return f"{node.name}({', '.join(map(_text, node.args))})"
+    return repr(node.value)
+
+
+@lru_cache(maxsize=256)
+def _parse_apply(text: str) -> Aggregation:
+    check_filter(text)
+    try:
+        parsed = _apply.parse_string(text)
+    except pp.ParseException as e:
+        raise ValueError(f"Invalid $apply {text!r} at char {e.loc}") from e
+    groupby = tuple((key[1] if len(key) > 1 else _text(key[0]), key[0]) for key in parsed[0])
+    aggregates = tuple(
+        Aggregate(item[1], "$count", None) if item[0] == "$count" else Aggregate(item[2], item[1].lower(), item[0])
+        for item in (parsed[1] if len(parsed) > 1 else ())
+    )
+    aliases = [alias for alias, _ in groupby] + [item.alias for item in aggregates]
+    duplicates = sorted({alias for alias in aliases if aliases.count(alias) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate $apply alias(es) {', '.join(duplicates)}")
+    for expression in [expression for _, expression in groupby] + [item.expression for item in aggregates]:
+        if isinstance(expression, Call) and expression.name not in FUNCTIONS:
+            raise ValueError(f"Invalid function {expression.name} in $apply")
+    return Aggregation(groupby, aggregates)
+
+
+def parse_apply(apply: str | Aggregation) -> Aggregation:
+    return apply if isinstance(apply, Aggregation) else _parse_apply(apply.strip())
+
+
+# -------- streaming hash aggregation --------
+def _key(value: Any) -> Any:
+    try:
+        hash(value)
+    except TypeError:
+        return "\0unhashable", repr(value)  # lists and dicts group by their repr
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class HashAggregator:
+    # one pass over the rows, one accumulator list per group; `keys` and `values` compute the
+    # group keys and the aggregated value (None for $count) of a row
+
+    def __init__(
+        self,
+        aggregation: Aggregation,
+        keys: list[Callable[[Any], Any]],
+        values: list[Callable[[Any], Any] | None],
+    ):
+        self.aggregation = aggregation
+        self._keys = keys
+        self._values = values
+        self._methods = [item.method for item in aggregation.aggregates]
+        # group key -> (key values, accumulators); avg keeps [sum, count]
+        self._groups: dict[tuple, tuple[list, list]] = {}
+
+    def _empty(self) -> list:
+        return [[0, 0] if method == "avg" else 0 if method in ("count", "$count") else None for method in self._methods]
+
+    def add(self, row: Any) -> None:
+        keys = [key(row) for key in self._keys]
+        group = tuple(map(_key, keys))
+        entry = self._groups.get(group)
+        if entry is None:
+            entry = self._groups[group] = (keys, self._empty())
+        accumulators = entry[1]
+        for i, (method, value_of) in enumerate(zip(self._methods, self._values)):
+            if method == "$count":
+                accumulators[i] += 1
+                continue
+            value = value_of(row)
+            if value is None:
+                continue
+            if method == "count":
+                accumulators[i] += 1
+            elif method == "avg":
+                if _is_number(value):
+                    accumulators[i][0] += value
+                    accumulators[i][1] += 1
+            elif method == "sum":
+                if _is_number(value):
+                    accumulators[i] = value if accumulators[i] is None else accumulators[i] + value
+            else:
+                current = accumulators[i]
+                family = ordering_family(value)
+                if family is None:
+                    continue
+                if current is None:
+                    accumulators[i] = value
+                elif family == ordering_family(current) and (value < current if method == "min" else value > current):
+                    accumulators[i] = value
+
+    def result(self) -> list[dict[str, Any]]:
+        groups = self._groups
+        if not groups and not self.aggregation.groupby:
+            groups = {(): ([], self._empty())}
+        aliases = [alias for alias, _ in self.aggregation.groupby]
+        rows = []
+        for keys, accumulators in groups.values():
+            row = dict(zip(aliases, keys))
+            for item, accumulator in zip(self.aggregation.aggregates, accumulators):
+                if item.method == "avg":
+                    accumulator = accumulator[0] / accumulator[1] if accumulator[1] else None
+                row[item.alias] = accumulator
+            rows.append(row)
+        return rows
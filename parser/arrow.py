@@ -0,0 +1,229 @@
+import functools
+import operator
+from datetime import date, datetime
+from typing import Any, Callable, Iterator, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError as e:  # optional: only this backend needs it
+    raise ImportError("parser.arrow needs the optional pyarrow dependency (pip install pyarrow)") from e
+
+from . import FilterParser, parse_select
+from .nodes import BinOp, BoolOp, Column, Literal, Node, columns
+from .py_ast_dict import DictASTFilterParser
+
+# Filters Parquet and Arrow IPC files without materializing them as Python objects. Files are
+# memory-mapped; Parquet row groups whose min/max/null statistics rule a filter out are never
+# read, and only the columns the filter and the projection reference are decoded. Conditions
+# are compiled to Arrow compute expressions where Arrow gives the same answer as the Python
+# backend (null never matches a comparison, `ne` matches null); anything else (functions,
+# arithmetic, mismatched types) is evaluated by DictASTFilterParser on the surviving rows.
+
+_python = DictASTFilterParser()
+
+_PATTERNS = frozenset(("like", "startswith", "endswith"))
+
+
+def _literal_fits(value: Any, arrow_type: pa.DataType, op: str) -> bool:
+    # Arrow compares these without raising, exactly where Python does
+    kind = type(value)
+    if kind in (int, float):
+        return pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type)
+    if kind is bool:
+        return op in ("eq", "ne") and pa.types.is_boolean(arrow_type)
+    if kind is str:
+        return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+    if kind is datetime:
+        return pa.types.is_timestamp(arrow_type) and arrow_type.tz is None
+    if kind is date:
+        return pa.types.is_date(arrow_type)
+    return False
+
+
+def _field_type(schema: pa.Schema, path: str) -> pa.DataType | None:
+    head, *rest = path.split(".")
+    if head not in schema.names:
+        return None
+    arrow_type = schema.field(head).type
+    for part in rest:
+        if not pa.types.is_struct(arrow_type) or arrow_type.get_field_index(part) < 0:
+            return None
+        arrow_type = arrow_type.field(part).type
+    return arrow_type
+
+
+def _may_match(node: Node, stats: dict[str, Any], num_rows: int) -> bool:
+    # False only when the row group's statistics prove no row can satisfy node
+    if isinstance(node, BoolOp):
+        test = all if node.op == "AND" else any
+        return test(_may_match(operand, stats, num_rows) for operand in node.operands)
+    if not isinstance(node, BinOp) or not isinstance(node.left, Column):
+        return True
+    column = stats.get(node.left.name.strip())
+    if column is None:
+        return True
+    value = node.right.value
+    all_null = column.null_count is not None and column.null_count == num_rows
+    if value is None:
+        return node.op != "eq" or column.null_count is None or column.null_count > 0
+    if node.op == "ne":
+        return not (column.has_min_max and column.min == column.max == value and column.null_count == 0)
+    if all_null:
+        return False
+    if not column.has_min_max:
+        return True
+    low, high = column.min, column.max
+    try:
+        if node.op == "eq":
+            return low <= value <= high
+        if node.op == "gt":
+            return high > value
+        if node.op == "ge":
+            return high >= value
+        if node.op == "lt":
+            return low < value
+        if node.op == "le":
+            return low <= value
+        if node.op == "startswith":
+            return high >= value and low[: len(value)] <= value
+    except TypeError:
+        return True
+    return True
+
+
+class ArrowFilterParser(FilterParser):
+    # null literals and nulls in the data follow the Python backend: None == None, and a
+    # null value is "not equal" to everything else
+    op_map = {
+        "eq": lambda a, b: pc.is_null(a) if b is None else a == b,
+        "ne": lambda a, b: pc.is_valid(a) if b is None else (a != b) | pc.is_null(a),
+        "gt": lambda a, b: a > b,
+        "lt": lambda a, b: a < b,
+        "ge": lambda a, b: a >= b,
+        "le": lambda a, b: a <= b,
+        "AND": lambda *args: functools.reduce(operator.and_, args),
+        "OR": lambda *args: functools.reduce(operator.or_, args),
+        "like": lambda a, b: pc.match_substring(a, b),
+        "startswith": lambda a, b: pc.starts_with(a, b),
+        "endswith": lambda a, b: pc.ends_with(a, b),
+    }
+
+    func_map: dict[str, Callable[..., Any]] = {}
+
+    def __init__(self, source: str | pa.NativeFile):
+        # a file passed in is left open by close(); a path is mapped here and closed there
+        super().__init__(op_map=self.op_map, func_map=self.func_map)
+        self._file = pa.memory_map(source) if isinstance(source, str) else source
+        self._owns_file = isinstance(source, str)
+        self._parquet = self._file.read(4) == b"PAR1"
+        self._file.seek(0)
+        if self._parquet:
+            self._reader = pq.ParquetFile(self._file)
+            self.schema = self._reader.schema_arrow
+        else:
+            self._reader = pa.ipc.open_file(self._file)
+            self.schema = self._reader.schema
+
+    def __enter__(self) -> "ArrowFilterParser":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_file and not self._file.closed:
+            self._file.close()
+
+    def get_column(self, col: str):
+        return pc.field(*col.strip().split("."))
+
+    # -------- pushdown --------
+    def supports(self, node: Node) -> bool:
+        if not isinstance(node, BinOp) or node.op not in self.op_map or len(node.operands) != 2:
+            return False
+        field, value = node.operands
+        if not (isinstance(field, Column) and isinstance(value, Literal)):
+            return False
+        arrow_type = _field_type(self.schema, field.name.strip())
+        if arrow_type is None:
+            return False
+        if value.value is None:
+            return node.op in ("eq", "ne")
+        if node.op in _PATTERNS:
+            # "" matches null in Python ("" in "")
+            return type(value.value) is str and value.value != "" and _literal_fits(value.value, arrow_type, node.op)
+        return _literal_fits(value.value, arrow_type, node.op)
+
+    def row_groups(self, filter_string: str | Node) -> list[int]:
+        # Parquet row groups the pushed-down part of the filter may match
+        if not self._parquet:
+            return []
+        pushed, _ = self.split_filter(filter_string)
+        metadata = self._reader.metadata
+        groups = []
+        for i in range(metadata.num_row_groups):
+            group = metadata.row_group(i)
+            if pushed is not None:
+                stats = {}
+                for j in range(group.num_columns):
+                    chunk = group.column(j)
+                    if chunk.is_stats_set:
+                        stats[chunk.path_in_schema] = chunk.statistics
+                if not _may_match(pushed, stats, group.num_rows):
+                    continue
+            groups.append(i)
+        return groups
+
+    # -------- scanning --------
+    def _batches(self, groups: list[int], names: list[str]) -> Iterator[pa.Table]:
+        if self._parquet:
+            for i in groups:
+                yield self._reader.read_row_group(i, columns=names)
+        else:
+            for i in range(self._reader.num_record_batches):
+                yield pa.Table.from_batches([self._reader.get_batch(i).select(names)])
+
+    def iter_tables(
+        self, filter_string: str | Node, *, fields: str | Sequence[str] | None = None
+    ) -> Iterator[pa.Table]:
+        # one filtered table per row group / record batch, so memory stays at one group
+        pushed, residual = self.split_filter(filter_string)
+        expression = None if pushed is None else self.create_filter(pushed)
+        predicate = None if residual is None else _python.create_predicate(residual)
+        residual_names = sorted({path.strip().split(".")[0] for path in columns(residual)} if residual else ())
+        residual_names = [name for name in residual_names if name in self.schema.names]
+        if fields is None:
+            output = self.schema.names
+        else:
+            output = list(dict.fromkeys(path.split(".")[0] for path in parse_select(fields)))
+            unknown = [name for name in output if name not in self.schema.names]
+            if unknown:
+                raise ValueError(f"Unknown $select field(s) {', '.join(unknown)}")
+        names = list(dict.fromkeys([*output, *residual_names]))
+        if pushed is not None:
+            names += [
+                name
+                for name in sorted({path.strip().split(".")[0] for path in columns(pushed)})
+                if name not in names
+            ]
+        for table in self._batches(self.row_groups(filter_string), names):
+            if expression is not None:
+                table = table.filter(expression)
+            if predicate is not None and table.num_rows:
+                rows = table.select(residual_names).to_pylist()
+                table = table.filter(pa.array([predicate(row) for row in rows], type=pa.bool_()))
+            yield table.select(output)
+
+    def scan(self, filter_string: str | Node, *, fields: str | Sequence[str] | None = None) -> pa.Table:
+        tables = list(self.iter_tables(filter_string, fields=fields))
+        if not tables:
+            names = self.schema.names if fields is None else [path.split(".")[0] for path in parse_select(fields)]
+            return self.schema.empty_table().select(list(dict.fromkeys(names)))
+        return pa.concat_tables(tables)
+
+    def apply_filter(self, filter_string: str | Node, *, fields: str | Sequence[str] | None = None) -> list[dict]:
+        # rows as dicts, for callers of DictASTFilterParser.apply_filter
+        return self.scan(filter_string, fields=fields).to_pylist()
+
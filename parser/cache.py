@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, NamedTuple
+
+from parser import parse_ast
+from parser.nodes import Node, parameterize
+
+# Compiled-filter cache shared by the backends. Entries are keyed by the parsed AST, which is
+# hash-consed, so filters that only differ in whitespace, parentheses or AND/OR case share one
+# entry. With `bind`, entries are keyed by the filter's shape instead (literals replaced by
+# Param nodes, see nodes.parameterize): compile() runs once per shape and bind() attaches the
+# literal values of each request. Each instance has its own LRU bound, optional TTL and
+# counters; lookups hold a lock, compilation runs outside it.
+
+
+def parse_canonical(filter_string: str | Node) -> Node:
+    return parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class FilterCache[V]:
+
+    def __init__(
+        self,
+        compile: Callable[[Node], V],
+        *,
+        maxsize: int = 1024,
+        ttl: float | None = None,
+        bind: Callable[[V, tuple], Any] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "filters",
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be positive")
+        self._compile = compile
+        self._bind = bind
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[Node, tuple[V, float]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        # a parser.observe.FilterObserver told about every lookup, set by the owning parser
+        self.name = name
+        self.observer = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, filter_string: str | Node) -> Any:
+        node = parse_canonical(filter_string)
+        if self._bind is None:
+            return self._get(node)
+        shape, values = parameterize(node)
+        return self._bind(self._get(shape), values)
+
+    def _get(self, key: Node) -> V:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if self.observer is not None:
+            self.observer.cache(self.name, entry is not None)
+        if entry is not None:
+            return entry[0]
+        value = self._compile(key)  # may raise; failures are not cached
+        self.put(key, value)
+        return value
+
+    def put(self, key: Node, value: V) -> None:
+        # seed an entry compiled elsewhere (see store.py); keyed like compile()'s argument
+        expires = self._clock() + self.ttl if self.ttl is not None else float("inf")
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self.expirations, len(self._entries), self.maxsize)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
@@ -0,0 +1,455 @@
+import operator
+import time
+from itertools import repeat
+from typing import Any, Callable, Mapping, Sequence
+
+import numpy as np
+
+from parser import parse_ast
+from parser.nodes import BinOp, BoolOp, Call, Column, Literal, Node, columns
+from parser.observe import FilterObserver, filter_text, node_count
+from parser.optimizer import optimize
+from parser.py_ast_dict import (
+    _FUNC_ARITY,
+    DSLParseError,
+    _ceiling,
+    _contains,
+    _dt,
+    _floor,
+    _in_value,
+    _indexOf,
+    _length,
+    _make_accessor,
+    _replace,
+    _round,
+    _substring,
+    _to_str,
+    _toLower,
+    _toUpper,
+    _trim,
+    _walk,
+)
+
+# Column-at-a-time evaluation of funnel filters over NumPy arrays. Results are the same rows
+# DictASTFilterParser would return: nulls follow the Python backend (None == None, ordering
+# against None is False, arithmetic treats None as 0), and a row whose evaluation would
+# raise in Python never matches. Each value carries a per-row `err` mask for the latter;
+# AND/OR only pick up errors from rows that are still being evaluated, mirroring
+# short-circuiting. Common type/operator combinations are vectorized; everything else is
+# evaluated element-wise with the scalar semantics of _PythonFilterParser.
+
+
+# -------- scalar semantics (as in _PythonFilterParser.op_map / func_map) --------
+def _cmp(op):
+    return lambda a, b: a is not None and b is not None and op(a, b)
+
+
+_SCALAR_OPS: dict[str, Callable[..., Any]] = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": _cmp(operator.gt),
+    "lt": _cmp(operator.lt),
+    "ge": _cmp(operator.ge),
+    "le": _cmp(operator.le),
+    "add": lambda a, b: (a or 0) + (b or 0),
+    "sub": lambda a, b: (a or 0) - (b or 0),
+    "mul": lambda a, b: (a or 0) * (b or 0),
+    "div": lambda a, b: (a or 0) / (b or 1),
+    "mod": lambda a, b: (a or 0) % (b or 1),
+    "like": lambda a, b: _to_str(b) in _to_str(a),
+    "endswith": lambda a, b: _to_str(a).endswith(_to_str(b)),
+    "startswith": lambda a, b: _to_str(a).startswith(_to_str(b)),
+    "contains": _contains,
+    "lacks": lambda a, b: not _contains(a, b),
+    "in": _in_value,
+}
+_SCALAR_OPS["has"] = _SCALAR_OPS["contains"]
+_SCALAR_OPS["hasNot"] = _SCALAR_OPS["lacks"]
+
+_SCALAR_FUNCS: dict[str, Callable[..., Any]] = {
+    "length": _length,
+    "indexof": _indexOf,
+    "replace": _replace,
+    "substring": _substring,
+    "tolower": _toLower,
+    "toupper": _toUpper,
+    "trim": _trim,
+    "round": _round,
+    "floor": _floor,
+    "ceiling": _ceiling,
+} | {k: _dt(k) for k in "year month day hour minute second".split()}
+
+_DATE_PARTS = frozenset("year month day hour minute second".split())
+_ORDERING = {"gt": np.greater, "lt": np.less, "ge": np.greater_equal, "le": np.less_equal}
+_ARITHMETIC = {"add": np.add, "sub": np.subtract, "mul": np.multiply, "div": np.true_divide, "mod": np.mod}
+_WRAPPING = frozenset(("add", "sub", "mul"))
+_STRING_TESTS = frozenset(("like", "startswith", "endswith", "contains", "has", "lacks", "hasNot"))
+_ROUNDING = {"round": np.round, "floor": np.floor, "ceiling": np.ceil}
+
+
+# -------- column values --------
+class _Vec:
+    # `values` is an ndarray (null slots hold a filler: 0, False or "") or a Python scalar
+    # broadcast over all rows; `null` marks None rows, or is None when there are none.
+    __slots__ = ("values", "null")
+
+    def __init__(self, values: Any, null: np.ndarray | None = None):
+        self.values = values
+        self.null = null
+
+    @property
+    def scalar(self) -> bool:
+        return not isinstance(self.values, np.ndarray)
+
+    @property
+    def kind(self) -> str:
+        if self.scalar:
+            v = self.values
+            if v is None:
+                return "none"
+            if isinstance(v, bool):
+                return "bool"
+            if type(v) in (int, float):
+                return "num"
+            return "str" if type(v) is str else "obj"
+        return {"i": "num", "u": "num", "f": "num", "b": "bool", "U": "str", "T": "str"}.get(self.values.dtype.kind, "obj")
+
+    def not_null(self, n: int) -> np.ndarray:
+        return np.ones(n, dtype=bool) if self.null is None else ~self.null
+
+    def objects(self, n: int) -> np.ndarray:
+        # Python values per row, None for nulls
+        if self.scalar:
+            return np.fromiter(repeat(self.values, n), dtype=object, count=n)
+        out = self.values.astype(object)
+        if self.null is not None:
+            out[self.null] = None
+        return out
+
+
+_INT_LIMIT = 2**62
+
+
+def _to_vec(values: Sequence[Any]) -> _Vec:
+    # list of Python values -> typed column; mixed or unusual content stays object
+    present = [v for v in values if v is not None]
+    types = {type(v) for v in present}
+    null = np.fromiter((v is None for v in values), dtype=bool, count=len(values)) if len(present) < len(values) else None
+    if types == {int} and all(-_INT_LIMIT < v < _INT_LIMIT for v in present):
+        return _Vec(np.array([0 if v is None else v for v in values], dtype=np.int64), null)
+    if types == {float}:
+        return _Vec(np.array([0.0 if v is None else v for v in values], dtype=np.float64), null)
+    if types == {bool}:
+        return _Vec(np.array([False if v is None else v for v in values], dtype=bool), null)
+    if types == {str}:
+        return _Vec(np.array(["" if v is None else v for v in values], dtype=str), null)
+    if not types:
+        return _Vec(np.zeros(len(values), dtype=bool), null)
+    return _Vec(np.fromiter(values, dtype=object, count=len(values)), null)
+
+
+def _integral(values: Any) -> bool:
+    if isinstance(values, np.ndarray):
+        return values.dtype.kind in "iub"
+    return isinstance(values, (int, np.integer))
+
+
+def _as_array(values: Any) -> np.ndarray:
+    return values if isinstance(values, np.ndarray) else np.asarray(values)
+
+
+def _array_vec(arr: Any) -> _Vec:
+    if isinstance(arr, np.ma.MaskedArray):
+        mask = np.ma.getmaskarray(arr)
+        if arr.dtype.kind in "iufbUT":
+            return _Vec(arr.filled(0 if arr.dtype.kind in "iufb" else ""), mask if mask.any() else None)
+        # filled(None) would use the default fill value, not None
+        arr = np.where(mask, None, arr.data.astype(object))
+    arr = np.asarray(arr)
+    if arr.dtype.kind in "iufbUT":
+        return _Vec(arr)
+    return _to_vec(arr.astype(object).tolist())
+
+
+# -------- evaluation --------
+class _Evaluator:
+
+    def __init__(self, n: int, load: Callable[[str], _Vec]):
+        self.n = n
+        self.load = load
+
+    def zeros(self) -> np.ndarray:
+        return np.zeros(self.n, dtype=bool)
+
+    def run(self, node: Node) -> tuple[_Vec, np.ndarray]:
+        if isinstance(node, Literal):
+            return _Vec(node.value), self.zeros()
+        if isinstance(node, Column):
+            return self.load(node.name.strip()), self.zeros()
+        if isinstance(node, BoolOp):
+            return self._bool(node)
+        args = node.args if isinstance(node, Call) else node.operands
+        evaluated = [self.run(arg) for arg in args]
+        vecs = [v for v, _ in evaluated]
+        err = np.logical_or.reduce([e for _, e in evaluated]) if evaluated else self.zeros()
+        if isinstance(node, Call):
+            fn, fast = _SCALAR_FUNCS.get(node.name), self._call
+            if fn is None:
+                raise NotImplementedError(f"Invalid function {node.name} in OData expression")
+            low, high = _FUNC_ARITY.get(node.name, (1, 1))
+            if not low <= len(args) <= high:
+                raise TypeError(f"{node.name}() takes {low} to {high} arguments ({len(args)} given)")
+        else:
+            fn, fast = _SCALAR_OPS.get(node.op), self._binop
+            if fn is None:
+                raise NotImplementedError(f"Invalid operator {node.op} in OData expression")
+            if len(args) != 2:
+                raise TypeError(f"{node.op} takes 2 operands ({len(args)} given)")
+        if all(v.scalar for v in vecs):
+            try:
+                return _Vec(fn(*[v.values for v in vecs])), err
+            except Exception:
+                return _Vec(None), np.ones(self.n, dtype=bool)
+        result = fast(node, vecs)
+        if result is None:
+            result, op_err = self._elementwise(fn, vecs)
+            err = err | op_err
+        return result, err
+
+    def truthy(self, vec: _Vec) -> tuple[np.ndarray, np.ndarray]:
+        kind = vec.kind
+        if vec.scalar:
+            try:
+                return np.full(self.n, bool(vec.values)), self.zeros()
+            except Exception:
+                return self.zeros(), np.ones(self.n, dtype=bool)
+        if kind == "num":
+            t = vec.values != 0
+        elif kind == "bool":
+            t = vec.values.copy()
+        elif kind == "str":
+            t = np.strings.str_len(vec.values) > 0
+        else:
+            out, err = self._elementwise(bool, [vec])
+            return out.values.astype(bool) & ~err, err
+        if vec.null is not None:
+            t &= ~vec.null
+        return t, self.zeros()
+
+    def _bool(self, node: BoolOp) -> tuple[_Vec, np.ndarray]:
+        alive = np.ones(self.n, dtype=bool)
+        err = self.zeros()
+        result = self.zeros()
+        for operand in node.operands:
+            vec, e = self.run(operand)
+            t, te = self.truthy(vec)
+            e = e | te
+            err |= alive & e
+            if node.op == "AND":
+                alive &= ~e & t
+            else:
+                result |= alive & ~e & t
+                alive &= ~e & ~t
+        return _Vec(alive if node.op == "AND" else result), err
+
+    def _elementwise(self, fn: Callable[..., Any], vecs: list[_Vec]) -> tuple[_Vec, np.ndarray]:
+        columns_ = [v.objects(self.n) for v in vecs]
+        out = np.empty(self.n, dtype=object)
+        err = self.zeros()
+        for i, args in enumerate(zip(*columns_)):
+            try:
+                out[i] = fn(*args)
+            except Exception:
+                err[i] = True
+        return _to_vec(out.tolist()), err
+
+    # -------- vectorized operators --------
+    def _binop(self, node: BinOp, vecs: list[_Vec]) -> _Vec | None:
+        a, b = vecs
+        op = node.op
+        if op in ("eq", "ne") or (op == "in" and b.scalar):
+            eq = self._eq(a, b)
+            if eq is None:
+                return None
+            return _Vec(~eq if op == "ne" else eq)
+        if op in _ORDERING:
+            return self._ordering(op, a, b)
+        if op in _ARITHMETIC:
+            return self._arithmetic(op, a, b)
+        if op in _STRING_TESTS:
+            return self._string_test(op, a, b)
+        return None
+
+    def _eq(self, a: _Vec, b: _Vec) -> np.ndarray | None:
+        if a.scalar:
+            a, b = b, a
+        ka, kb = a.kind, b.kind
+        if "obj" in (ka, kb):
+            return None
+        if kb == "none":
+            return a.null.copy() if a.null is not None else self.zeros()
+        families = {"num": 0, "bool": 0, "str": 1}
+        if families[ka] != families[kb]:
+            return (a.null & b.null) if not b.scalar and a.null is not None and b.null is not None else self.zeros()
+        eq = np.asarray(a.values == b.values) & a.not_null(self.n) & b.not_null(self.n)
+        if not b.scalar and a.null is not None and b.null is not None:
+            eq |= a.null & b.null
+        return eq
+
+    def _ordering(self, op: str, a: _Vec, b: _Vec) -> _Vec | None:
+        ka, kb = a.kind, b.kind
+        if "obj" in (ka, kb):
+            return None
+        if "none" in (ka, kb):
+            return _Vec(self.zeros())
+        if (ka == "str") != (kb == "str"):
+            # str vs number raises TypeError row by row; leave that to the element-wise path
+            return None
+        return _Vec(np.asarray(_ORDERING[op](a.values, b.values)) & a.not_null(self.n) & b.not_null(self.n))
+
+    def _arithmetic(self, op: str, a: _Vec, b: _Vec) -> _Vec | None:
+        if a.kind not in ("num", "bool", "none") or b.kind not in ("num", "bool", "none"):
+            return None
+        left = self._numeric(a, 0)
+        right = self._numeric(b, 1 if op in ("div", "mod") else 0)
+        with np.errstate(all="ignore"):
+            if op in _WRAPPING and _integral(left) and _integral(right):
+                # int64 wraps where Python ints grow: anything near the limit, operands or
+                # result, goes element-wise (object ints)
+                low, high = np.asarray(left, dtype=np.float64), np.asarray(right, dtype=np.float64)
+                if any(np.any(np.abs(v) >= _INT_LIMIT) for v in (low, high, _ARITHMETIC[op](low, high))):
+                    return None
+                left, right = np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+            return _Vec(_ARITHMETIC[op](left, right))
+
+    def _numeric(self, vec: _Vec, default: int) -> Any:
+        # `x or default` for numbers: None and zero become the default
+        if vec.scalar:
+            return vec.values or default
+        values = vec.values.astype(np.int64) if vec.values.dtype.kind == "b" else vec.values
+        falsy = values == 0
+        if vec.null is not None:
+            falsy |= vec.null
+        return np.where(falsy, default, values) if default or vec.null is not None else values
+
+    def _string_test(self, op: str, a: _Vec, b: _Vec) -> _Vec | None:
+        if a.scalar or a.kind != "str" or not b.scalar or b.kind == "obj":
+            return None
+        sub = _to_str(b.values)
+        if op == "startswith":
+            return _Vec(np.strings.startswith(a.values, sub))
+        if op == "endswith":
+            return _Vec(np.strings.endswith(a.values, sub))
+        found = np.strings.find(a.values, sub) >= 0
+        if op == "like":
+            return _Vec(found)
+        if a.null is not None:
+            found &= ~a.null
+        return _Vec(found if op in ("contains", "has") else ~found)
+
+    def _call(self, node: Call, vecs: list[_Vec]) -> _Vec | None:
+        if len(vecs) != 1 or vecs[0].scalar:
+            return None
+        (a,) = vecs
+        kind = a.kind
+        name = node.name
+        if name == "length":
+            if kind == "str":
+                return _Vec(np.strings.str_len(a.values).astype(np.int64))
+            if kind in ("num", "bool"):
+                return _Vec(np.zeros(self.n, dtype=np.int64))
+        elif name in _DATE_PARTS:
+            if kind in ("num", "bool", "str"):
+                return _Vec(np.zeros(self.n, dtype=np.int64))
+        elif name in ("tolower", "toupper", "trim") and kind == "str":
+            fn = {"tolower": np.strings.lower, "toupper": np.strings.upper, "trim": np.strings.strip}[name]
+            return _Vec(fn(a.values))
+        elif name in _ROUNDING and kind in ("num", "bool"):
+            values = a.values.astype(np.float64)
+            finite = np.isfinite(values)
+            if a.null is not None:
+                finite &= ~a.null
+            rounded = _ROUNDING[name](np.where(finite, values, 0))
+            return _Vec(rounded.astype(np.int64))
+        return None
+
+
+# -------- public API --------
+class ColumnarFilterParser:
+    # instrumentation (see parser/observe.py)
+    observer = None
+
+    def observe(self, observer: FilterObserver | None) -> None:
+        self.observer = observer
+
+    def _load_rows(self, rows: Sequence[Any]) -> Callable[[str], _Vec]:
+        def load(path: str) -> _Vec:
+            access = _make_accessor(path)
+            return _to_vec([access(row) for row in rows])
+
+        return load
+
+    def _load_columns(self, data: Mapping[str, Any], n: int) -> Callable[[str], _Vec]:
+        def load(path: str) -> _Vec:
+            if path in data:
+                return _array_vec(data[path])
+            head, _, rest = path.partition(".")
+            if rest and head in data:
+                parts = rest.split(".")
+                return _to_vec([_walk(v, parts) for v in np.asarray(data[head], dtype=object).tolist()])
+            return _Vec(None)
+
+        return load
+
+    def mask(self, filter_string: str | Node, data: Mapping[str, Any] | Sequence[Any]) -> np.ndarray:
+        try:
+            node = optimize(parse_ast(filter_string) if isinstance(filter_string, str) else filter_string)
+        except Exception as e:
+            raise DSLParseError(f"DSL parse error: {e}") from e
+        if isinstance(data, Mapping):
+            n = len(next(iter(data.values()))) if data else 0
+            evaluator = _Evaluator(n, self._load_columns(data, n))
+        else:
+            n = len(data)
+            evaluator = _Evaluator(n, self._load_rows(data))
+        loaded: dict[str, _Vec] = {}
+        load = evaluator.load
+        evaluator.load = lambda path: loaded[path] if path in loaded else loaded.setdefault(path, load(path))
+        if self.observer is not None:
+            start = time.perf_counter()
+        try:
+            vec, err = evaluator.run(node)
+        except (NotImplementedError, TypeError) as e:
+            raise DSLParseError(f"DSL parse error: {e}") from e
+        t, terr = evaluator.truthy(vec)
+        mask = t & ~err & ~terr
+        if self.observer is not None:
+            text = filter_text(filter_string)
+            self.observer.phase("ColumnarFilterParser", "evaluate", time.perf_counter() - start, text, node_count(node))
+            self.observer.rows("ColumnarFilterParser", n, int(mask.sum()), text)
+        return mask
+
+    def indices(self, filter_string: str | Node, data: Mapping[str, Any] | Sequence[Any]) -> np.ndarray:
+        return np.flatnonzero(self.mask(filter_string, data))
+
+    def apply_filter(self, filter_string: str | Node, data: Mapping[str, Any] | Sequence[Any]):
+        mask = self.mask(filter_string, data)
+        if isinstance(data, Mapping):
+            # index arrays as they are: np.asarray would drop a MaskedArray's mask
+            return {key: _as_array(values)[mask] for key, values in data.items()}
+        return [data[i] for i in np.flatnonzero(mask)]
+
+    @staticmethod
+    def to_columns(rows: Sequence[Any], paths: Sequence[str]) -> dict[str, np.ndarray]:
+        # one-off conversion of row dicts into arrays (nulls as masked entries)
+        out = {}
+        for path in paths:
+            access = _make_accessor(path)
+            vec = _to_vec([access(row) for row in rows])
+            out[path] = np.ma.MaskedArray(vec.values, mask=vec.null) if vec.null is not None else vec.values
+        return out
+
+    @staticmethod
+    def referenced_columns(filter_string: str | Node) -> set[str]:
+        node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+        return columns(node)
@@ -0,0 +1,346 @@
+from bisect import bisect_left, bisect_right
+from itertools import count, islice
+from typing import Any, Callable, Iterable, Iterator
+from weakref import WeakSet
+
+from parser import parse_ast
+from parser.nodes import BinOp, BoolOp, Column, Literal, Node, ordering_family
+from parser.py_ast_dict import DictASTFilterParser, _make_accessor, _to_str
+from parser.views import FilterView
+
+# An in-memory collection with secondary indexes. A query is planned over the AST: indexed
+# conditions on a column and a literal yield candidate ids, AND intersects and OR unions
+# them, and anything the indexes cannot answer widens the plan back to a full scan. Index
+# lookups only ever over-approximate, so the complete predicate is re-run on the candidates
+# and results are exactly those of DictASTFilterParser.apply_filter over the collection.
+# Items must not be mutated in place; use update() so the indexes follow.
+
+# (estimated candidate count, thunk producing the candidate ids)
+type _Lookup = tuple[int, Callable[[], set[int]]]
+
+_FLIPPED = {"gt": "lt", "lt": "gt", "ge": "le", "le": "ge", "eq": "eq"}
+_RANGE_OPS = frozenset(("gt", "lt", "ge", "le"))
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class HashIndex:
+    # value -> ids for eq/in, element -> ids for has/contains
+    def __init__(self, path: str):
+        self.path = path
+        self.values: dict[Any, set[int]] = {}
+        self.members: dict[Any, set[int]] = {}
+        self.unindexed: set[int] = set()  # unhashable values, substring containment, custom types
+
+    def add(self, key: int, value: Any) -> None:
+        if _hashable(value):
+            self.values.setdefault(value, set()).add(key)
+        else:
+            self.unindexed.add(key)
+        for element in self._elements(key, value):
+            self.members.setdefault(element, set()).add(key)
+
+    def remove(self, key: int, value: Any) -> None:
+        if _hashable(value):
+            self._discard(self.values, value, key)
+        self.unindexed.discard(key)
+        for element in self._elements(None, value):
+            self._discard(self.members, element, key)
+
+    def _elements(self, key: int | None, value: Any) -> Iterable[Any]:
+        if value is None or type(value) in (int, float, bool):
+            return ()  # `x in value` raises, so `has` never matches
+        if type(value) in (list, tuple, set, frozenset, dict) and all(map(_hashable, value)):
+            return set(value)
+        if key is not None:
+            self.unindexed.add(key)
+        return ()
+
+    @staticmethod
+    def _discard(table: dict[Any, set[int]], value: Any, key: int) -> None:
+        ids = table.get(value)
+        if ids is not None:
+            ids.discard(key)
+            if not ids:
+                del table[value]
+
+    def lookup(self, op: str, value: Any) -> _Lookup | None:
+        if op in ("eq", "in"):
+            table = self.values
+        elif op in ("has", "contains"):
+            table = self.members
+        else:
+            return None
+        if not _hashable(value):
+            return None
+        ids = table.get(value, ())
+        return len(ids) + len(self.unindexed), lambda: self.unindexed.union(ids)
+
+
+class SortedIndex:
+    # one sorted run per family of mutually comparable types; values of other types are
+    # always candidates (they may define their own ordering)
+    def __init__(self, path: str):
+        self.path = path
+        self.runs: dict[Any, tuple[list[Any], list[int]]] = {}
+        self.unindexed: set[int] = set()
+
+    def add(self, key: int, value: Any) -> None:
+        if value is None:
+            return  # ordering against None is always False
+        family = ordering_family(value)
+        if family is None:
+            self.unindexed.add(key)
+            return
+        values, ids = self.runs.setdefault(family, ([], []))
+        i = bisect_right(values, value)
+        values.insert(i, value)
+        ids.insert(i, key)
+
+    def remove(self, key: int, value: Any) -> None:
+        self.unindexed.discard(key)
+        run = self.runs.get(ordering_family(value)) if value is not None else None
+        if run is None:
+            return
+        values, ids = run
+        i = bisect_left(values, value)
+        while i < len(ids) and ids[i] != key:
+            i += 1
+        if i < len(ids):
+            del values[i], ids[i]
+
+    def lookup(self, op: str, value: Any) -> _Lookup | None:
+        if op not in _RANGE_OPS:
+            return None
+        if value is None:
+            return 0, set
+        family = ordering_family(value)
+        if family is None:
+            return None
+        values, ids = self.runs.get(family, ((), ()))
+        if op in ("gt", "ge"):
+            start, stop = (bisect_right if op == "gt" else bisect_left)(values, value), len(ids)
+        else:
+            start, stop = 0, (bisect_left if op == "lt" else bisect_right)(values, value)
+        return stop - start + len(self.unindexed), lambda: self.unindexed.union(islice(ids, start, stop))
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids", "size")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.ids: set[int] = set()
+        self.size = 0  # ids in this subtree
+
+
+class PrefixIndex:
+    # character trie over the string form startswith compares (None -> "", 5 -> "5")
+    def __init__(self, path: str):
+        self.path = path
+        self.root = _TrieNode()
+        self.unindexed: set[int] = set()
+
+    def add(self, key: int, value: Any) -> None:
+        try:
+            text = _to_str(value)
+        except Exception:
+            self.unindexed.add(key)
+            return
+        node = self.root
+        node.size += 1
+        for char in text:
+            node = node.children.setdefault(char, _TrieNode())
+            node.size += 1
+        node.ids.add(key)
+
+    def remove(self, key: int, value: Any) -> None:
+        self.unindexed.discard(key)
+        try:
+            text = _to_str(value)
+        except Exception:
+            return
+        path = [self.root]
+        for char in text:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        if key not in path[-1].ids:
+            return
+        path[-1].ids.discard(key)
+        for node in path:
+            node.size -= 1
+        for char, parent, node in zip(reversed(text), reversed(path[:-1]), reversed(path[1:])):
+            if node.size:
+                break
+            del parent.children[char]
+
+    def lookup(self, op: str, value: Any) -> _Lookup | None:
+        if op != "startswith":
+            return None
+        node = self.root
+        for char in _to_str(value):
+            node = node.children.get(char)
+            if node is None:
+                return len(self.unindexed), self.unindexed.copy
+
+        def collect() -> set[int]:
+            found = set(self.unindexed)
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                found |= current.ids
+                stack.extend(current.children.values())
+            return found
+
+        return node.size + len(self.unindexed), collect
+
+
+_INDEX_KINDS = {"hash": HashIndex, "range": SortedIndex, "prefix": PrefixIndex}
+
+
+class IndexedCollection:
+
+    def __init__(self, items: Iterable[Any] = (), *, parser: DictASTFilterParser | None = None):
+        self._parser = parser or DictASTFilterParser()
+        self._items: dict[int, Any] = {}
+        self._ids = count()
+        self._indexes: dict[str, dict[str, Any]] = {}
+        self._accessors: dict[str, Any] = {}
+        self._views: WeakSet[FilterView] = WeakSet()
+        for item in items:
+            self.insert(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items.values())
+
+    def __getitem__(self, key: int) -> Any:
+        return self._items[key]
+
+    def keys(self) -> Iterable[int]:
+        return self._items.keys()
+
+    # -------- indexes --------
+    def create_index(self, path: str, kind: str = "hash") -> None:
+        if kind not in _INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {kind!r}, expected one of {', '.join(_INDEX_KINDS)}")
+        path = path.strip()
+        by_kind = self._indexes.setdefault(path, {})
+        if kind in by_kind:
+            return
+        access = self._accessors.setdefault(path, _make_accessor(path))
+        index = by_kind[kind] = _INDEX_KINDS[kind](path)
+        for key, item in self._items.items():
+            index.add(key, access(item))
+
+    def drop_index(self, path: str, kind: str = "hash") -> None:
+        self._indexes.get(path.strip(), {}).pop(kind, None)
+
+    # -------- mutation --------
+    def _index(self, key: int, item: Any, remove: bool = False) -> None:
+        for path, by_kind in self._indexes.items():
+            value = self._accessors[path](item)
+            for index in by_kind.values():
+                if remove:
+                    index.remove(key, value)
+                else:
+                    index.add(key, value)
+
+    def insert(self, item: Any) -> int:
+        key = next(self._ids)
+        self._items[key] = item
+        self._index(key, item)
+        for view in list(self._views):
+            view.insert(key, item)
+        return key
+
+    def update(self, key: int, item: Any, changed: Iterable[str] | None = None) -> None:
+        # `changed` (dotted paths that differ) lets views skip rows their filter does not read
+        self._index(key, self._items[key], remove=True)
+        self._items[key] = item
+        self._index(key, item)
+        for view in list(self._views):
+            view.update(key, item, changed)
+
+    def delete(self, key: int) -> Any:
+        item = self._items.pop(key)
+        self._index(key, item, remove=True)
+        for view in list(self._views):
+            view.delete(key)
+        return item
+
+    # -------- views --------
+    def create_view(self, filter_string: str | Node) -> FilterView:
+        # kept current by insert/update/delete for as long as the caller holds on to it
+        view = FilterView(filter_string, self._items.items(), parser=self._parser)
+        self._views.add(view)
+        return view
+
+    # -------- planning --------
+    # Skip an AND branch whose candidates outnumber the current ones by more than this;
+    # running the residual over the smaller set is cheaper than building the larger one.
+    INTERSECT_RATIO = 4
+
+    def _lookup(self, node: BinOp) -> _Lookup | None:
+        if len(node.operands) != 2:
+            return None
+        op, (a, b) = node.op, node.operands
+        if isinstance(a, Literal) and isinstance(b, Column) and op in _FLIPPED:
+            op, a, b = _FLIPPED[op], b, a
+        if not (isinstance(a, Column) and isinstance(b, Literal)):
+            return None
+        lookups = [index.lookup(op, b.value) for index in self._indexes.get(a.name.strip(), {}).values()]
+        return min((lookup for lookup in lookups if lookup is not None), default=None, key=lambda lookup: lookup[0])
+
+    def _plan(self, node: Node) -> _Lookup | None:
+        if isinstance(node, BinOp):
+            return self._lookup(node)
+        if not isinstance(node, BoolOp):
+            return None
+        plans = [self._plan(operand) for operand in node.operands]
+        if node.op == "OR":
+            if any(plan is None for plan in plans):
+                return None
+            return sum(size for size, _ in plans), lambda: set().union(*(thunk() for _, thunk in plans))
+        known = sorted((plan for plan in plans if plan is not None), key=lambda plan: plan[0])
+        if not known:
+            return None
+
+        def intersect() -> set[int]:
+            found = known[0][1]()
+            for size, thunk in known[1:]:
+                if not found or size > self.INTERSECT_RATIO * len(found):
+                    break
+                found &= thunk()
+            return found
+
+        return known[0][0], intersect
+
+    def candidates(self, node: Node) -> set[int] | None:
+        # a superset of the matching ids, or None when only a full scan will do
+        plan = self._plan(node)
+        return None if plan is None else plan[1]()
+
+    def iter_filter(self, filter_string: str | Node, *, top: int | None = None, skip: int = 0) -> Iterator[Any]:
+        if (top is not None and top < 0) or skip < 0:
+            raise ValueError("top and skip must be non-negative")
+        pred = self._parser.create_predicate(filter_string)
+        found = self.candidates(parse_ast(filter_string) if isinstance(filter_string, str) else filter_string)
+        if found is None:
+            rows = iter(self._items.values())
+        else:
+            rows = (self._items[key] for key in sorted(found))
+        return islice(filter(pred, rows), skip, None if top is None else skip + top)
+
+    def filter(self, filter_string: str | Node, *, top: int | None = None, skip: int = 0) -> list[Any]:
+        return list(self.iter_filter(filter_string, top=top, skip=skip))
@@ -0,0 +1,138 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from threading import Lock
+from typing import Any, Callable, NamedTuple
+
+# Bounds on what a filter may cost to parse. Both parsers are recursive descent, so depth is
+# what exhausts the stack, and pyparsing's time grows with depth and length. check_filter
+# runs before any parse and works on the text with quoted strings blanked out: length, an
+# upper bound of the AST size (operands, operators, function names) from regex counts, and
+# only when the text has enough brackets to matter, a scan of bracket nesting and of the
+# items of collection literals. parse_ast applies the process-wide limits (set_limits)
+# to every string it has not parsed before.
+
+_QUOTED = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*\"""")
+_ATOM = re.compile(r"[^\s()\[\],]+")
+_KEYWORD = re.compile(r"(?<![^\s()])(?:AND|OR)(?![^\s()])", re.IGNORECASE)
+_STRUCTURE = re.compile(r"[()\[\],]")
+
+
+class FilterLimits(NamedTuple):
+    max_length: int = 8192
+    max_depth: int = 64
+    max_nodes: int = 1024
+    max_collection: int = 512
+
+
+DEFAULT_LIMITS = FilterLimits()
+
+
+class FilterComplexityError(ValueError):
+    # limit is "length", "depth", "nodes", "collection" or "time"
+
+    def __init__(self, limit: str, value: float, maximum: float):
+        if limit == "time":
+            super().__init__(f"Filter parse did not finish within {maximum} s")
+        else:
+            super().__init__(f"Filter exceeds the {limit} limit ({value} > {maximum})")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "error": "filter_too_complex",
+            "limit": self.limit,
+            "value": self.value,
+            "maximum": self.maximum,
+        }
+
+
+_limits: FilterLimits | None = DEFAULT_LIMITS
+
+
+def set_limits(limits: FilterLimits | None) -> None:
+    # process-wide; None disables the checks
+    global _limits
+    _limits = limits
+
+
+def get_limits() -> FilterLimits | None:
+    return _limits
+
+
+def check_filter(filter_string: str, limits: FilterLimits | None = None) -> None:
+    limits = limits or _limits
+    if limits is None:
+        return
+    if len(filter_string) > limits.max_length:
+        raise FilterComplexityError("length", len(filter_string), limits.max_length)
+    # quoted strings become empty literals, so nothing inside them counts
+    stripped = _QUOTED.sub("''", filter_string)
+    nodes = len(_ATOM.findall(stripped)) - len(_KEYWORD.findall(stripped))
+    if nodes > limits.max_nodes:
+        raise FilterComplexityError("nodes", nodes, limits.max_nodes)
+    if stripped.count("(") + stripped.count("[") <= limits.max_depth and "[" not in stripped:
+        return
+    depth = 0
+    items = None  # item count of the innermost open collection literal
+    collections: list[int | None] = []
+    for match in _STRUCTURE.finditer(stripped):
+        token = match.group()
+        if token in "([":
+            depth += 1
+            if depth > limits.max_depth:
+                raise FilterComplexityError("depth", depth, limits.max_depth)
+            collections.append(items)
+            items = 1 if token == "[" else None
+        elif token in ")]":
+            depth = max(depth - 1, 0)
+            items = collections.pop() if collections else None
+        elif items is not None:
+            items += 1
+            if items > limits.max_collection:
+                raise FilterComplexityError("collection", items, limits.max_collection)
+
+
+# -------- deadlines --------
+# Parsing is pure Python and cannot be interrupted; a parse that misses its deadline keeps
+# its worker thread until it finishes, and the small pool bounds how many can pile up.
+PARSE_WORKERS = 4
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="filter-parse")
+        return _executor
+
+
+def _default_parse(filter_string: str) -> Any:
+    from parser import parse_ast
+
+    return parse_ast(filter_string)
+
+
+def parse_with_deadline(filter_string: str, timeout: float, parse: Callable[[str], Any] | None = None) -> Any:
+    # parse_ast (or `parse`) in a worker thread, giving up after `timeout` seconds
+    future = _pool().submit(parse or _default_parse, filter_string)
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise FilterComplexityError("time", timeout, timeout) from None
+
+
+async def parse_async(filter_string: str, timeout: float, parse: Callable[[str], Any] | None = None) -> Any:
+    # awaits the parse in the worker pool, so the event loop keeps serving other requests
+    future = asyncio.get_running_loop().run_in_executor(_pool(), parse or _default_parse, filter_string)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise FilterComplexityError("time", timeout, timeout) from None
@@ -0,0 +1,252 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Any, Hashable, Iterable
+
+from parser import parse_ast
+from parser.indexed import _hashable
+from parser.nodes import BinOp, BoolOp, Column, Literal, Node, ordering_family
+from parser.py_ast_dict import DSLParseError, _make_accessor, compile_predicate
+
+# Matches one event against many stored filters. Each filter is split into OR clauses of
+# AND conjuncts. Conjuncts are hash-consed nodes, so a condition shared by many
+# subscriptions is compiled once and evaluated at most once per event. Every clause is
+# anchored on one indexable conjunct (column eq/in literal, or a range against a literal);
+# per column, equality anchors sit in a hash table and range anchors in sorted threshold
+# lists, so an event only reaches the clauses whose anchor it can satisfy. Clauses without
+# an anchor are always evaluated. Results equal create_predicate(filter)(event), including
+# the rule that an exception anywhere in evaluation order makes the whole filter fail.
+
+_FLIPPED = {"gt": "lt", "lt": "gt", "ge": "le", "le": "ge", "eq": "eq"}
+_RANGE_OPS = ("gt", "ge", "lt", "le")
+
+_RAISED = object()
+
+
+def _flatten(node: Node, op: str) -> list[Node]:
+    if isinstance(node, BoolOp) and node.op == op:
+        return [leaf for operand in node.operands for leaf in _flatten(operand, op)]
+    return [node]
+
+
+def _anchor(node: Node) -> tuple[str, str, Any] | None:
+    # (path, op, literal) for conditions the indexes can answer
+    if not isinstance(node, BinOp) or len(node.operands) != 2:
+        return None
+    op, (a, b) = node.op, node.operands
+    if isinstance(a, Literal) and isinstance(b, Column) and op in _FLIPPED:
+        op, a, b = _FLIPPED[op], b, a
+    if not (isinstance(a, Column) and isinstance(b, Literal)):
+        return None
+    if op in ("eq", "in") and _hashable(b.value):
+        return a.name.strip(), "eq", b.value
+    if op in _RANGE_OPS and b.value is not None and ordering_family(b.value) is not None:
+        return a.name.strip(), op, b.value
+    return None
+
+
+class _ColumnIndex:
+    def __init__(self, path: str):
+        self.access = _make_accessor(path)
+        self.equal: dict[Any, set[Node]] = defaultdict(set)
+        # family -> op -> (sorted thresholds, anchors)
+        self.ranges: dict[Any, dict[str, tuple[list[Any], list[Node]]]] = defaultdict(dict)
+        self.size = 0
+
+    def add(self, op: str, value: Any, anchor: Node) -> None:
+        self.size += 1
+        if op == "eq":
+            self.equal[value].add(anchor)
+            return
+        thresholds, anchors = self.ranges[ordering_family(value)].setdefault(op, ([], []))
+        i = bisect_right(thresholds, value)
+        thresholds.insert(i, value)
+        anchors.insert(i, anchor)
+
+    def remove(self, op: str, value: Any, anchor: Node) -> None:
+        self.size -= 1
+        if op == "eq":
+            self.equal[value].discard(anchor)
+            if not self.equal[value]:
+                del self.equal[value]
+            return
+        by_op = self.ranges[ordering_family(value)]
+        thresholds, anchors = by_op[op]
+        i = bisect_left(thresholds, value)
+        while anchors[i] is not anchor:
+            i += 1
+        del thresholds[i], anchors[i]
+
+    def candidates(self, event: Any) -> Iterable[Node]:
+        try:
+            value = self.access(event)
+        except Exception:
+            value = _RAISED
+        if value is _RAISED or not _hashable(value):
+            yield from (anchor for anchors in self.equal.values() for anchor in anchors)
+        else:
+            yield from self.equal.get(value, ())
+        if value is None:
+            return  # ordering against None is always False
+        family = ordering_family(value) if value is not _RAISED else None
+        if family is None:
+            for by_op in self.ranges.values():
+                for _, anchors in by_op.values():
+                    yield from anchors
+            return
+        by_op = self.ranges.get(family, {})
+        for op, (thresholds, anchors) in by_op.items():
+            if op == "gt":  # threshold < value
+                yield from anchors[: bisect_left(thresholds, value)]
+            elif op == "ge":
+                yield from anchors[: bisect_right(thresholds, value)]
+            elif op == "lt":  # threshold > value
+                yield from anchors[bisect_right(thresholds, value) :]
+            else:
+                yield from anchors[bisect_left(thresholds, value) :]
+
+
+class _Clause:
+    __slots__ = ("conjuncts", "anchor", "owners")
+
+    def __init__(self, conjuncts: tuple[Node, ...], anchor: tuple[str, str, Any] | None):
+        self.conjuncts = conjuncts
+        self.anchor = anchor
+        self.owners: dict[Hashable, None] = {}
+
+
+class SubscriptionMatcher:
+
+    def __init__(self, subscriptions: Iterable[tuple[Hashable, str | Node]] = ()):
+        self._subscriptions: dict[Hashable, tuple[Node, ...]] = {}
+        self._clauses: dict[Node, _Clause] = {}
+        self._conjuncts: dict[Node, list] = {}  # node -> [predicate, references]
+        self._columns: dict[str, _ColumnIndex] = {}
+        self._anchored: dict[Node, list[Node]] = defaultdict(list)  # anchor conjunct -> clauses
+        self._unanchored: dict[Node, None] = {}
+        for subscription_id, filter_string in subscriptions:
+            self.add(subscription_id, filter_string)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __contains__(self, subscription_id: Hashable) -> bool:
+        return subscription_id in self._subscriptions
+
+    # -------- registration --------
+    def add(self, subscription_id: Hashable, filter_string: str | Node) -> None:
+        try:
+            node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+            clauses = tuple(_flatten(node, "OR"))
+            for clause in clauses:
+                for conjunct in _flatten(clause, "AND"):
+                    if conjunct not in self._conjuncts:
+                        compile_predicate(conjunct)  # surface errors before touching any state
+        except Exception as e:
+            raise DSLParseError(f"DSL parse error: {e}") from e
+        if subscription_id in self._subscriptions:
+            self.remove(subscription_id)
+        self._subscriptions[subscription_id] = clauses
+        for clause in dict.fromkeys(clauses):
+            self._register(clause).owners[subscription_id] = None
+
+    def remove(self, subscription_id: Hashable) -> None:
+        for clause in dict.fromkeys(self._subscriptions.pop(subscription_id)):
+            entry = self._clauses[clause]
+            entry.owners.pop(subscription_id, None)
+            if not entry.owners:
+                self._unregister(clause, entry)
+
+    def _register(self, clause: Node) -> _Clause:
+        entry = self._clauses.get(clause)
+        if entry is not None:
+            return entry
+        conjuncts = tuple(_flatten(clause, "AND"))
+        for conjunct in conjuncts:
+            slot = self._conjuncts.get(conjunct)
+            if slot is None:
+                slot = self._conjuncts[conjunct] = [compile_predicate(conjunct, guarded=False), 0]
+            slot[1] += 1
+        # equality beats ranges as an anchor; among equals, prefer a column with fewer entries
+        anchors = [(conjunct, _anchor(conjunct)) for conjunct in conjuncts]
+        anchors = [(c, a) for c, a in anchors if a is not None]
+        anchors.sort(key=lambda ca: (ca[1][1] != "eq", self._columns[ca[1][0]].size if ca[1][0] in self._columns else 0))
+        if anchors:
+            conjunct, anchor = anchors[0]
+            column = self._columns.get(anchor[0])
+            if column is None:
+                column = self._columns[anchor[0]] = _ColumnIndex(anchor[0])
+            if not self._anchored[conjunct]:
+                column.add(anchor[1], anchor[2], conjunct)
+            self._anchored[conjunct].append(clause)
+        else:
+            conjunct = anchor = None
+            self._unanchored[clause] = None
+        entry = self._clauses[clause] = _Clause(conjuncts, anchor and (conjunct, *anchor))
+        return entry
+
+    def _unregister(self, clause: Node, entry: _Clause) -> None:
+        del self._clauses[clause]
+        for conjunct in entry.conjuncts:
+            slot = self._conjuncts[conjunct]
+            slot[1] -= 1
+            if not slot[1]:
+                del self._conjuncts[conjunct]
+        if entry.anchor is None:
+            del self._unanchored[clause]
+            return
+        conjunct, path, op, value = entry.anchor
+        self._anchored[conjunct].remove(clause)
+        if not self._anchored[conjunct]:
+            del self._anchored[conjunct]
+            column = self._columns[path]
+            column.remove(op, value, conjunct)
+            if not column.size:
+                del self._columns[path]
+
+    # -------- matching --------
+    def _conjunct(self, conjunct: Node, event: Any, memo: dict[Node, Any]) -> Any:
+        result = memo.get(conjunct)
+        if result is None:
+            try:
+                result = self._conjuncts[conjunct][0](event)
+            except Exception:
+                result = _RAISED
+            memo[conjunct] = result
+        return result
+
+    def _clause(self, clause: Node, event: Any, memo: dict[Node, Any]) -> Any:
+        # True, False or _RAISED, in the order `a and b and ...` would evaluate
+        result = memo.get(clause)
+        if result is None:
+            result = True
+            for conjunct in self._clauses[clause].conjuncts:
+                result = self._conjunct(conjunct, event, memo)
+                if result is not True:
+                    break
+            memo[clause] = result
+        return result
+
+    def match(self, event: Any) -> set[Hashable]:
+        memo: dict[Node, Any] = {}
+        candidates: dict[Node, None] = dict(self._unanchored)
+        for column in self._columns.values():
+            for conjunct in column.candidates(event):
+                candidates.update(dict.fromkeys(self._anchored[conjunct]))
+        matched: set[Hashable] = set()
+        for clause in candidates:
+            if self._clause(clause, event, memo) is not True:
+                continue
+            for subscription_id in self._clauses[clause].owners:
+                if subscription_id in matched:
+                    continue
+                # earlier clauses of an OR must not have raised
+                for earlier in self._subscriptions[subscription_id]:
+                    result = self._clause(earlier, event, memo)
+                    if result is not False:
+                        if result is True:
+                            matched.add(subscription_id)
+                        break
+        return matched
+
+    def match_many(self, events: Iterable[Any]) -> Iterable[set[Hashable]]:
+        return map(self.match, events)
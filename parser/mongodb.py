@@ -1,7 +1,58 @@
-from . import FilterParser
+import re
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from . import FilterParser, parse_select
+from .aggregate import Aggregation, parse_apply
+from .nodes import BinOp, Call, Column, Literal, Node, columns
+from .paging import parse_orderby, seek_condition, with_tiebreaker
+from .py_ast_dict import DictASTFilterParser
+
+_BSON_LITERALS = (int, float, str, bool, type(None), datetime)
+_REGEX_SPECIAL = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+_python = DictASTFilterParser()
+
+
+def _operators(cond) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(key.startswith("$") for key in cond)
+
+
+def _equalities(doc) -> tuple[str, list] | None:
+    # (field, values) for {field: {$eq: v}} and {field: {$in: [...]}}
+    if not isinstance(doc, dict) or len(doc) != 1:
+        return None
+    ((field, cond),) = doc.items()
+    if field.startswith("$") or not isinstance(cond, dict) or len(cond) != 1:
+        return None
+    if "$eq" in cond:
+        return field, [cond["$eq"]]
+    if isinstance(cond.get("$in"), list):
+        return field, cond["$in"]
+    return None
+
+
+def _field(doc: dict, path: str) -> Any:
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def _include(projection: dict, fields: Sequence[str]) -> dict:
+    # adds inclusions without overlapping paths, which MongoDB rejects: a field under an
+    # included parent is already there, an included field under a new parent gives way to it
+    included = [path for path, value in projection.items() if value]
+    for field in fields:
+        if not any(field == path or field.startswith(path + ".") for path in included):
+            included = [path for path in included if not path.startswith(field + ".")] + [field]
+    return {path: value for path, value in projection.items() if not value} | dict.fromkeys(included, 1)
 
 
 class MongoDbFilterParser(FilterParser):
+    # quoted literals double as field names here, and one condition on an array field can
+    # match different elements, so `x eq 1 AND x eq 2` is satisfiable
+    fold_constants = False
+    detect_contradictions = False
 
     @staticmethod
     def mongo_unary(op: str):
@@ -24,6 +75,67 @@ class MongoDbFilterParser(FilterParser):
 
         return gen
 
+    @staticmethod
+    def mongo_flatten(op: str, args) -> list:
+        docs = []
+        for doc in args:
+            if isinstance(doc, dict) and list(doc) == [op]:
+                docs += doc[op]
+            else:
+                docs.append(doc)
+        return docs
+
+    @staticmethod
+    def mongo_and(*args):
+        # field conditions merge into one document ({a: {$gt: 1, $lt: 5}}) unless an operator
+        # repeats; whatever does not merge stays in $and
+        merged: dict = {}
+        rest = []
+        for doc in MongoDbFilterParser.mongo_flatten("$and", args):
+            if isinstance(doc, dict) and all(
+                not field.startswith("$")
+                and (
+                    field not in merged
+                    or _operators(merged[field]) and _operators(cond) and not merged[field].keys() & cond.keys()
+                )
+                for field, cond in doc.items()
+            ):
+                for field, cond in doc.items():
+                    merged[field] = {**merged[field], **cond} if field in merged else cond
+            else:
+                rest.append(doc)
+        if not rest:
+            return merged
+        docs = [merged, *rest] if merged else rest
+        return docs[0] if len(docs) == 1 else {"$and": docs}
+
+    @staticmethod
+    def mongo_or(*args):
+        # equalities on one field collapse into {field: {$in: [...]}}
+        docs: list = []
+        values: dict[str, list] = {}
+        originals: dict[str, dict] = {}
+        for doc in MongoDbFilterParser.mongo_flatten("$or", args):
+            found = _equalities(doc)
+            if found is None:
+                docs.append(doc)
+                continue
+            field, new = found
+            if field not in values:
+                values[field] = []
+                originals[field] = doc
+                docs.append(field)
+            else:
+                originals.pop(field, None)
+            # 1 == True in Python, not in Mongo
+            seen = values[field]
+            seen += [v for v in new if not any(type(v) is type(w) and v == w for w in seen)]
+        out = [
+            doc if not isinstance(doc, str) else originals.get(doc) or {doc: {"$in": values[doc]}}
+            for doc in docs
+        ]
+        return out[0] if len(out) == 1 else {"$or": out}
+
     func_map = {
         "length": mongo_unary("$strLenCP"),
         "indexOf": mongo_unary("$indexOfCP"),
@@ -55,8 +167,8 @@ class MongoDbFilterParser(FilterParser):
         "mul": mongo_binary_op("$multiply"),
         "div": mongo_binary_op("$divide"),
         "mod": mongo_binary_op("$mod"),
-        "AND": mongo_multi_op("$and"),
-        "OR": mongo_multi_op("$or"),
+        "AND": mongo_and,
+        "OR": mongo_or,
         "like": lambda a, b: {a: {"$regex": b, "$options": "i"}},
         "endswith": lambda a, b: {a: {"$regex": b + "$", "$options": "i"}},
         "startswith": lambda a, b: {a: {"$regex": "^" + b, "$options": "i"}},
@@ -66,8 +178,193 @@ class MongoDbFilterParser(FilterParser):
         "hasNot": lambda a, b: {"$not": {a: {"$elemMatch": {"$eq": b}}}},
     }
 
-    def __init__(self):
-        super().__init__(op_map=self.op_map, func_map=self.func_map)
+    def __init__(self, *, case_sensitive_prefix: bool = False):
+        op_map = self.op_map
+        if case_sensitive_prefix:
+            # anchored, escaped and without $options, so the planner can use an index range
+            op_map = op_map | {"startswith": lambda a, b: {a: {"$regex": "^" + re.escape(str(b))}}}
+        super().__init__(op_map=op_map, func_map=self.func_map)
 
     def get_column(self, col: str):
         return col
+
+    # -------- pushdown --------
+    # find() only evaluates `field <op> literal`: per operator, the literal types it takes.
+    # Functions and arithmetic compile to aggregation expressions, `contains`/`lacks` need an
+    # array and `hasNot` a field-level $not, so those always stay in the Python residual.
+    pushdown = {
+        "eq": _BSON_LITERALS,
+        "ne": _BSON_LITERALS,
+        "gt": _BSON_LITERALS,
+        "lt": _BSON_LITERALS,
+        "ge": _BSON_LITERALS,
+        "le": _BSON_LITERALS,
+        "like": (str,),
+        "startswith": (str,),
+        "endswith": (str,),
+        "has": _BSON_LITERALS,
+    }
+
+    def supports(self, node: Node) -> bool:
+        if not isinstance(node, BinOp) or node.op not in self.pushdown or len(node.operands) != 2:
+            return False
+        field, value = node.operands
+        if not (isinstance(field, Column) and isinstance(value, Literal)):
+            return False
+        if type(value.value) not in self.pushdown[node.op]:
+            return False
+        # patterns are spliced into a regex unescaped
+        return node.op not in ("like", "startswith", "endswith") or not _REGEX_SPECIAL.search(value.value)
+
+    def create_hybrid_filter(self, filter_string: str) -> tuple[dict, Callable[[Any], bool] | None]:
+        # a find() query for what MongoDB can evaluate and a predicate for the rest (None
+        # when everything was pushed down); a document matches when both accept it
+        pushed, residual = self.split_filter(filter_string)
+        query = {} if pushed is None else self.create_filter(pushed)
+        return query, None if residual is None else _python.create_predicate(residual)
+
+    # -------- $select --------
+    def create_projection(self, fields: str | Sequence[str]) -> dict[str, int]:
+        # inclusion projection for find(); _id stays included as usual. A path under an
+        # included parent is dropped, since MongoDB rejects overlapping projection paths.
+        paths = parse_select(fields)
+        return {
+            path: 1
+            for path in paths
+            if not any(path.startswith(parent + ".") for parent in paths if parent != path)
+        }
+
+    # -------- streaming --------
+    async def stream(
+        self,
+        collection,
+        filter_string: str,
+        *,
+        orderby: str | Sequence[str] | None = None,
+        page_size: int = 1000,
+        projection: dict | str | Sequence[str] | None = None,
+    ) -> AsyncIterator[dict]:
+        # keyset-paginated over a Motor collection: every page is a sorted, limited find()
+        # after the previous page's last key, never a skip()
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        keys = with_tiebreaker(parse_orderby(orderby), ["_id"])
+        sort = [(field, -1 if descending else 1) for field, descending in keys]
+        pushed, residual = self.split_filter(filter_string)
+        query = {} if pushed is None else self.create_filter(pushed)
+        residual_pred = None if residual is None else _python.create_predicate(residual)
+        if projection is not None and not isinstance(projection, dict):
+            projection = self.create_projection(projection)
+        if projection is not None:
+            needed = [field for field, _ in keys] + sorted(columns(residual) if residual is not None else ())
+            excluded = [path for path, value in projection.items() if value == 0]
+            if any(field == path or field.startswith(path + ".") for field in needed for path in excluded):
+                raise ValueError("projection cannot exclude sort keys or fields of the Python residual")
+            if any(projection.values()):
+                projection = _include(projection, needed)
+        last = None
+        while True:
+            page_query = query
+            if last is not None:
+                seek = seek_condition(
+                    keys,
+                    last,
+                    eq=lambda field, value: {field: value},
+                    after=lambda field, value, descending: {field: {"$lt" if descending else "$gt": value}},
+                    all_of=self.mongo_and,
+                    any_of=self.mongo_or,
+                    is_null=lambda field: {field: None},  # null or missing, which sort alike
+                    not_null=lambda field: {field: {"$ne": None}},
+                )
+                page_query = self.mongo_and(query, seek)
+            cursor = collection.find(page_query, projection).sort(sort).limit(page_size).batch_size(page_size)
+            count = 0
+            async for doc in cursor:
+                count += 1
+                last = [_field(doc, field) for field, _ in keys]
+                if residual_pred is None or residual_pred(doc):
+                    yield doc
+            if count < page_size:
+                return
+
+    # -------- $apply --------
+    # groupby/aggregate runs in the server as $match + $group when the filter pushes down
+    # whole; otherwise the documents are streamed and aggregated in Python. Group keys and
+    # aggregates are named k0.., a0.. inside the pipeline (aliases may contain dots) and
+    # renamed in aggregate().
+    def _expression(self, node: Node) -> Any:
+        if isinstance(node, Column):
+            return "$" + node.name
+        if isinstance(node, Literal):
+            return {"$literal": node.value}
+        if isinstance(node, Call):
+            funcs = {name.lower(): fn for name, fn in self.func_map.items()}
+            if node.name in funcs:
+                try:
+                    return funcs[node.name](*[self._expression(arg) for arg in node.args])
+                except TypeError:
+                    pass
+            raise ValueError(f"Function {node.name}/{len(node.args)} is not supported in a MongoDB $group")
+        raise ValueError(f"Unsupported $apply expression {node!r}")
+
+    def _accumulators(self, aggregation: Aggregation) -> dict[str, Any]:
+        group: dict[str, Any] = {}
+        for i, item in enumerate(aggregation.aggregates):
+            if item.method == "$count":
+                group[f"a{i}"] = {"$sum": 1}
+                continue
+            value = self._expression(item.expression)
+            if item.method == "count":
+                # missing fields are null too
+                group[f"a{i}"] = {"$sum": {"$cond": [{"$eq": [{"$ifNull": [value, None]}, None]}, 0, 1]}}
+            elif item.method == "sum":
+                # $sum gives 0 without numbers; n{i} turns that into null as in SQL
+                group[f"a{i}"] = {"$sum": value}
+                group[f"n{i}"] = {"$sum": {"$cond": [{"$isNumber": value}, 1, 0]}}
+            else:
+                group[f"a{i}"] = {f"${item.method}": value}
+        return group
+
+    def create_pipeline(self, filter_string: str | Node | None, apply: str | Aggregation) -> list[dict]:
+        # raises ValueError when part of the filter needs Python; aggregate() handles that
+        aggregation = parse_apply(apply)
+        pushed, residual = (None, None) if filter_string is None else self.split_filter(filter_string)
+        if residual is not None:
+            raise ValueError("The filter cannot be pushed down whole; use aggregate()")
+        group_id = {f"k{i}": self._expression(expression) for i, (_, expression) in enumerate(aggregation.groupby)}
+        pipeline = [] if pushed is None else [{"$match": self.create_filter(pushed)}]
+        pipeline.append({"$group": {"_id": group_id or None, **self._accumulators(aggregation)}})
+        return pipeline
+
+    @staticmethod
+    def _result_row(doc: dict, aggregation: Aggregation) -> dict[str, Any]:
+        keys = doc.get("_id") or {}
+        row = {alias: keys.get(f"k{i}") for i, (alias, _) in enumerate(aggregation.groupby)}
+        for i, item in enumerate(aggregation.aggregates):
+            value = doc.get(f"a{i}")
+            row[item.alias] = None if item.method == "sum" and not doc.get(f"n{i}") else value
+        return row
+
+    async def aggregate(
+        self,
+        collection,
+        filter_string: str | Node | None,
+        apply: str | Aggregation,
+        *,
+        page_size: int = 1000,
+    ) -> list[dict[str, Any]]:
+        # rows of group keys and aggregates by alias, in no particular order; without groupby
+        # there is exactly one row
+        aggregation = parse_apply(apply)
+        residual = None if filter_string is None else self.split_filter(filter_string)[1]
+        if residual is None:
+            pipeline = self.create_pipeline(filter_string, aggregation)
+            rows = [self._result_row(doc, aggregation) async for doc in collection.aggregate(pipeline)]
+            if not rows and not aggregation.groupby:
+                rows = _python.create_aggregator(aggregation).result()
+            return rows
+        aggregator = _python.create_aggregator(aggregation)
+        fields = sorted(aggregation.columns())
+        async for doc in self.stream(collection, filter_string, page_size=page_size, projection=fields or None):
+            aggregator.add(doc)
+        return aggregator.result()
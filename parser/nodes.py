@@ -0,0 +1,163 @@
+from datetime import date, datetime, time
+from threading import Lock
+from typing import Iterator
+from weakref import WeakValueDictionary
+
+# Backend-neutral filter AST. Nodes are immutable and hash-consed: building a node that is
+# structurally equal to a live one returns the existing instance, so equal subtrees compare
+# (and hash) by identity and can key caches directly.
+
+# Every operator/function any backend understands, in the order the operator regex needs
+# (op_map order, "in" slotted where the Python backend has it).
+OPERATORS = tuple(
+    "eq ne gt lt ge le add sub mul div mod AND OR like endswith startswith contains lacks in has hasNot".split()
+)
+BOOL_OPERATORS = ("AND", "OR")
+FUNCTIONS = tuple(
+    "length indexof replace substring tolower toupper trim round floor ceiling".split()
+    + "year month day hour minute second".split()
+)
+
+_interned: WeakValueDictionary = WeakValueDictionary()
+_interned_lock = Lock()
+
+
+class Node:
+    __slots__ = ("__weakref__",)
+    __match_args__: tuple[str, ...] = ()
+
+    def __new__(cls, *fields):
+        key = cls._key(fields)
+        node = _interned.get(key)
+        if node is None:
+            with _interned_lock:
+                node = _interned.get(key)
+                if node is None:
+                    node = object.__new__(cls)
+                    for name, value in zip(cls.__match_args__, fields):
+                        object.__setattr__(node, name, value)
+                    _interned[key] = node
+        return node
+
+    @classmethod
+    def _key(cls, fields: tuple) -> tuple:
+        return (cls, *fields)
+
+    @property
+    def fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__match_args__)
+
+    def children(self) -> tuple["Node", ...]:
+        return ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), self.fields
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(map(repr, self.fields))})"
+
+
+class Literal(Node):
+    __slots__ = ("value",)
+    __match_args__ = ("value",)
+
+    @classmethod
+    def _key(cls, fields: tuple) -> tuple:
+        # 1, 1.0 and True are equal and hash alike but are different literals
+        return (cls, type(fields[0]), fields[0])
+
+
+class Column(Node):
+    __slots__ = ("name",)
+    __match_args__ = ("name",)
+
+
+class Call(Node):
+    __slots__ = ("name", "args")
+    __match_args__ = ("name", "args")
+
+    def children(self):
+        return self.args
+
+
+class BinOp(Node):
+    # usually two operands; a collection literal is flattened into the condition by the
+    # grammar, so `a in [x, y, z]` reaches the operator as (a, x, z) just like op_map sees it
+    __slots__ = ("op", "operands")
+    __match_args__ = ("op", "operands")
+
+    def children(self):
+        return self.operands
+
+    @property
+    def left(self) -> Node:
+        return self.operands[0]
+
+    @property
+    def right(self) -> Node:
+        return self.operands[1]
+
+
+class BoolOp(Node):
+    __slots__ = ("op", "operands")
+    __match_args__ = ("op", "operands")
+
+    def children(self):
+        return self.operands
+
+
+class Param(Node):
+    # stands for the index-th literal of a filter whose values are supplied separately
+    __slots__ = ("index", "kind")
+    __match_args__ = ("index", "kind")
+
+
+def walk(node: Node) -> Iterator[Node]:
+    yield node
+    for child in node.children():
+        yield from walk(child)
+
+
+def columns(node: Node) -> set[str]:
+    return {n.name for n in walk(node) if isinstance(n, Column)}
+
+
+def ordering_family(value) -> object:
+    # values of one family are totally ordered among themselves; None for anything else
+    kind = type(value)
+    if kind in (int, bool) or (kind is float and value == value):
+        return int
+    if kind is str or kind is date:
+        return kind
+    if kind in (datetime, time):
+        # naive and aware values do not compare
+        return kind, value.tzinfo is None
+    return None
+
+
+# literal types that become parameters; None and booleans stay in the shape because
+# backends render them differently (IS NULL, IS true)
+_PARAMETERIZED = (int, float, str, date, datetime, time)
+
+
+def parameterize(node: Node) -> tuple[Node, tuple]:
+    # (shape, values): literals replaced by Param nodes in pre-order, so filters that only
+    # differ in their values share one shape
+    values: list = []
+
+    def strip(current: Node) -> Node:
+        if isinstance(current, Literal):
+            if type(current.value) in _PARAMETERIZED:
+                values.append(current.value)
+                return Param(len(values) - 1, type(current.value))
+            return current
+        if isinstance(current, Call):
+            return Call(current.name, tuple(map(strip, current.args)))
+        if isinstance(current, (BinOp, BoolOp)):
+            return type(current)(current.op, tuple(map(strip, current.operands)))
+        return current
+
+    return strip(node), tuple(values)
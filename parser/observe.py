@@ -0,0 +1,221 @@
+import logging
+import math
+import threading
+from collections import deque
+from typing import Callable, Iterable, NamedTuple
+
+import parser as _parser_package
+from parser.nodes import Node, walk
+
+# Optional instrumentation. Parsers carry an `observer` (None by default, which costs one
+# attribute check per call) and report to it:
+#   phase(backend, phase, seconds, filter_string, nodes)
+#       "grammar"  pyparsing or the fast-path scanner turning text into a parse tree
+#       "fold"     parse_single_expression folding that tree into nodes / backend objects
+#       "parse"    text -> AST as create_filter sees it (mostly a parse_ast cache lookup)
+#       "optimize" AST rewriting
+#       "compile"  AST -> query / predicate, the backend construction
+#       "evaluate" the row loop of apply_filter / iter_filter / mask
+#   cache(cache, hit)                             one lookup in a compiled-filter cache
+#   rows(backend, scanned, matched, filter_string)  one apply_filter / iter_filter / mask call
+# Attach with parser.observe(observer); observe_parsing(observer) instruments the shared
+# string -> AST parser behind parse_ast (reported as _ASTBuilder), i.e. the "grammar" and
+# "fold" phases.
+
+
+class FilterObserver:
+    # no-op base; adapters override what they record
+
+    def phase(
+        self, backend: str, phase: str, seconds: float, filter_string: str | None = None, nodes: int | None = None
+    ) -> None:
+        pass
+
+    def cache(self, cache: str, hit: bool) -> None:
+        pass
+
+    def rows(self, backend: str, scanned: int, matched: int, filter_string: str | None = None) -> None:
+        pass
+
+
+def observe_parsing(observer: FilterObserver | None) -> None:
+    _parser_package._builder.observer = observer
+
+
+def node_count(node: Node) -> int:
+    return sum(1 for _ in walk(node))
+
+
+def filter_text(filter_string: str | Node) -> str:
+    return filter_string if isinstance(filter_string, str) else repr(filter_string)
+
+
+class MultiObserver(FilterObserver):
+
+    def __init__(self, *observers: FilterObserver):
+        self.observers = observers
+
+    def phase(self, *args, **kwargs) -> None:
+        for observer in self.observers:
+            observer.phase(*args, **kwargs)
+
+    def cache(self, *args, **kwargs) -> None:
+        for observer in self.observers:
+            observer.cache(*args, **kwargs)
+
+    def rows(self, *args, **kwargs) -> None:
+        for observer in self.observers:
+            observer.rows(*args, **kwargs)
+
+
+# -------- logging --------
+class LoggingObserver(FilterObserver):
+
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger("parser")
+        self.level = level
+
+    def phase(self, backend, phase, seconds, filter_string=None, nodes=None) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(
+                self.level, "%s %s %.3f ms nodes=%s filter=%r", backend, phase, seconds * 1e3, nodes, filter_string
+            )
+
+    def cache(self, cache, hit) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s cache %s", cache, "hit" if hit else "miss")
+
+    def rows(self, backend, scanned, matched, filter_string=None) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s scanned=%d matched=%d filter=%r", backend, scanned, matched, filter_string)
+
+
+# -------- slow filters --------
+class SlowFilter(NamedTuple):
+    backend: str
+    phase: str
+    seconds: float
+    filter_string: str | None
+
+
+class SlowFilterSampler(FilterObserver):
+    # keeps the last `maxlen` phases that took at least `threshold` seconds, with their
+    # filter text; `sink` (e.g. a logger's warning method) also receives each sample
+
+    def __init__(self, threshold: float, *, maxlen: int = 100, sink: Callable[[SlowFilter], None] | None = None):
+        self.threshold = threshold
+        self.sink = sink
+        self._samples: deque[SlowFilter] = deque(maxlen=maxlen)
+
+    def phase(self, backend, phase, seconds, filter_string=None, nodes=None) -> None:
+        if seconds >= self.threshold:
+            sample = SlowFilter(backend, phase, seconds, filter_string)
+            self._samples.append(sample)
+            if self.sink is not None:
+                self.sink(sample)
+
+    def samples(self) -> list[SlowFilter]:
+        return list(self._samples)
+
+
+# -------- Prometheus-style registry --------
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+type _Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: _Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    # in-process counters and histograms, rendered in the Prometheus text format
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[_Labels, float]] = {}
+        self._histograms: dict[str, dict[_Labels, list]] = {}
+        self._help: dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # per-bucket counts (+Inf last), sum, count
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            else:
+                state[0][-1] += 1
+            state[1] += value
+            state[2] += 1
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(name, {}).get(tuple(sorted(labels.items())), 0)
+
+    def histogram(self, name: str, **labels: str) -> tuple[float, int]:
+        # (sum, count)
+        state = self._histograms.get(name, {}).get(tuple(sorted(labels.items())))
+        return (state[1], state[2]) if state else (0.0, 0)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, (counts, total, count) in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket in zip((*self.buckets, math.inf), counts):
+                        cumulative += bucket
+                        le = 'le="+Inf"' if bound == math.inf else f'le="{bound:g}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsObserver(FilterObserver):
+
+    def __init__(self, registry: MetricsRegistry | None = None, prefix: str = "funnel"):
+        self.registry = registry or MetricsRegistry()
+        self.prefix = prefix
+        self.registry.describe(f"{prefix}_phase_seconds", "Time spent per filter phase")
+        self.registry.describe(f"{prefix}_compiled_nodes_total", "AST nodes of the filters compiled")
+        self.registry.describe(f"{prefix}_cache_lookups_total", "Compiled-filter cache lookups")
+        self.registry.describe(f"{prefix}_rows_scanned_total", "Rows a filter was evaluated on")
+        self.registry.describe(f"{prefix}_rows_matched_total", "Rows a filter matched")
+
+    def phase(self, backend, phase, seconds, filter_string=None, nodes=None) -> None:
+        self.registry.observe(f"{self.prefix}_phase_seconds", seconds, backend=backend, phase=phase)
+        if nodes is not None and phase == "compile":
+            self.registry.inc(f"{self.prefix}_compiled_nodes_total", nodes, backend=backend)
+
+    def cache(self, cache, hit) -> None:
+        self.registry.inc(f"{self.prefix}_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+    def rows(self, backend, scanned, matched, filter_string=None) -> None:
+        self.registry.inc(f"{self.prefix}_rows_scanned_total", scanned, backend=backend)
+        self.registry.inc(f"{self.prefix}_rows_matched_total", matched, backend=backend)
@@ -0,0 +1,226 @@
+import operator
+from functools import lru_cache
+from typing import Any
+
+from .nodes import BinOp, BoolOp, Call, Column, Literal, Node, ordering_family
+
+# AST -> AST rewrites applied before a backend compiles a filter: flatten AND/OR, fold
+# constant arithmetic and comparisons, drop duplicate and constant operands, merge range
+# conditions on the same column, detect contradictions, and order conjuncts cheapest first.
+#
+# The Python backend fails a row whenever evaluation raises, and AND/OR short-circuit, so
+# evaluation order is observable: in `(a gt 1 AND b eq 2) OR c eq 3`, a row where `a` is a
+# string raises in the first conjunct and must not match through `c`. Rewrites that skip or
+# reorder operands are therefore only applied where "raised" and False are
+# indistinguishable ("lenient" positions: the root, conjuncts of a lenient AND, the last
+# operand of a lenient OR), or where every operand involved cannot raise.
+
+# rough per-row cost for ordering conjuncts; equality first, text scans and calls last
+_OP_COST = {"eq": 1, "ne": 1, "in": 1, "gt": 2, "lt": 2, "ge": 2, "le": 2, "startswith": 3, "endswith": 3}
+_DEFAULT_OP_COST = 4
+_CALL_COST = 5
+
+_FLIPPED = {"gt": "lt", "lt": "gt", "ge": "le", "le": "ge", "eq": "eq"}
+_COMPARISONS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "ge": operator.ge,
+    "le": operator.le,
+}
+_ARITHMETIC = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "div": operator.truediv,
+    "mod": operator.mod,
+}
+_SAFE_OPS = frozenset(("eq", "ne", "like", "startswith", "endswith"))
+_PLAIN = (int, float, str, bool, type(None))
+
+
+def _cost(node: Node) -> int:
+    if isinstance(node, Call):
+        return _CALL_COST + sum(map(_cost, node.args))
+    if isinstance(node, BinOp):
+        return _OP_COST.get(node.op, _DEFAULT_OP_COST) + sum(map(_cost, node.operands))
+    if isinstance(node, BoolOp):
+        return sum(map(_cost, node.operands))
+    return 0
+
+
+def _safe(node: Node) -> bool:
+    # conservatively: evaluating the node can never raise in the Python backend
+    if isinstance(node, Literal):
+        return type(node.value) in _PLAIN
+    if isinstance(node, BoolOp):
+        return all(map(_safe, node.operands))
+    if not isinstance(node, BinOp) or len(node.operands) != 2:
+        return False
+    if not all(isinstance(operand, (Column, Literal)) for operand in node.operands):
+        return False
+    return node.op in _SAFE_OPS or (node.op == "in" and isinstance(node.right, Literal))
+
+
+def _flatten(nodes, op: str) -> list[Node]:
+    out = []
+    for node in nodes:
+        if isinstance(node, BoolOp) and node.op == op:
+            out += _flatten(node.operands, op)
+        else:
+            out.append(node)
+    return out
+
+
+def _fold(node: BinOp) -> Node:
+    # only folds what every backend computes identically on two Python values
+    a, b = (operand.value for operand in node.operands)
+    if type(a) not in (int, float) or type(b) not in (int, float):
+        if node.op in _COMPARISONS and ordering_family(a) is not None and ordering_family(a) == ordering_family(b):
+            return Literal(_COMPARISONS[node.op](a, b))
+        return node
+    if node.op in _COMPARISONS:
+        return Literal(_COMPARISONS[node.op](a, b))
+    if node.op in _ARITHMETIC and not (node.op in ("div", "mod") and b == 0):
+        try:
+            return Literal(_ARITHMETIC[node.op](a, b))
+        except (ArithmeticError, ValueError):
+            return node
+    return node
+
+
+def _bound(node: Node) -> tuple[tuple[str, Any], str, Any] | None:
+    # ((column, family), op, literal) for `column op literal` comparisons
+    if not isinstance(node, BinOp) or node.op not in _FLIPPED or len(node.operands) != 2:
+        return None
+    op, (a, b) = node.op, node.operands
+    if isinstance(a, Literal) and isinstance(b, Column):
+        op, a, b = _FLIPPED[op], b, a
+    if not (isinstance(a, Column) and isinstance(b, Literal)):
+        return None
+    family = ordering_family(b.value)
+    return None if family is None else ((a.name.strip(), family), op, b.value)
+
+
+def _tighter(op: str, value: Any, than: tuple[str, Any] | None, lower: bool) -> bool:
+    if than is None:
+        return True
+    other_op, other = than
+    if value != other:
+        return value > other if lower else value < other
+    return op in ("gt", "lt") and other_op not in ("gt", "lt")
+
+
+def _satisfies(value: Any, bound: tuple[str, Any] | None) -> bool:
+    return bound is None or _COMPARISONS[bound[0]](value, bound[1])
+
+
+def _merge_ranges(operands: list[Node], contradictions: bool) -> list[Node] | None:
+    # None when the conjunction can never hold
+    groups: dict[tuple[str, Any], list[tuple[int, str, Any]]] = {}
+    for i, operand in enumerate(operands):
+        bound = _bound(operand)
+        if bound is not None:
+            groups.setdefault(bound[0], []).append((i, bound[1], bound[2]))
+    dropped: set[int] = set()
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        lower = upper = None
+        lower_at = upper_at = None
+        equal: list[tuple[int, Any]] = []
+        for i, op, value in members:
+            if op == "eq":
+                equal.append((i, value))
+            elif op in ("gt", "ge") and _tighter(op, value, lower, True):
+                lower, lower_at = (op, value), i
+            elif op in ("lt", "le") and _tighter(op, value, upper, False):
+                upper, upper_at = (op, value), i
+        if equal:
+            value = equal[0][1]
+            if any(other != value for _, other in equal) or not (_satisfies(value, lower) and _satisfies(value, upper)):
+                if contradictions:
+                    return None
+                continue
+            # one equality implies every other condition in the group
+            dropped.update(i for i, _, _ in members if i != equal[0][0])
+            continue
+        if lower and upper and not _COMPARISONS["ge" if lower[0] == "ge" and upper[0] == "le" else "gt"](
+            upper[1], lower[1]
+        ):
+            if contradictions:
+                return None
+            continue
+        dropped.update(i for i, _, _ in members if i not in (lower_at, upper_at))
+    return [operand for i, operand in enumerate(operands) if i not in dropped]
+
+
+class _Optimizer:
+
+    def __init__(self, fold_constants: bool, contradictions: bool):
+        self.fold_constants = fold_constants
+        self.contradictions = contradictions
+
+    def value(self, node: Node) -> Node:
+        if isinstance(node, Call):
+            return Call(node.name, tuple(map(self.value, node.args)))
+        if isinstance(node, BinOp):
+            folded = BinOp(node.op, tuple(map(self.value, node.operands)))
+            if self.fold_constants and len(folded.operands) == 2 and all(
+                isinstance(operand, Literal) for operand in folded.operands
+            ):
+                return _fold(folded)
+            return folded
+        if isinstance(node, BoolOp):
+            return self.boolean(node, lenient=False)
+        return node
+
+    def boolean(self, node: BoolOp, lenient: bool) -> Node:
+        flat = _flatten(node.operands, node.op)
+        if node.op == "AND":
+            operands = [self.optimize(operand, lenient) for operand in flat]
+        else:
+            last = len(flat) - 1
+            operands = [self.optimize(operand, lenient and i == last) for i, operand in enumerate(flat)]
+        operands = list(dict.fromkeys(_flatten(operands, node.op)))
+        # operands after a deciding constant are never evaluated; neutral constants are no-ops
+        deciding = node.op == "OR"
+        for i, operand in enumerate(operands):
+            if isinstance(operand, Literal) and type(operand.value) in _PLAIN and bool(operand.value) is deciding:
+                operands = operands[: i + 1]
+                break
+        operands = [
+            operand
+            for operand in operands
+            if not (isinstance(operand, Literal) and type(operand.value) in _PLAIN and bool(operand.value) is not deciding)
+        ]
+        if not operands:
+            return Literal(not deciding)
+        # a trailing constant decides unless an earlier operand may raise first; for a lenient
+        # AND raising gives False too, an OR would need the earlier operands to succeed
+        tail = operands[-1]
+        if isinstance(tail, Literal) and type(tail.value) in _PLAIN:
+            if (lenient and node.op == "AND") or all(map(_safe, operands[:-1])):
+                return Literal(deciding)
+        reorderable = all(map(_safe, operands)) or (lenient and node.op == "AND")
+        if reorderable and node.op == "AND":
+            merged = _merge_ranges(operands, self.contradictions)
+            if merged is None:
+                return Literal(False)
+            operands = merged
+        if reorderable:
+            operands.sort(key=_cost)
+        return operands[0] if len(operands) == 1 else BoolOp(node.op, tuple(operands))
+
+    def optimize(self, node: Node, lenient: bool) -> Node:
+        if isinstance(node, BoolOp):
+            return self.boolean(node, lenient)
+        return self.value(node)
+
+
+@lru_cache(maxsize=1024)
+def optimize(node: Node, *, fold_constants: bool = True, contradictions: bool = True) -> Node:
+    # fold_constants / contradictions are switched off by backends where literals and
+    # fields are not told apart, or where one condition can match several values (arrays)
+    return _Optimizer(fold_constants, contradictions).optimize(node, lenient=True)
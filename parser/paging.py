@@ -0,0 +1,65 @@
+import re
+from typing import Any, Callable, Sequence
+
+# Keyset (seek) pagination shared by the streaming backends. A page is "rows after the last
+# row of the previous page in sort order", expressed as
+#   k1 > v1 OR (k1 = v1 AND k2 > v2) OR (k1 = v1 AND k2 = v2 AND k3 > v3) ...
+# with > turned into < for descending keys, so every page is an index range scan instead of
+# an OFFSET that re-reads everything before it. The sort keys must identify a row uniquely;
+# backends append their primary key. Null sorts below every value (first for ascending keys,
+# last for descending ones, MongoDB's order, which the SQL backend requests explicitly), and
+# the seek terms follow it: "after null" is "not null" ascending and nothing descending,
+# "after v" descending also takes the nulls, and `= null` is IS NULL.
+
+type SortKey = tuple[str, bool]  # (field, descending)
+
+_ORDERBY_ITEM = re.compile(r"^\s*([A-Za-z_][\w\.]*)(?:\s+(asc|desc))?\s*$", re.IGNORECASE)
+
+
+def parse_orderby(orderby: str | Sequence[str] | None) -> list[SortKey]:
+    # OData-style "$orderby": "duration desc, name" -> [("duration", True), ("name", False)]
+    if not orderby:
+        return []
+    items = orderby.split(",") if isinstance(orderby, str) else orderby
+    keys = []
+    for item in items:
+        m = _ORDERBY_ITEM.match(item)
+        if m is None:
+            raise ValueError(f"Invalid $orderby item {item!r}")
+        keys.append((m.group(1), (m.group(2) or "asc").lower() == "desc"))
+    return keys
+
+
+def with_tiebreaker(keys: list[SortKey], unique: Sequence[str]) -> list[SortKey]:
+    named = {field for field, _ in keys}
+    return keys + [(field, False) for field in unique if field not in named]
+
+
+def seek_condition(
+    keys: list[SortKey],
+    values: Sequence[Any],
+    *,
+    eq: Callable[[str, Any], Any],
+    after: Callable[[str, Any, bool], Any],
+    all_of: Callable[..., Any],
+    any_of: Callable[..., Any],
+    is_null: Callable[[str], Any],
+    not_null: Callable[[str], Any],
+) -> Any:
+    # backend-neutral OR-of-ANDs; eq/after/is_null/not_null build single conditions (never
+    # called with a None value), all_of/any_of combine them
+    branches = []
+    for i, (field, descending) in enumerate(keys):
+        value = values[i]
+        if value is None:
+            if descending:
+                continue  # nulls come last
+            step = not_null(field)
+        elif descending:
+            step = any_of(after(field, value, True), is_null(field))
+        else:
+            step = after(field, value, False)
+        terms = [is_null(prev) if v is None else eq(prev, v) for (prev, _), v in zip(keys[:i], values)]
+        terms.append(step)
+        branches.append(terms[0] if len(terms) == 1 else all_of(*terms))
+    return branches[0] if len(branches) == 1 else any_of(*branches)
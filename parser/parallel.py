@@ -0,0 +1,199 @@
+import mmap
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Mapping, Sequence
+
+import numpy as np
+
+from parser.columnar import ColumnarFilterParser, _as_array
+from parser.nodes import Node
+from parser.py_ast_dict import DictASTFilterParser
+
+# Filtering across worker processes. Only the filter (a string or a picklable Node) and the
+# data travel to a worker; each worker compiles a filter once and keeps it in its parsers'
+# caches for later chunks, and returns the positions of the matches in its chunk, which the
+# parent maps back onto its own rows in input order.
+#
+# Columnar inputs are not pickled: numeric, bool, datetime and fixed-width string columns are
+# copied into shared memory once per call, np.memmap columns are reopened from their file,
+# and every worker takes views of its slice and writes its mask straight into a shared output
+# buffer. Object columns (mixed values, lists, dicts) are pickled per chunk.
+
+SERIAL_THRESHOLD = 50_000
+CHUNKS_PER_WORKER = 4
+
+# per process, so compiled predicates outlive a single task
+_rows_parser = DictASTFilterParser()
+_columnar_parser = ColumnarFilterParser()
+
+# ("memmap", filename, dtype, offset, shape) | ("shm", name, dtype, shape)
+# | ("masked", data, mask) | ("inline", array)
+type _Column = tuple
+
+
+# -------- worker side --------
+def _match_rows(filter_string: str | Node, rows: Sequence[Any]) -> list[int]:
+    pred = _rows_parser.create_predicate(filter_string)
+    return [i for i, row in enumerate(rows) if pred(row)]
+
+
+def _attach(column: _Column, start: int, stop: int, segments: list) -> np.ndarray:
+    kind = column[0]
+    if kind == "masked":
+        return np.ma.MaskedArray(_attach(column[1], start, stop, segments), mask=_attach(column[2], start, stop, segments))
+    if kind == "memmap":
+        _, filename, dtype, offset, shape = column
+        return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape)[start:stop]
+    if kind == "shm":
+        _, name, dtype, shape = column
+        segment = shared_memory.SharedMemory(name=name)
+        segments.append(segment)
+        return np.ndarray(shape, dtype=dtype, buffer=segment.buf)[start:stop]
+    return column[1]
+
+
+def _mask_chunk(filter_string: str | Node, columns: dict[str, _Column], start: int, stop: int, out: str) -> None:
+    segments: list[shared_memory.SharedMemory] = []
+    try:
+        data = {key: _attach(column, start, stop, segments) for key, column in columns.items()}
+        mask = _columnar_parser.mask(filter_string, data)
+        del data
+        target = shared_memory.SharedMemory(name=out)
+        segments.append(target)
+        view = np.ndarray((stop,), dtype=np.bool_, buffer=target.buf)
+        view[start:stop] = mask
+        del view
+    finally:
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                pass  # views still held by a propagating exception; released with it
+
+
+# -------- parent side --------
+def _share(array: Any, segments: list) -> _Column:
+    if isinstance(array, np.ma.MaskedArray):
+        return "masked", _share(array.data, segments), _share(np.ma.getmaskarray(array), segments)
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous:
+        # only an unsliced memmap's offset describes where its data starts in the file
+        return "memmap", array.filename, array.dtype.str, array.offset, array.shape
+    array = np.asarray(array)
+    if array.dtype.hasobject or array.ndim != 1:
+        return "inline", array
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    segments.append(segment)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[:] = array
+    return "shm", segment.name, array.dtype.str, array.shape
+
+
+def _slice(column: _Column, start: int, stop: int) -> _Column:
+    if column[0] == "inline":
+        return "inline", column[1][start:stop]
+    if column[0] == "masked":
+        return "masked", _slice(column[1], start, stop), _slice(column[2], start, stop)
+    return column
+
+
+def _loaded_keys(filter_string: str | Node, data: Mapping[str, Any]) -> list[str]:
+    # the columns ColumnarFilterParser will read: exact paths, or the head of a dotted one
+    keys = []
+    for path in ColumnarFilterParser.referenced_columns(filter_string):
+        head = path.partition(".")[0]
+        if path in data:
+            keys.append(path)
+        elif head in data:
+            keys.append(head)
+    return sorted(set(keys))
+
+
+class ParallelFilterParser:
+
+    def __init__(
+        self,
+        *,
+        max_workers: int | None = None,
+        serial_threshold: int = SERIAL_THRESHOLD,
+        chunk_size: int | None = None,
+        executor: Executor | None = None,
+    ):
+        # an injected executor must run the tasks in other processes (or threads) that can
+        # import this module; it is not shut down by close()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.serial_threshold = serial_threshold
+        self.chunk_size = chunk_size
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    def __enter__(self) -> "ParallelFilterParser":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _pool(self) -> Executor:
+        if self._executor is None:
+            if os.name == "posix":
+                # workers must share the parent's tracker: one they start themselves would
+                # "clean up" the segments they attached to when they exit
+                resource_tracker.ensure_running()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _bounds(self, n: int) -> list[tuple[int, int]]:
+        size = self.chunk_size or -(-n // (self.max_workers * CHUNKS_PER_WORKER))
+        return [(start, min(start + size, n)) for start in range(0, n, max(size, 1))]
+
+    def apply_filter(self, filter_string: str | Node, items: Mapping[str, Any] | Sequence[Any]):
+        # rows: same result as DictASTFilterParser.apply_filter, returning the caller's objects;
+        # a dict of columns: same as ColumnarFilterParser.apply_filter
+        if isinstance(items, Mapping):
+            mask = self.mask(filter_string, items)
+            return {key: _as_array(values)[mask] for key, values in items.items()}
+        _rows_parser.create_predicate(filter_string)  # parse errors surface here, not in a worker
+        if len(items) < self.serial_threshold:
+            return _rows_parser.apply_filter(filter_string, items)
+        pool = self._pool()
+        futures = [
+            (start, pool.submit(_match_rows, filter_string, items[start:stop])) for start, stop in self._bounds(len(items))
+        ]
+        return [items[start + i] for start, future in futures for i in future.result()]
+
+    def mask(self, filter_string: str | Node, data: Mapping[str, Any]) -> np.ndarray:
+        # same result as ColumnarFilterParser.mask over a dict of columns
+        n = len(next(iter(data.values()))) if data else 0
+        if n < self.serial_threshold:
+            return _columnar_parser.mask(filter_string, data)
+        segments: list[shared_memory.SharedMemory] = []
+        try:
+            columns = {key: _share(data[key], segments) for key in _loaded_keys(filter_string, data)}
+            out = shared_memory.SharedMemory(create=True, size=n)
+            segments.append(out)
+            pool = self._pool()
+            futures = [
+                pool.submit(
+                    _mask_chunk,
+                    filter_string,
+                    {key: _slice(column, start, stop) for key, column in columns.items()},
+                    start,
+                    stop,
+                    out.name,
+                )
+                for start, stop in self._bounds(n)
+            ]
+            for future in futures:
+                future.result()
+            return np.ndarray((n,), dtype=np.bool_, buffer=out.buf).copy()
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    def indices(self, filter_string: str | Node, data: Mapping[str, Any]) -> np.ndarray:
+        return np.flatnonzero(self.mask(filter_string, data))
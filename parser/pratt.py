@@ -0,0 +1,151 @@
+import re
+from threading import Lock
+from typing import Iterable
+
+# Hand-written scanner + precedence-climbing parser for the filter DSL. It accepts the same
+# language as the pyparsing grammar in parser/__init__.py and returns the same tree shape
+# (conditions, function calls and AND/OR chains as lists, tokens as raw strings), built
+# from plain lists instead of ParseResults. Anything outside the fast path (nested calls,
+# partial matches, syntax errors) raises FastPathError, and the caller re-parses with
+# pyparsing, which stays the reference for error messages and edge cases.
+
+
+class FastPathError(Exception): ...
+
+
+_WS = re.compile(r"[ \t\r\n]*")
+_IDENTIFIER = re.compile(r"[a-z][\w\.]*")
+_DATE = re.compile(r"\d{4}-\d{1,2}-\d{1,2}")
+_NUMBER = re.compile(r"[\d\.]+")
+_STRING = re.compile(r"""'(?:(?:\\.)|(?:[^'\n\r\\]))*'|"(?:(?:\\.)|(?:[^"\n\r\\]))*\"""")
+
+# precedence levels, lowest first
+_KEYWORDS = ("OR", "AND")
+
+
+class PrattGrammar:
+
+    def __init__(self, op_names: tuple[str, ...]):
+        self.operator = re.compile("|".join(op_names))
+
+    def parse(self, text: str) -> list:
+        return _Cursor(text, self.operator).parse()
+
+
+class _Cursor:
+    __slots__ = ("text", "pos", "operator")
+
+    def __init__(self, text: str, operator: re.Pattern):
+        self.text = text
+        self.pos = 0
+        self.operator = operator
+
+    def parse(self) -> list:
+        tree = self._expression(0)
+        if self._skip() != len(self.text):
+            raise FastPathError(f"unexpected input at char {self.pos}")
+        return tree
+
+    # -------- scanner --------
+    def _skip(self) -> int:
+        self.pos = _WS.match(self.text, self.pos).end()
+        return self.pos
+
+    def _peek(self, char: str) -> bool:
+        return self.text.startswith(char, self._skip())
+
+    def _expect(self, char: str) -> None:
+        if not self._peek(char):
+            raise FastPathError(f"expected {char!r} at char {self.pos}")
+        self.pos += 1
+
+    def _token(self, pattern: re.Pattern) -> str | None:
+        m = pattern.match(self.text, self._skip())
+        if m is None:
+            return None
+        self.pos = m.end()
+        return m.group()
+
+    # -------- parser --------
+    def _expression(self, level: int):
+        if level == len(_KEYWORDS):
+            return self._primary()
+        keyword = _KEYWORDS[level]
+        first = self._expression(level + 1)
+        if not self._peek(keyword):
+            return first
+        group = [first]
+        while self._peek(keyword):
+            self.pos += len(keyword)
+            group += [keyword, self._expression(level + 1)]
+        return group
+
+    def _primary(self):
+        if self._peek("("):
+            self.pos += 1
+            inner = self._expression(0)
+            self._expect(")")
+            return inner
+        group = self._param()
+        op = self._token(self.operator)
+        if op is None:
+            raise FastPathError(f"expected operator at char {self.pos}")
+        group.append(op)
+        group += self._param()
+        return group
+
+    def _param(self) -> list:
+        # a param contributes one item, or several for a collection (pyparsing flattens them)
+        name = self._token(_IDENTIFIER)
+        if name is not None:
+            if not self._peek("("):
+                return [name]
+            self.pos += 1
+            call = [name]
+            if not self._peek(")"):
+                call += self._arg()
+                while self._peek(","):
+                    self.pos += 1
+                    call += self._arg()
+            self._expect(")")
+            return [call]
+        return self._arg()
+
+    def _arg(self) -> list:
+        for pattern in (_IDENTIFIER, _DATE, _NUMBER):
+            token = self._token(pattern)
+            if token is not None:
+                if pattern is _IDENTIFIER and self._peek("("):
+                    raise FastPathError("nested function calls are not supported")
+                return [token]
+        if self._peek("["):
+            self.pos += 1
+            items = [self._item()]
+            while self._peek(","):
+                self.pos += 1
+                items.append(self._item())
+            self._expect("]")
+            return items
+        token = self._token(_STRING)
+        if token is None:
+            raise FastPathError(f"expected value at char {self.pos}")
+        return [token]
+
+    def _item(self) -> str:
+        token = self._token(_IDENTIFIER) or self._token(_STRING)
+        if token is None:
+            raise FastPathError(f"expected collection item at char {self.pos}")
+        return token
+
+
+_grammars: dict[tuple[str, ...], PrattGrammar] = {}
+_grammars_lock = Lock()
+
+
+def get_pratt_grammar(op_names: Iterable[str]) -> PrattGrammar:
+    key = tuple(op_names)
+    grammar = _grammars.get(key)
+    if grammar is None:
+        with _grammars_lock:
+            grammar = _grammars.setdefault(key, PrattGrammar(key))
+    return grammar
@@ -1,15 +1,26 @@
+import asyncio
+import keyword
 import math
-from datetime import datetime, time
+import time
 from functools import lru_cache
-from typing import Any, Callable, Iterable, Mapping, Sequence
+from itertools import islice
+from concurrent.futures import Executor
+from types import CodeType
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Mapping, Sequence
 
-from parser import FilterParser
+from parser import FilterParser, parse_select
+from parser.aggregate import Aggregation, HashAggregator, parse_apply
+from parser.cache import FilterCache, parse_canonical
+from parser.limits import FilterComplexityError
+from parser.nodes import BinOp, BoolOp, Call, Column, Literal, Node, Param
+from parser.observe import FilterObserver, filter_text, node_count
+from parser.optimizer import optimize
 
 
 # -------- dotted-path accessor --------
-def _get_path(row: Any, path: str, *, allow_private: bool = False) -> Any:
-    cur = row
-    for part in path.split("."):
+def _walk(cur: Any, parts: Sequence[str], start: int = 0, allow_private: bool = False) -> Any:
+    for i in range(start, len(parts)):
+        part = parts[i]
         if cur is None:
             return None
         if isinstance(cur, Mapping):
@@ -27,6 +38,83 @@ def _get_path(row: Any, path: str, *, allow_private: bool = False) -> Any:
     return cur
 
 
+def _get_path(row: Any, path: str, *, allow_private: bool = False) -> Any:
+    return _walk(row, path.split("."), 0, allow_private)
+
+
+# -------- shape-specialized accessors --------
+# get_column compiles a path once into an accessor that specializes itself on the type of
+# the first row it sees and only re-specializes when the row type changes. Dict rows get a
+# generated chain of .get() calls guarded by `type(v) is dict`, objects get plain attribute
+# loads, tuples/lists an index. Any other intermediate value resumes _walk, so the result is
+# always the same as _get_path.
+
+
+def _attr_load(target: str, source: str, part: str) -> list[str]:
+    if part.startswith("_"):
+        return [f"{target} = None"]
+    if part.isidentifier() and not keyword.iskeyword(part):
+        return ["try:", f"    {target} = {source}.{part}", "except AttributeError:", f"    {target} = None"]
+    return [f"{target} = getattr({source}, {part!r}, None)"]
+
+
+@lru_cache(maxsize=4096)
+def _specialized(kind: str, parts: tuple[str, ...]) -> Callable[[Any], Any]:
+    if kind == "none":
+        return lambda row: None
+    if kind == "generic":
+        return lambda row: _walk(row, parts)
+    if kind == "sequence":
+        try:
+            idx = int(parts[0])
+        except ValueError:
+            return lambda row: None
+        if idx < 0:
+            return lambda row: None
+        return lambda row: row[idx] if idx < len(row) else None
+
+    if kind == "dict":
+        body = [f"v = row.get({parts[0]!r})"]
+    else:
+        body = _attr_load("v", "row", parts[0])
+    for i, part in enumerate(parts[1:], 1):
+        body += ["if type(v) is not dict:", f"    return _walk(v, _parts, {i})", f"v = v.get({part!r})"]
+    source = "def _access(row):\n" + "".join(f"    {line}\n" for line in body + ["return v"])
+    namespace = {"_walk": _walk, "_parts": parts}
+    exec(compile(source, "<funnel-accessor>", "exec"), namespace)
+    return namespace["_access"]
+
+
+def _shape_kind(shape: type) -> str:
+    if shape is dict:
+        return "dict"
+    if shape is type(None):
+        return "none"
+    if issubclass(shape, (list, tuple)):
+        return "sequence"
+    if issubclass(shape, Mapping):
+        return "generic"
+    return "object"
+
+
+def _make_accessor(path: str) -> Callable[[Any], Any]:
+    parts = tuple(path.split("."))
+    spec: tuple[type | None, Callable[[Any], Any]] = (None, lambda row: None)
+
+    def access(row: Any) -> Any:
+        nonlocal spec
+        current = spec
+        if type(row) is current[0]:
+            return current[1](row)
+        shape = type(row)
+        fn = _specialized(_shape_kind(shape), parts)
+        spec = (shape, fn)
+        return fn(row)
+
+    access.path = path
+    return access
+
+
 # -------- primitives / lifted ops --------
 _to_str = lambda x: "" if x is None else str(x)
 
@@ -169,8 +257,211 @@ class _PythonFilterParser(FilterParser):
         super().__init__(op_map=self.op_map, func_map=self.func_map)
 
     def get_column(self, col: str):
-        name = col.strip()
-        return lambda row, _n=name: _get_path(row, _n)
+        return _make_accessor(col.strip())
+
+
+# -------- code generation --------
+# Compiles the AST into one flat function instead of a tree of lifted closures. Semantics
+# follow the closures above exactly: every operator evaluates all of its operands (so the
+# same rows raise, and therefore fail, as before), only AND/OR short-circuit, and any
+# exception makes the row not match. Literals are inlined when they have a literal repr and
+# hoisted into closure cells otherwise.
+
+_INLINE_LITERALS = (int, str, bool, type(None))
+
+_FUNC_ARITY = {"substring": (2, 3), "indexof": (2, 2), "replace": (3, 3)}
+
+_FUNC_HELPERS = {
+    "length": "_length",
+    "indexof": "_indexOf",
+    "replace": "_replace",
+    "substring": "_substring",
+    "tolower": "_toLower",
+    "toupper": "_toUpper",
+    "trim": "_trim",
+    "round": "_round",
+    "floor": "_floor",
+    "ceiling": "_ceiling",
+}
+_FUNC_HELPERS |= {k: f"_dt_{k}" for k in "year month day hour minute second".split()}
+
+_CMP_OPS = {"gt": ">", "lt": "<", "ge": ">=", "le": "<="}
+_ARITH_OPS = {"add": ("+", 0), "sub": ("-", 0), "mul": ("*", 0), "div": ("/", 1), "mod": ("%", 1)}
+
+
+class _PythonCodeGenerator:
+
+    def __init__(self):
+        self.constants: list[Any] = []
+        self.params = 0
+        self.accessors: dict[str, str] = {}
+        self.temps = 0
+
+    def _accessor(self, path: str) -> str:
+        # one accessor per distinct path, created per compiled predicate so each keeps its
+        # own shape specialization
+        if path not in self.accessors:
+            self.accessors[path] = f"_a{len(self.accessors)}"
+        return self.accessors[path]
+
+    def _temp(self) -> str:
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def _literal(self, value: Any) -> str:
+        if type(value) in _INLINE_LITERALS or (type(value) is float and math.isfinite(value)):
+            return repr(value)
+        self.constants.append(value)
+        return f"_c{len(self.constants) - 1}"
+
+    def expr(self, node: Node) -> str:
+        if isinstance(node, Literal):
+            return self._literal(node.value)
+        if isinstance(node, Param):
+            self.params = max(self.params, node.index + 1)
+            return f"_p{node.index}"
+        if isinstance(node, Column):
+            return f"{self._accessor(node.name.strip())}(row)"
+        if isinstance(node, Call):
+            return self._call(node)
+        if isinstance(node, BoolOp):
+            return "(" + f" {node.op.lower()} ".join(map(self.expr, node.operands)) + ")"
+        return self._binop(node)
+
+    def _call(self, node: Call) -> str:
+        if node.name not in _FUNC_HELPERS:
+            raise NotImplementedError(f"Invalid function {node.name} in OData expression")
+        low, high = _FUNC_ARITY.get(node.name, (1, 1))
+        if not low <= len(node.args) <= high:
+            raise TypeError(f"{node.name}() takes {low} to {high} arguments ({len(node.args)} given)")
+        args = list(map(self.expr, node.args))
+        if node.name == "substring" and len(args) == 2:
+            args.append("None")
+        return f"{_FUNC_HELPERS[node.name]}({', '.join(args)})"
+
+    def _binop(self, node: BinOp) -> str:
+        op = node.op
+        if len(node.operands) != 2:
+            raise TypeError(f"{op} takes 2 operands ({len(node.operands)} given)")
+        a, b = map(self.expr, node.operands)
+        if op == "eq":
+            return f"({a} == {b})"
+        if op == "ne":
+            return f"({a} != {b})"
+        if op in _CMP_OPS:
+            symbol = _CMP_OPS[op]
+            if isinstance(node.right, Literal) and node.right.value is not None:
+                ta = self._temp()
+                return f"(({ta} := {a}) is not None and {ta} {symbol} {b})"
+            # `&` rather than `and`, so the right operand is evaluated even when the left is None
+            ta, tb = self._temp(), self._temp()
+            return f"((({ta} := {a}) is not None) & (({tb} := {b}) is not None) and {ta} {symbol} {tb})"
+        if op in _ARITH_OPS:
+            symbol, default = _ARITH_OPS[op]
+            return f"(({a} or 0) {symbol} ({b} or {default}))"
+        if op == "like":
+            return f"(_to_str({b}) in _to_str({a}))"
+        if op == "endswith":
+            return f"_to_str({a}).endswith(_to_str({b}))"
+        if op == "startswith":
+            return f"_to_str({a}).startswith(_to_str({b}))"
+        if op in ("contains", "has"):
+            return f"_contains({a}, {b})"
+        if op in ("lacks", "hasNot"):
+            return f"(not _contains({a}, {b}))"
+        if op == "in":
+            if isinstance(node.right, Literal):
+                return f"_in_list({a}, ({b},))"
+            return f"_in_value({a}, {b})"
+        raise NotImplementedError(f"Invalid operator {op} in OData expression")
+
+    def source(self, node: Node, guarded: bool = True) -> str:
+        body = self.expr(node)
+        params = ", ".join(
+            [f"_c{i}" for i in range(len(self.constants))]
+            + [f"_p{i}" for i in range(self.params)]
+            + list(self.accessors.values())
+        )
+        if not guarded:
+            # exceptions propagate, for callers that tell "raised" apart from False
+            return (
+                f"def _factory({params}):\n"
+                f"    def _predicate(row):\n"
+                f"        return bool({body})\n"
+                f"    return _predicate\n"
+            )
+        return (
+            f"def _factory({params}):\n"
+            f"    def _predicate(row):\n"
+            f"        try:\n"
+            f"            return bool({body})\n"
+            f"        except Exception:\n"
+            f"            return False\n"
+            f"    return _predicate\n"
+        )
+
+
+_in_value = lambda a, b: _in_list(a, b if isinstance(b, (list, tuple, set)) else [b])
+
+_codegen_namespace = {
+    "_to_str": _to_str,
+    "_contains": _contains,
+    "_in_list": _in_list,
+    "_in_value": _in_value,
+    "_length": _length,
+    "_indexOf": _indexOf,
+    "_replace": _replace,
+    "_substring": _substring,
+    "_toLower": _toLower,
+    "_toUpper": _toUpper,
+    "_trim": _trim,
+    "_round": _round,
+    "_floor": _floor,
+    "_ceiling": _ceiling,
+} | {f"_dt_{k}": _dt(k) for k in "year month day hour minute second".split()}
+
+
+def generate_predicate_source(node: Node, guarded: bool = True) -> tuple[str, list[Any], list[str]]:
+    gen = _PythonCodeGenerator()
+    return gen.source(node, guarded), gen.constants, list(gen.accessors)
+
+
+def predicate_code(node: Node, guarded: bool = True) -> tuple[CodeType, list[Any], list[str]]:
+    # the compiled (marshal-able) module code defining _factory, its constants and its paths
+    source, constants, paths = generate_predicate_source(node, guarded)
+    return compile(source, "<funnel-filter>", "exec"), constants, paths
+
+
+def load_predicate_factory(code: CodeType) -> Callable[..., Callable[[Any], bool]]:
+    namespace = dict(_codegen_namespace)
+    exec(code, namespace)
+    return namespace["_factory"]
+
+
+def compile_predicate(node: Node, guarded: bool = True) -> Callable[[Any], bool]:
+    code, constants, paths = predicate_code(node, guarded)
+    return load_predicate_factory(code)(*constants, *map(_make_accessor, paths))
+
+
+def compile_predicate_factory(shape: Node, guarded: bool = True) -> Callable[[tuple], Callable[[Any], bool]]:
+    # for a shape with Param placeholders: compiled once, then values -> predicate
+    return bind_predicate_factory(*predicate_code(shape, guarded))
+
+
+def bind_predicate_factory(
+    code: CodeType, constants: list[Any], paths: list[str]
+) -> Callable[[tuple], Callable[[Any], bool]]:
+    factory, accessors = load_predicate_factory(code), [_make_accessor(path) for path in paths]
+    return lambda values: factory(*constants, *values, *accessors)
+
+
+# -------- $select --------
+@lru_cache(maxsize=256)
+def _projection(paths: tuple[str, ...], as_tuple: bool) -> Callable[[Any], dict[str, Any] | tuple]:
+    accessors = [_make_accessor(path) for path in paths]
+    if as_tuple:
+        return lambda row: tuple([access(row) for access in accessors])
+    return lambda row: dict(zip(paths, [access(row) for access in accessors]))
 
 
 # -------- public API --------
@@ -181,24 +472,65 @@ class DSLSemanticError(ValueError): ...
 
 
 class DictASTFilterParser:
-    def __init__(self) -> None:
+    # instrumentation (see parser/observe.py)
+    observer = None
+
+    def __init__(
+        self,
+        *,
+        codegen: bool = True,
+        cache_size: int = 256,
+        cache_ttl: float | None = None,
+        shapes: bool = False,
+    ) -> None:
+        # shapes: one compiled predicate per literal-stripped filter shape, with each filter's
+        # literals bound to it, for workloads where the same filter recurs with new values
+        if shapes and not codegen:
+            raise ValueError("shapes requires codegen")
         self._parser = _PythonFilterParser()
-        extra_literal_parsers = [
-            (r"^'?\d{2,4}-\d{1,2}-\d{1,2}'?$", lambda s: datetime.strptime(s.strip("'"), "%Y-%m-%d")),
-            (r"^'?\d{1,2}:\d{1,2}(:\d{1,2})?'?$", lambda s: time.fromisoformat(s.strip("'"))),
-            (r"^[+-]?\d+$", lambda s: int(s.strip("'"))),
-            (r"^[+-]?\d+\.\d+$", lambda s: float(s.strip("'"))),
-            (r"^(?i:true|false)$", lambda s: s.lower() == "true"),
-            (r"^'.*'$", lambda s: s.strip("'")),
-        ]
-        self._parser.parsers = extra_literal_parsers + self._parser.parsers
-
-    @lru_cache(maxsize=256)
-    def create_predicate(self, filter_string: str) -> Callable[[Any], bool]:
+        self.codegen = codegen
+        self.shapes = shapes
+        if shapes:
+            self.cache = FilterCache(
+                compile_predicate_factory,
+                maxsize=cache_size,
+                ttl=cache_ttl,
+                bind=lambda factory, values: factory(values),
+                name="dict_ast.shapes",
+            )
+        else:
+            self.cache = FilterCache(self._compile, maxsize=cache_size, ttl=cache_ttl, name="dict_ast.predicates")
+
+    def observe(self, observer: FilterObserver | None) -> None:
+        self.observer = self.cache.observer = self._parser.observer = observer
+
+    def create_predicate(self, filter_string: str | Node) -> Callable[[Any], bool]:
         try:
-            fn_or_val = self._parser.create_filter(filter_string)
+            if self.observer is not None:
+                return self._observed_predicate(filter_string)
+            node = parse_canonical(filter_string)
+            # shapes are taken after optimizing, which may fold or merge literals
+            return self.cache.get(optimize(node) if self.shapes else node)
+        except FilterComplexityError:
+            raise  # already structured; see limits.py
         except Exception as e:
             raise DSLParseError(f"DSL parse error: {e}") from e
+
+    def _observed_predicate(self, filter_string: str | Node) -> Callable[[Any], bool]:
+        # "compile" covers the cache lookup, so it is near zero on a hit
+        start = time.perf_counter()
+        node = parse_canonical(filter_string)
+        parsed = time.perf_counter()
+        predicate = self.cache.get(optimize(node) if self.shapes else node)
+        text = filter_text(filter_string)
+        self.observer.phase("DictASTFilterParser", "parse", parsed - start, text)
+        self.observer.phase("DictASTFilterParser", "compile", time.perf_counter() - parsed, text, node_count(node))
+        return predicate
+
+    def _compile(self, node: Node) -> Callable[[Any], bool]:
+        if self.codegen:
+            return compile_predicate(optimize(node))
+        fn_or_val = self._parser.create_filter(node)
         fn = fn_or_val if callable(fn_or_val) else (lambda _row, v=fn_or_val: v)
 
         def pred(row: Any) -> bool:
@@ -209,6 +541,195 @@ class DictASTFilterParser:
 
         return pred
 
-    def apply_filter(self, filter_string: str, items: Iterable[Any]) -> list[Any]:
+    def create_projection(
+        self, fields: str | Sequence[str], *, as_tuple: bool = False
+    ) -> Callable[[Any], dict[str, Any] | tuple]:
+        # row -> {"name": ..., "nested.value": ...} (or a tuple in $select order); paths
+        # resolve like filter columns, missing ones give None
+        try:
+            paths = parse_select(fields)
+        except ValueError as e:
+            raise DSLParseError(str(e)) from e
+        return _projection(paths, as_tuple)
+
+    def apply_filter(
+        self, filter_string: str | Node, items: Iterable[Any], *, fields: str | Sequence[str] | None = None
+    ) -> list[Any]:
         pred = self.create_predicate(filter_string)
-        return [row for row in items if pred(row)]
+        if self.observer is not None:
+            items = _Counted(items)
+            start = time.perf_counter()
+        if fields is not None:
+            project = self.create_projection(fields)
+            result = [project(row) for row in items if pred(row)]
+        else:
+            result = [row for row in items if pred(row)]
+        if self.observer is not None:
+            text = filter_text(filter_string)
+            self.observer.phase("DictASTFilterParser", "evaluate", time.perf_counter() - start, text)
+            self.observer.rows("DictASTFilterParser", items.count, len(result), text)
+        return result
+
+    def iter_filter(
+        self,
+        filter_string: str | Node,
+        items: Iterable[Any],
+        *,
+        top: int | None = None,
+        skip: int = 0,
+        fields: str | Sequence[str] | None = None,
+    ) -> Iterator[Any]:
+        # lazy: pulls from `items` only until `skip + top` matches have been produced
+        if (top is not None and top < 0) or skip < 0:
+            raise ValueError("top and skip must be non-negative")
+        pred = self.create_predicate(filter_string)
+        if self.observer is not None:
+            items = _Counted(items)
+        rows = islice(filter(pred, items), skip, None if top is None else skip + top)
+        if self.observer is not None:
+            rows = self._observed_rows(filter_string, items, rows)
+        return rows if fields is None else map(self.create_projection(fields), rows)
+
+    async def iter_filter_async(
+        self,
+        filter_string: str | Node,
+        items: AsyncIterable[Any],
+        *,
+        batch_size: int = 1000,
+        top: int | None = None,
+        skip: int = 0,
+        fields: str | Sequence[str] | None = None,
+        offload: int | None = None,
+        executor: Executor | None = None,
+    ) -> AsyncIterator[Any]:
+        # pulls `items` in batches of batch_size and evaluates each batch in one go; the next
+        # batch is only pulled once the consumer has taken the previous one's matches. Batches
+        # of at least `offload` rows are evaluated in `executor` (the loop's default one when
+        # None) instead of on the event loop. Stopping before `items` is exhausted (top reached,
+        # an error, aclose()) closes it, so Motor cursors and asyncpg streams are released;
+        # callers that break out of the loop early should wrap the call in
+        # contextlib.aclosing() so that happens right away rather than on garbage collection.
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        if (top is not None and top < 0) or skip < 0:
+            raise ValueError("top and skip must be non-negative")
+        pred = self.create_predicate(filter_string)
+        project = None if fields is None else self.create_projection(fields)
+        loop = asyncio.get_running_loop()
+        iterator = aiter(items)
+        remaining = top
+        scanned = matched = 0
+        exhausted = False
+        try:
+            while not exhausted and (remaining is None or remaining > 0):
+                batch = []
+                while len(batch) < batch_size:
+                    row = await anext(iterator, _END)
+                    if row is _END:
+                        exhausted = True
+                        break
+                    batch.append(row)
+                scanned += len(batch)
+                if offload is not None and len(batch) >= offload:
+                    matches = await loop.run_in_executor(executor, _matching, pred, batch)
+                else:
+                    matches = _matching(pred, batch)
+                if skip:
+                    skipped = min(skip, len(matches))
+                    matches, skip = matches[skipped:], skip - skipped
+                if remaining is not None:
+                    matches = matches[:remaining]
+                    remaining -= len(matches)
+                for row in matches:
+                    matched += 1
+                    yield row if project is None else project(row)
+        finally:
+            try:
+                if not exhausted and hasattr(iterator, "aclose"):
+                    await iterator.aclose()
+            finally:
+                if self.observer is not None:
+                    self.observer.rows("DictASTFilterParser", scanned, matched, filter_text(filter_string))
+
+    async def apply_filter_async(
+        self,
+        filter_string: str | Node,
+        items: AsyncIterable[Any],
+        *,
+        batch_size: int = 1000,
+        fields: str | Sequence[str] | None = None,
+        offload: int | None = None,
+        executor: Executor | None = None,
+    ) -> list[Any]:
+        rows = self.iter_filter_async(
+            filter_string, items, batch_size=batch_size, fields=fields, offload=offload, executor=executor
+        )
+        return [row async for row in rows]
+
+    def create_aggregator(self, apply: str | Aggregation) -> HashAggregator:
+        # a streaming groupby/aggregate over the rows passed to its add(); see parser/aggregate.py
+        try:
+            aggregation = parse_apply(apply)
+            keys = [self._expression(expression) for _, expression in aggregation.groupby]
+            values = [
+                None if item.expression is None else self._expression(item.expression)
+                for item in aggregation.aggregates
+            ]
+        except FilterComplexityError:
+            raise
+        except Exception as e:
+            raise DSLParseError(f"DSL parse error: {e}") from e
+        return HashAggregator(aggregation, keys, values)
+
+    def _expression(self, node: Node) -> Callable[[Any], Any]:
+        # expression errors give None, which the aggregates skip
+        fn = _as_fn(self._parser.compile(node))
+
+        def value(row: Any) -> Any:
+            try:
+                return fn(row)
+            except Exception:
+                return None
+
+        return value
+
+    def aggregate(
+        self, filter_string: str | Node | None, items: Iterable[Any], apply: str | Aggregation
+    ) -> list[dict[str, Any]]:
+        # one pass over the matching rows; groups come out in first-seen order
+        pred = None if filter_string is None else self.create_predicate(filter_string)
+        aggregator = self.create_aggregator(apply)
+        add = aggregator.add
+        for row in items if pred is None else filter(pred, items):
+            add(row)
+        return aggregator.result()
+
+    def _observed_rows(self, filter_string: str | Node, items: "_Counted", rows: Iterator[Any]) -> Iterator[Any]:
+        # reported when the iterator is exhausted or closed; matched counts the rows produced
+        matched = 0
+        try:
+            for row in rows:
+                matched += 1
+                yield row
+        finally:
+            self.observer.rows("DictASTFilterParser", items.count, matched, filter_text(filter_string))
+
+
+_END = object()
+
+
+def _matching(pred: Callable[[Any], bool], batch: list[Any]) -> list[Any]:
+    return [row for row in batch if pred(row)]
+
+
+class _Counted:
+    # an iterable counting the items pulled from it
+
+    def __init__(self, items: Iterable[Any]):
+        self._items = items
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        for item in self._items:
+            self.count += 1
+            yield item
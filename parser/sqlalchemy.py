@@ -1,9 +1,37 @@
 import functools
 import operator
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Sequence
 
-from sqlalchemy import Select, and_, func, not_, or_
+from sqlalchemy import ARRAY, ColumnElement, Select, and_, bindparam, func, inspect, literal, not_, or_, select, true
+from sqlalchemy.orm import Mapper, defaultload, lazyload, load_only
 
-from . import FilterParser
+from . import FilterParser, parse_select
+from .aggregate import Aggregation, parse_apply
+from .cache import FilterCache, parse_canonical
+from .nodes import BinOp, Column, Literal, Node, Param, columns, parameterize, walk
+from .optimizer import optimize
+from .paging import parse_orderby, seek_condition, with_tiebreaker
+from .py_ast_dict import DictASTFilterParser
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession  # needs greenlet; only stream() uses it
+
+# value transforms for parameters that op_map would splice into a pattern or split into a list
+_PARAM_TRANSFORMS: dict[str, Callable[[Any], Any]] = {
+    "like": lambda v: f"%{v}%",
+    "endswith": lambda v: f"%{v}",
+    "startswith": lambda v: f"{v}%",
+    "contains": lambda v: v.replace(" ", "").split(","),
+    "lacks": lambda v: v.replace(" ", "").split(","),
+}
+_EXPANDING = frozenset(("contains", "lacks"))
+
+# pushdown capabilities beyond op_map/func_map: operators whose right side op_map splices into
+# a string, and operators that only exist on ARRAY columns
+_STRING_OPERAND = frozenset(_PARAM_TRANSFORMS)
+_ARRAY_OPERAND = frozenset(("has", "hasNot"))
+
+_python = DictASTFilterParser()
 
 
 class SqlAlchemyFilterParser[T](FilterParser):
@@ -57,12 +85,271 @@ class SqlAlchemyFilterParser[T](FilterParser):
         "second": date_part_func("second"),
     }
 
-    def __init__(self, entity_type: type[T]):
+    # the same operations on bind parameters that already carry the transformed value
+    bound_op_map = {
+        "like": lambda a, b: a.ilike(b),
+        "endswith": lambda a, b: a.ilike(b),
+        "startswith": lambda a, b: a.ilike(b),
+        "contains": lambda a, b: a.in_(b),
+        "lacks": lambda a, b: not_(a.in_(b)),
+    }
+
+    def __init__(
+        self,
+        entity_type: type[T],
+        *,
+        bind_params: bool = False,
+        cache_size: int = 256,
+        cache_ttl: float | None = None,
+        param_prefix: str = "_funnel_p",
+    ):
+        # bind mode names its parameters param_prefix + index; the prefix keeps them apart
+        # from the caller's own bindparams in the statements passed to add_filter
         super().__init__(op_map=self.op_map, func_map=self.func_map)
         self.model_type = entity_type
+        self.bind_params = bind_params
+        self.param_prefix = param_prefix
+        self.shape_cache = FilterCache(self._compile_shape, maxsize=cache_size, ttl=cache_ttl, name="sqlalchemy.shapes")
+
+    def observe(self, observer) -> None:
+        super().observe(observer)
+        self.shape_cache.observer = observer
 
     def get_column(self, column: str):
         return getattr(self.model_type, column)
 
+    def get_param(self, param: Param, expanding: bool = False):
+        return bindparam(f"{self.param_prefix}{param.index}", expanding=expanding)
+
+    def compile(self, node: Node) -> Any:
+        if isinstance(node, BinOp) and node.op in self.bound_op_map and isinstance(node.right, Param):
+            param = self.get_param(node.right, expanding=node.op in _EXPANDING)
+            return self.bound_op_map[node.op](self.compile(node.left), param)
+        return super().compile(node)
+
+    # -------- bind-parameter mode --------
+    # A filter is split into its shape (literals replaced by Param nodes) and its values. The
+    # clause and the Select are built once per shape, so repeated filters that only differ in
+    # their literals skip expression building and hit SQLAlchemy's and the driver's statement
+    # caches; each call only produces a new parameter dict.
+    def _shape(self, filter_string: str | Node) -> tuple[Node, tuple]:
+        node = parse_canonical(filter_string)
+        return parameterize(optimize(node, fold_constants=self.fold_constants, contradictions=self.detect_contradictions))
+
+    def _compile_shape(self, shape: Node) -> tuple[ColumnElement, dict[int, Callable[[Any], Any]], Select]:
+        transforms = {
+            node.right.index: _PARAM_TRANSFORMS[node.op]
+            for node in walk(shape)
+            if isinstance(node, BinOp) and node.op in _PARAM_TRANSFORMS and isinstance(node.right, Param)
+        }
+        clause = self.compile(shape)
+        return clause, transforms, select(self.model_type).where(clause)
+
+    def _params(self, transforms: dict[int, Callable[[Any], Any]], values: tuple) -> dict[str, Any]:
+        return {f"{self.param_prefix}{i}": transforms[i](v) if i in transforms else v for i, v in enumerate(values)}
+
+    def create_parameterized_filter(self, filter_string: str | Node) -> tuple[ColumnElement, dict[str, Any]]:
+        shape, values = self._shape(filter_string)
+        clause, transforms, _ = self.shape_cache.get(shape)
+        return clause, self._params(transforms, values)
+
+    def prepared_select(self, filter_string: str | Node) -> tuple[Select, dict[str, Any]]:
+        # select(entity).where(filter), shared by every filter of the same shape; run it with
+        # session.execute(statement, params)
+        shape, values = self._shape(filter_string)
+        _, transforms, statement = self.shape_cache.get(shape)
+        return statement, self._params(transforms, values)
+
+    def _where(self, filter_string: str | Node) -> tuple[ColumnElement, dict[str, Any] | None]:
+        if self.bind_params:
+            return self.create_parameterized_filter(filter_string)
+        return self.create_filter(filter_string), None
+
     def add_filter(self, filter_string: str, query: Select) -> Select:
-        return query.where(self.create_filter(filter_string))
+        clause, params = self._where(filter_string)
+        return query.where(clause) if params is None else query.where(clause).params(params)
+
+    # -------- pushdown --------
+    def supports(self, node: Node) -> bool:
+        if not super().supports(node):
+            return False
+        mapper = inspect(self.model_type)
+        for sub in walk(node):
+            if isinstance(sub, Column) and sub.name not in mapper.column_attrs:
+                return False  # dotted paths, relationships, plain Python attributes
+            if isinstance(sub, BinOp) and sub.op in _STRING_OPERAND:
+                if not (isinstance(sub.right, Literal) and type(sub.right.value) is str):
+                    return False
+            if isinstance(sub, BinOp) and sub.op in _ARRAY_OPERAND:
+                left = sub.left
+                if not (isinstance(left, Column) and left.name in mapper.column_attrs):
+                    return False
+                if not isinstance(self.get_column(left.name).type, ARRAY):
+                    return False
+        return True
+
+    def add_hybrid_filter(self, filter_string: str, query: Select) -> tuple[Select, Callable[[T], bool] | None]:
+        # the query filtered on what SQL can evaluate, plus a predicate for the rest of the
+        # filter over the loaded rows (None when everything was pushed down)
+        pushed, residual = self.split_filter(filter_string)
+        if pushed is not None:
+            query = self.add_filter(pushed, query)
+        return query, None if residual is None else _python.create_predicate(residual)
+
+    # -------- $select --------
+    def _projection_options(self, mapper: Mapper, fields: Sequence[str]) -> list:
+        columns, related = [], {}
+        for field in fields:
+            head, _, rest = field.partition(".")
+            if head in mapper.relationships:
+                related.setdefault(head, []).append(rest)
+            elif head in mapper.column_attrs and not rest:
+                columns.append(mapper.column_attrs[head].class_attribute)
+            else:
+                raise ValueError(f"Unknown $select field {field!r} on {mapper.class_.__name__}")
+        if not columns:
+            columns = [mapper.get_property_by_column(column).class_attribute for column in mapper.primary_key]
+        options = [load_only(*columns)]
+        for relationship in mapper.relationships:
+            paths = related.get(relationship.key)
+            if paths is None:
+                # not selected: no eager JOIN / SELECT IN for it
+                options.append(lazyload(relationship.class_attribute))
+            elif all(paths):
+                sub_options = self._projection_options(relationship.mapper, paths)
+                options.append(defaultload(relationship.class_attribute).options(*sub_options))
+            # a bare relationship name keeps its configured loading with all its columns
+        return options
+
+    def create_projection(self, fields: str | Sequence[str]) -> list:
+        # loader options for select(entity): "name, attached_assistants.assistant_id" loads
+        # those columns (plus primary keys) and skips every relationship that is not named
+        return self._projection_options(inspect(self.model_type), parse_select(fields))
+
+    def add_select(self, fields: str | Sequence[str], query: Select) -> Select:
+        return query.options(*self.create_projection(fields))
+
+    def select_columns(self, fields: str | Sequence[str]) -> Select:
+        # plain rows instead of entities: no identity map, no ORM hydration
+        return select(*(self.get_column(field) for field in parse_select(fields)))
+
+    # -------- streaming --------
+    def _sort_key(self, mapper: Mapper, field: str, descending: bool):
+        # nulls sort lowest, as seek_condition expects; only spelled out for nullable columns,
+        # whose default placement differs between databases
+        column = self.get_column(field)
+        prop = mapper.column_attrs.get(field)
+        if prop is None or not any(mapped.nullable for mapped in prop.columns):
+            return column.desc() if descending else column
+        return column.desc().nulls_last() if descending else column.asc().nulls_first()
+
+    async def stream(
+        self,
+        session: "AsyncSession",
+        filter_string: str,
+        *,
+        orderby: str | Sequence[str] | None = None,
+        page_size: int = 1000,
+        query: Select | None = None,
+        fields: str | Sequence[str] | None = None,
+    ) -> AsyncIterator[T]:
+        # keyset-paginated: each page is one server-side cursor over LIMIT page_size rows
+        # after the previous page's last key, so memory and per-page latency stay flat
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        mapper = inspect(self.model_type)
+        keys = with_tiebreaker(
+            parse_orderby(orderby), [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+        )
+        pushed, residual = self.split_filter(filter_string)
+        clause, params = (true(), None) if pushed is None else self._where(pushed)
+        residual_pred = None if residual is None else _python.create_predicate(residual)
+        base = (query if query is not None else select(self.model_type)).where(clause)
+        if fields is not None:
+            # sort keys and the residual's columns are read off every row, so always load them
+            needed = [field for field, _ in keys]
+            if residual is not None:
+                loadable = mapper.column_attrs.keys() | mapper.relationships.keys()
+                needed += sorted({name.strip().split(".")[0] for name in columns(residual)} & loadable)
+            base = self.add_select([*parse_select(fields), *needed], base)
+        base = base.order_by(*(self._sort_key(mapper, field, descending) for field, descending in keys))
+        last = None
+        while True:
+            statement = base
+            if last is not None:
+                statement = statement.where(
+                    seek_condition(
+                        keys,
+                        last,
+                        eq=lambda field, value: self.get_column(field) == value,
+                        after=lambda field, value, descending: (
+                            self.get_column(field) < value if descending else self.get_column(field) > value
+                        ),
+                        all_of=and_,
+                        any_of=or_,
+                        is_null=lambda field: self.get_column(field).is_(None),
+                        not_null=lambda field: self.get_column(field).is_not(None),
+                    )
+                )
+            result = await session.stream_scalars(statement.limit(page_size), params)
+            count = 0
+            async for row in result.unique():
+                count += 1
+                last = [getattr(row, field) for field, _ in keys]
+                if residual_pred is None or residual_pred(row):
+                    yield row
+            if count < page_size:
+                return
+
+    # -------- $apply --------
+    # groupby/aggregate as one GROUP BY statement when the filter pushes down whole;
+    # otherwise the rows are streamed and aggregated in Python
+    _aggregates = {"count": func.count, "sum": func.sum, "min": func.min, "max": func.max, "avg": func.avg}
+
+    def _apply_expression(self, node: Node) -> Any:
+        if isinstance(node, Literal):
+            return literal(node.value)
+        if not self.supports(node):
+            raise ValueError(f"Unsupported $apply expression {node!r} on {self.model_type.__name__}")
+        return self.compile(node)
+
+    def create_aggregation(self, filter_string: str | Node | None, apply: str | Aggregation) -> Select:
+        # raises ValueError when part of the filter needs Python; aggregate() handles that
+        aggregation = parse_apply(apply)
+        pushed, residual = (None, None) if filter_string is None else self.split_filter(filter_string)
+        if residual is not None:
+            raise ValueError("The filter cannot be pushed down whole; use aggregate()")
+        keys = [self._apply_expression(expression) for _, expression in aggregation.groupby]
+        values = [
+            (
+                func.count()
+                if item.method == "$count"
+                else self._aggregates[item.method](self._apply_expression(item.expression))
+            ).label(item.alias)
+            for item in aggregation.aggregates
+        ]
+        statement = select(*(key.label(alias) for key, (alias, _) in zip(keys, aggregation.groupby)), *values)
+        statement = statement.select_from(self.model_type)
+        if keys:
+            statement = statement.group_by(*keys)
+        return statement if pushed is None else self.add_filter(pushed, statement)
+
+    async def aggregate(
+        self,
+        session: "AsyncSession",
+        filter_string: str | Node | None,
+        apply: str | Aggregation,
+        *,
+        page_size: int = 1000,
+    ) -> list[dict[str, Any]]:
+        # rows of group keys and aggregates by alias, in no particular order; without groupby
+        # there is exactly one row
+        aggregation = parse_apply(apply)
+        residual = None if filter_string is None else self.split_filter(filter_string)[1]
+        if residual is None:
+            result = await session.execute(self.create_aggregation(filter_string, aggregation))
+            return [dict(row) for row in result.mappings()]
+        aggregator = _python.create_aggregator(aggregation)
+        async for row in self.stream(session, filter_string, page_size=page_size):
+            aggregator.add(row)
+        return aggregator.result()
@@ -0,0 +1,169 @@
+import hashlib
+import marshal
+import os
+import pickle
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple
+
+import parser as _parser_package
+from parser import IDENTIFIER_PATTERN, canonical_filter, parse_ast, preload_ast
+from parser import nodes, optimizer, pratt, py_ast_dict
+from parser.nodes import BOOL_OPERATORS, FUNCTIONS, OPERATORS, Node, parameterize
+from parser.optimizer import optimize
+from parser.py_ast_dict import (
+    DictASTFilterParser,
+    _make_accessor,
+    _PythonFilterParser,
+    bind_predicate_factory,
+    load_predicate_factory,
+    predicate_code,
+)
+
+# Precompiled filters on disk, so a fresh worker does not pay for parsing and code generation
+# of the filters it is known to need. A store holds, per canonical filter string, the parsed
+# AST and the marshalled predicate code of both the literal-inlined and the shape (Param)
+# variants. It is tied to a grammar version: a hash of the store format, the Python bytecode
+# tag and the source of the grammar, optimizer and code generator, so any change to those
+# (or to op_map/func_map) makes an existing file stale and it is ignored.
+#
+# Store files contain pickled and marshalled code: only load files your deploy wrote.
+
+STORE_FORMAT = 1
+
+_VERSIONED_MODULES = (_parser_package, nodes, optimizer, pratt, py_ast_dict)
+
+
+@lru_cache(maxsize=1)
+def grammar_version() -> str:
+    digest = hashlib.sha256()
+    digest.update(
+        repr(
+            (
+                STORE_FORMAT,
+                sys.implementation.cache_tag,
+                OPERATORS,
+                BOOL_OPERATORS,
+                FUNCTIONS,
+                IDENTIFIER_PATTERN,
+                sorted(_PythonFilterParser.op_map),
+                sorted(_PythonFilterParser.func_map),
+            )
+        ).encode()
+    )
+    for filename in [module.__file__ for module in _VERSIONED_MODULES] + [__file__]:
+        try:
+            digest.update(Path(filename).read_bytes())
+        except OSError:
+            digest.update(filename.encode())  # no source shipped; fall back to the module path
+    return digest.hexdigest()
+
+
+class _Entry(NamedTuple):
+    node: Node
+    code: bytes
+    constants: list[Any]
+    paths: list[str]
+    shape: Node
+    shape_code: bytes
+    shape_constants: list[Any]
+    shape_paths: list[str]
+
+
+class FilterStore:
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self.version = grammar_version()
+        self.entries: dict[str, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, filter_string: str) -> bool:
+        return canonical_filter(filter_string) in self.entries
+
+    def add(self, filter_string: str) -> None:
+        node = parse_ast(filter_string)
+        optimized = optimize(node)
+        code, constants, paths = predicate_code(optimized)
+        shape, _ = parameterize(optimized)
+        shape_code, shape_constants, shape_paths = predicate_code(shape)
+        self.entries[canonical_filter(filter_string)] = _Entry(
+            node, marshal.dumps(code), constants, paths, shape, marshal.dumps(shape_code), shape_constants, shape_paths
+        )
+
+    def update(self, filters: Iterable[str]) -> None:
+        for filter_string in filters:
+            self.add(filter_string)
+
+    def save(self) -> None:
+        # written to a temporary file and renamed, so concurrent workers never read half a store
+        payload = {"format": STORE_FORMAT, "version": self.version, "entries": self.entries}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, self.path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def load(self) -> bool:
+        # False, leaving the store empty, when the file is missing, unreadable or stale
+        try:
+            with self.path.open("rb") as f:
+                payload = pickle.load(f)
+        except Exception:
+            return False
+        if not isinstance(payload, dict) or payload.get("version") != self.version:
+            return False
+        self.entries = payload["entries"]
+        return True
+
+    def install(self, parser: DictASTFilterParser | None = None) -> int:
+        # every backend's parse_ast gets the stored ASTs; a codegen DictASTFilterParser also
+        # gets the compiled predicates in its cache
+        for filter_string, entry in self.entries.items():
+            preload_ast(filter_string, entry.node)
+            if parser is None or not parser.codegen:
+                continue
+            if parser.shapes:
+                factory = bind_predicate_factory(marshal.loads(entry.shape_code), entry.shape_constants, entry.shape_paths)
+                parser.cache.put(entry.shape, factory)
+            else:
+                factory = load_predicate_factory(marshal.loads(entry.code))
+                parser.cache.put(entry.node, factory(*entry.constants, *map(_make_accessor, entry.paths)))
+        return len(self.entries)
+
+
+def read_manifest(path: str | os.PathLike) -> list[str]:
+    # one filter per line; blank lines and lines starting with "#" are skipped
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def warm(
+    path: str | os.PathLike,
+    manifest: str | os.PathLike | Iterable[str] | None = None,
+    *,
+    parser: DictASTFilterParser | None = None,
+) -> FilterStore:
+    # meant to run at worker import: loads the store, compiles any manifest filter it lacks
+    # (all of them when the store is stale), writes the store back and installs it
+    store = FilterStore(path)
+    loaded = store.load()
+    if manifest is not None:
+        filters = read_manifest(manifest) if isinstance(manifest, (str, os.PathLike)) else list(manifest)
+        missing = [filter_string for filter_string in filters if filter_string not in store]
+        if missing or not loaded:
+            store.update(missing)
+            try:
+                store.save()
+            except OSError:
+                pass  # read-only deploy: the compiled entries are still installed below
+    store.install(parser)
+    return store
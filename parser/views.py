@@ -0,0 +1,109 @@
+from typing import Any, Callable, Hashable, Iterable, Iterator, Mapping
+
+from parser import parse_ast
+from parser.nodes import Node, columns
+from parser.py_ast_dict import DictASTFilterParser, _make_accessor
+
+# A filter result kept current from insert/update/delete deltas instead of re-running the
+# filter over the whole collection. Only the row named by a delta is evaluated, and an
+# update is not evaluated at all when it provably leaves every column the filter reads
+# unchanged: either the caller names the changed fields, or, for a row in the result, the
+# referenced values of the old and new row are compared. Listeners hear about rows that
+# enter the result ("added"), leave it ("removed") or change while staying in it ("changed").
+
+type ViewListener = Callable[[str, Hashable, Any], None]
+
+ADDED, REMOVED, CHANGED = "added", "removed", "changed"
+
+
+def _overlaps(path: str, other: str) -> bool:
+    # "n" and "n.v" overlap, "n" and "name" do not
+    return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+
+
+class FilterView:
+
+    def __init__(
+        self,
+        filter_string: str | Node,
+        items: Mapping[Hashable, Any] | Iterable[tuple[Hashable, Any]] = (),
+        *,
+        parser: DictASTFilterParser | None = None,
+    ):
+        self._parser = parser or DictASTFilterParser()
+        self._pred = self._parser.create_predicate(filter_string)
+        node = parse_ast(filter_string) if isinstance(filter_string, str) else filter_string
+        self.filter = filter_string
+        self.columns = frozenset(path.strip() for path in columns(node))
+        self._accessors = [_make_accessor(path) for path in sorted(self.columns)]
+        self._keys: set[Hashable] = set()
+        self._rows: dict[Hashable, Any] = {}
+        self._listeners: list[ViewListener] = []
+        for key, row in items.items() if isinstance(items, Mapping) else items:
+            self.insert(key, row)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows.values())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rows
+
+    def __getitem__(self, key: Hashable) -> Any:
+        return self._rows[key]
+
+    def keys(self) -> Iterable[Hashable]:
+        return self._rows.keys()
+
+    def items(self) -> Iterable[tuple[Hashable, Any]]:
+        return self._rows.items()
+
+    # -------- notifications --------
+    def subscribe(self, listener: ViewListener) -> Callable[[], None]:
+        # listener(event, key, row); returns the function that unsubscribes it
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self, event: str, key: Hashable, row: Any) -> None:
+        for listener in list(self._listeners):
+            listener(event, key, row)
+
+    # -------- deltas --------
+    def insert(self, key: Hashable, row: Any) -> None:
+        if key in self._keys:
+            raise KeyError(f"{key!r} is already in the view's collection")
+        self._keys.add(key)
+        if self._pred(row):
+            self._rows[key] = row
+            self._notify(ADDED, key, row)
+
+    def _unchanged(self, old: Any, new: Any) -> bool:
+        for access in self._accessors:
+            a, b = access(old), access(new)
+            if type(a) is not type(b) or a != b:
+                return False
+        return True
+
+    def update(self, key: Hashable, row: Any, changed: Iterable[str] | None = None) -> None:
+        # `changed` names the fields (dotted paths) that differ from the previous version
+        if key not in self._keys:
+            raise KeyError(key)
+        matched = key in self._rows
+        if changed is not None:
+            skip = not any(_overlaps(field, path) for field in changed for path in self.columns)
+        else:
+            skip = matched and self._unchanged(self._rows[key], row)
+        matches = matched if skip else self._pred(row)
+        if matches:
+            self._rows[key] = row
+            self._notify(CHANGED if matched else ADDED, key, row)
+        elif matched:
+            del self._rows[key]
+            self._notify(REMOVED, key, row)
+
+    def delete(self, key: Hashable) -> None:
+        self._keys.remove(key)
+        if key in self._rows:
+            self._notify(REMOVED, key, self._rows.pop(key))
@@ -0,0 +1,74 @@
+import datetime
+import random
+
+# Random filters and rows for differential tests: backends and rewrites are checked against
+# the unoptimized Python predicate on the same rows.
+
+VALUES = [
+    None,
+    0,
+    1,
+    5,
+    2.5,
+    -3,
+    "",
+    "x",
+    "alpha",
+    "ALPHA beta ",
+    [1, "x"],
+    ("y",),
+    {"x": 1},
+    True,
+    False,
+    datetime.datetime(2024, 1, 5, 10, 30),
+    datetime.date(2024, 1, 1),
+    "2024-01-05",
+]
+COLUMNS = ["a", "b.a", "b.name", "name", "tags", "n", "b.b.a", "missing", "tags.0"]
+LITERALS = ["1", "0", "2.5", "'x'", "'alpha'", "''", "true", "null", "2024-01-05", "'2024-01-05'"]
+LITERALS += ["[a, 'x']", "['x','y','z']", "3", "5", "10", "'b'", "2"]
+OPERATORS = ["eq", "ne", "gt", "lt", "ge", "le", "add", "sub", "mul", "div", "mod", "like", "endswith", "startswith"]
+OPERATORS += ["contains", "lacks", "in", "has"] + ["gt", "lt", "ge", "le", "eq"] * 3
+FUNCTIONS = ["length({c})", "tolower({c})", "toUpper({c})", "trim({c})", "round({c})", "floor({c})"]
+FUNCTIONS += ["ceiling({c})", "year({c})", "indexof({c}, 'a')", "substring({c}, 1)", "replace({c}, 'a', 'b')"]
+
+
+def random_row(rng: random.Random, depth: int = 2) -> dict:
+    row = {}
+    for key in ("a", "b", "name", "tags", "n"):
+        if rng.random() < 0.8:
+            row[key] = rng.choice(VALUES)
+    if depth and rng.random() < 0.6:
+        row["b"] = random_row(rng, depth - 1)
+    return row
+
+
+def random_operand(rng: random.Random, columns: list[str] = COLUMNS) -> str:
+    r = rng.random()
+    column = rng.choice(columns)
+    if r < 0.45:
+        return column
+    if r < 0.75:
+        return rng.choice(LITERALS)
+    return rng.choice(FUNCTIONS).format(c=column)
+
+
+def random_condition(rng: random.Random, columns: list[str] = COLUMNS) -> str:
+    return f"{random_operand(rng, columns)} {rng.choice(OPERATORS)} {random_operand(rng, columns)}"
+
+
+def random_filter(rng: random.Random, depth: int = 3, columns: list[str] = COLUMNS) -> str:
+    if depth == 0 or rng.random() < 0.35:
+        return random_condition(rng, columns)
+    operands = [random_filter(rng, depth - 1, columns) for _ in range(rng.randint(2, 4))]
+    return "(" + f" {rng.choice(['AND', 'OR'])} ".join(operands) + ")"
+
+
+def rows(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [random_row(rng) for _ in range(count)]
+
+
+def filters(count: int, seed: int = 0, columns: list[str] = COLUMNS) -> list[str]:
+    rng = random.Random(seed)
+    return [random_filter(rng, columns=columns) for _ in range(count)]
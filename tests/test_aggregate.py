@@ -0,0 +1,27 @@
+from parser.py_ast_dict import DictASTFilterParser
+
+
+def test_min_max_skip_values_outside_the_first_ordering_family():
+    rows = [
+        {"t": "a", "d": 3},
+        {"t": "a", "d": "x"},
+        {"t": "a", "d": 7},
+        {"t": "b", "d": "m"},
+        {"t": "b", "d": 1},
+        {"t": "b", "d": "z"},
+        {"t": "c", "d": [1]},
+        {"t": "c", "d": None},
+    ]
+    result = DictASTFilterParser().aggregate(
+        None, rows, "groupby((t), aggregate(d with max as mx, d with min as mn, $count as n))"
+    )
+    assert result == [
+        {"t": "a", "mx": 7, "mn": 3, "n": 3},
+        {"t": "b", "mx": "z", "mn": "m", "n": 3},
+        {"t": "c", "mx": None, "mn": None, "n": 2},
+    ]
+
+
+def test_aggregate_without_groupby_over_no_rows():
+    result = DictASTFilterParser().aggregate("d gt 100", [{"d": 1}], "aggregate(d with sum as s, $count as n)")
+    assert result == [{"s": None, "n": 0}]
@@ -0,0 +1,69 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from parser.arrow import ArrowFilterParser  # noqa: E402
+from parser.py_ast_dict import DictASTFilterParser  # noqa: E402
+
+ROWS = [
+    {"id": i, "score": None if i % 11 == 0 else i % 40, "name": f"n{i:03d}", "tag": None if i % 7 == 0 else "t"}
+    for i in range(200)
+]
+
+
+@pytest.fixture(scope="module")
+def parquet_path(tmp_path_factory):
+    # ids are sorted, so each row group of 50 covers one id range
+    path = tmp_path_factory.mktemp("arrow") / "rows.parquet"
+    pq.write_table(pa.Table.from_pylist(ROWS), path, row_group_size=50)
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    "filter_string, groups",
+    [
+        ("id lt 50", [0]),
+        ("id ge 120 AND id le 160", [2, 3]),
+        ("id gt 199", []),
+        ("id eq 75 OR id eq 160", [1, 3]),
+        ("name startswith 'n15'", [3]),
+        ("id lt 10 OR score gt 5", [0, 1, 2, 3]),
+        ("length(name) gt 3", [0, 1, 2, 3]),
+    ],
+)
+def test_row_groups_are_pruned_by_statistics(parquet_path, filter_string, groups):
+    with ArrowFilterParser(parquet_path) as parser:
+        assert parser.row_groups(filter_string) == groups
+
+
+@pytest.mark.parametrize(
+    "filter_string",
+    [
+        "id lt 50",
+        "id ge 120 AND id le 160 AND score gt 10",
+        "score eq null OR tag eq null",
+        "tag ne 't'",
+        "name startswith 'n15' AND length(name) gt 3",
+        "score gt 5 AND id mod 3 eq 0",
+        "id gt 199",
+    ],
+)
+def test_scan_matches_the_row_backend(parquet_path, filter_string):
+    expected = DictASTFilterParser().apply_filter(filter_string, ROWS)
+    with ArrowFilterParser(parquet_path) as parser:
+        assert parser.apply_filter(filter_string) == expected
+        assert parser.scan(filter_string, fields="id").column("id").to_pylist() == [row["id"] for row in expected]
+
+
+def test_close_releases_only_a_mapped_file(parquet_path):
+    parser = ArrowFilterParser(parquet_path)
+    with parser:
+        parser.scan("id lt 5")
+    assert parser._file.closed
+    parser.close()
+    source = pa.memory_map(parquet_path)
+    with ArrowFilterParser(source):
+        pass
+    assert not source.closed
+    source.close()
@@ -0,0 +1,73 @@
+import asyncio
+from contextlib import aclosing
+
+from parser.py_ast_dict import DictASTFilterParser
+
+ROWS = [{"a": i % 10} for i in range(100)]
+
+
+class _Source:
+    # an async iterator that records whether it was closed
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_matches_iter_filter_across_batches():
+    parser = DictASTFilterParser()
+
+    async def run():
+        return [
+            row async for row in parser.iter_filter_async("a gt 6", _Source(ROWS), batch_size=7, top=12, skip=5)
+        ]
+
+    assert asyncio.run(run()) == list(parser.iter_filter("a gt 6", ROWS, top=12, skip=5))
+
+
+def test_top_closes_the_source():
+    source = _Source(ROWS)
+
+    async def run():
+        return [row async for row in DictASTFilterParser().iter_filter_async("a gt 6", source, batch_size=10, top=3)]
+
+    assert len(asyncio.run(run())) == 3
+    assert source.closed
+
+
+def test_exhausted_source_is_not_closed():
+    source = _Source(ROWS)
+    asyncio.run(DictASTFilterParser().apply_filter_async("a gt 6", source, batch_size=10))
+    assert not source.closed
+
+
+def test_break_inside_aclosing_closes_the_source():
+    source = _Source(ROWS)
+
+    async def run():
+        async with aclosing(DictASTFilterParser().iter_filter_async("a ge 0", source, batch_size=10)) as rows:
+            async for _ in rows:
+                break
+
+    asyncio.run(run())
+    assert source.closed
+
+
+def test_offloaded_batches():
+    parser = DictASTFilterParser()
+    rows = asyncio.run(parser.apply_filter_async("a eq 3", _Source(ROWS), batch_size=25, offload=10))
+    assert rows == parser.apply_filter("a eq 3", ROWS)
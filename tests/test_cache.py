@@ -0,0 +1,98 @@
+import pytest
+
+from parser import parse_ast
+from parser.cache import CacheInfo, FilterCache
+from parser.py_ast_dict import DictASTFilterParser
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _cache(**kwargs) -> tuple[FilterCache, list]:
+    compiled = []
+
+    def compile(node):
+        compiled.append(node)
+        return len(compiled)
+
+    return FilterCache(compile, **kwargs), compiled
+
+
+def test_equivalent_strings_share_an_entry():
+    cache, compiled = _cache()
+    assert cache.get("a eq 1 AND b eq 2") == cache.get("(a eq 1)  and  (b eq 2)") == 1
+    assert cache.get(parse_ast("a eq 1 AND b eq 2")) == 1
+    assert cache.info() == CacheInfo(hits=2, misses=1, evictions=0, expirations=0, size=1, maxsize=1024)
+    assert cache.info().hit_rate == 2 / 3
+
+
+def test_lru_eviction_counts():
+    cache, compiled = _cache(maxsize=2)
+    cache.get("a eq 1")
+    cache.get("a eq 2")
+    cache.get("a eq 1")  # now the most recent
+    cache.get("a eq 3")  # evicts a eq 2
+    assert len(cache) == 2
+    cache.get("a eq 1")
+    cache.get("a eq 2")
+    assert cache.info() == CacheInfo(hits=2, misses=4, evictions=2, expirations=0, size=2, maxsize=2)
+    assert compiled.count(parse_ast("a eq 2")) == 2
+
+
+def test_ttl_expiration_counts():
+    clock = _Clock()
+    cache, compiled = _cache(ttl=10, clock=clock)
+    cache.get("a eq 1")
+    clock.now = 9.9
+    cache.get("a eq 1")
+    clock.now = 10.1
+    assert cache.get("a eq 1") == 2
+    assert cache.info() == CacheInfo(hits=1, misses=2, evictions=0, expirations=1, size=1, maxsize=1024)
+    # the entry compiled at 10.1 lives until 20.1
+    clock.now = 20
+    cache.get("a eq 1")
+    assert cache.info().expirations == 1
+
+
+def test_failures_are_not_cached():
+    calls = []
+
+    def compile(node):
+        calls.append(node)
+        raise ValueError("no")
+
+    cache = FilterCache(compile)
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get("a eq 1")
+    assert len(calls) == 2 and len(cache) == 0
+
+
+def test_shapes_compile_once_and_bind_each_lookup():
+    cache, compiled = _cache(bind=lambda value, values: (value, values))
+    assert cache.get("a eq 1 AND b eq 'x'") == (1, (1, "x"))
+    assert cache.get("a eq 2 AND b eq 'y'") == (1, (2, "y"))
+    assert len(compiled) == 1 and cache.info().hits == 1
+
+
+def test_clear_and_bounds():
+    cache, _ = _cache(maxsize=1)
+    cache.get("a eq 1")
+    cache.clear()
+    assert cache.info() == CacheInfo(0, 0, 0, 0, 0, 1)
+    with pytest.raises(ValueError):
+        FilterCache(lambda node: node, maxsize=0)
+
+
+def test_backend_caches_report_through_info():
+    parser = DictASTFilterParser(cache_size=2, cache_ttl=60)
+    for filter_string in ["a eq 1", "a eq 2", "a eq 3", "a eq 3"]:
+        parser.create_predicate(filter_string)
+    info = parser.cache.info()
+    assert (info.hits, info.misses, info.evictions, info.size, info.maxsize) == (1, 3, 1, 2, 2)
@@ -0,0 +1,36 @@
+import corpus
+from parser import parse_ast
+from parser.py_ast_dict import DictASTFilterParser
+
+ROWS = corpus.rows(200, seed=4)
+
+
+def _agree(codegen: DictASTFilterParser, closures: DictASTFilterParser, filters: list[str]) -> int:
+    checked = 0
+    for filter_string in filters:
+        try:
+            reference = closures.create_predicate(filter_string)
+        except Exception:
+            continue
+        predicate = codegen.create_predicate(filter_string)
+        for row in ROWS:
+            assert predicate(row) == reference(row), (filter_string, row)
+        checked += 1
+    return checked
+
+
+def test_codegen_predicates_match_the_closures():
+    assert _agree(DictASTFilterParser(), DictASTFilterParser(codegen=False), corpus.filters(2000, seed=21)) > 1000
+
+
+def test_shape_predicates_match_the_closures():
+    # literal-stripped shapes with the literals bound back in
+    filters = corpus.filters(1000, seed=22)
+    assert _agree(DictASTFilterParser(shapes=True), DictASTFilterParser(codegen=False), filters) > 500
+
+
+def test_apply_filter_matches_the_closures():
+    codegen, closures = DictASTFilterParser(), DictASTFilterParser(codegen=False)
+    for filter_string in ["a gt 1 AND name like 'a'", "b.a eq null OR length(name) gt 3", "tags has 'x'"]:
+        node = parse_ast(filter_string)
+        assert codegen.apply_filter(node, ROWS) == closures.apply_filter(node, ROWS)
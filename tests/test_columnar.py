@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+
+import corpus
+from parser.columnar import ColumnarFilterParser
+from parser.py_ast_dict import DictASTFilterParser
+
+ROWS = corpus.rows(300, seed=6)
+TYPED_COLUMNS = ["i", "f", "s", "t", "b.i", "b.s", "missing"]
+
+
+def _typed_rows(count: int) -> list[dict]:
+    rng = random.Random(8)
+    typed = {
+        "i": [None, 0, 1, 5, -3, 7, 2**40],
+        "f": [None, 0.0, 2.5, -1.5, float("nan"), 3.0],
+        "s": [None, "", "x", "alpha", "ALPHA beta ", "2.5"],
+        "t": [None, True, False],
+    }
+    rows = []
+    for _ in range(count):
+        row = {key: rng.choice(values) for key, values in typed.items() if rng.random() < 0.9}
+        row["b"] = {"i": rng.choice(typed["i"]), "s": rng.choice(typed["s"])}
+        rows.append(row)
+    return rows
+
+
+def _parity(rows: list[dict], filters: list[str]) -> int:
+    python, columnar = DictASTFilterParser(), ColumnarFilterParser()
+    checked = 0
+    for filter_string in filters:
+        try:
+            expected = [i for i, row in enumerate(rows) if python.create_predicate(filter_string)(row)]
+        except Exception:
+            continue
+        assert list(columnar.indices(filter_string, rows)) == expected, filter_string
+        data = columnar.to_columns(rows, sorted(columnar.referenced_columns(filter_string)))
+        if data:
+            assert list(columnar.indices(filter_string, data)) == expected, filter_string
+        checked += 1
+    return checked
+
+
+def test_columnar_matches_the_row_backend():
+    assert _parity(ROWS, corpus.filters(800, seed=12)) > 400
+
+
+def test_columnar_matches_the_row_backend_on_typed_columns():
+    assert _parity(_typed_rows(300), corpus.filters(1500, seed=13, columns=TYPED_COLUMNS)) > 800
+
+
+def test_integer_arithmetic_does_not_wrap():
+    # each product or sum is 0 modulo 2**64, so a wrapped int64 would read as false
+    columnar = ColumnarFilterParser()
+    rows = [{"a": 2**40, "b": 2**24}, {"a": 3, "b": 0}, {"a": 2**32, "b": 2**32}]
+    assert list(columnar.indices("a mul b", rows)) == [0, 2]
+    assert list(columnar.indices("a mul 18446744073709551616", rows)) == [0, 1, 2]
+    data = {"a": np.array([2**40, 3, 2**32]), "b": np.array([2**24, 0, 2**32])}
+    assert list(columnar.indices("a mul b", data)) == [0, 2]
+    data = {"a": np.array([-(2**63), 1]), "b": np.array([-(2**63), -1])}
+    assert list(columnar.indices("a add b", data)) == [0]
+
+
+def test_apply_filter_keeps_the_mask_of_masked_columns():
+    data = {"a": np.ma.MaskedArray([1, 2, 3, 4], mask=[False, True, False, True]), "b": [1, 2, 3, 4]}
+    result = ColumnarFilterParser().apply_filter("b gt 1", data)
+    assert result["a"].mask.tolist() == [True, False, True]
+    assert result["b"].tolist() == [2, 3, 4]
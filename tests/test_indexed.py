@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+import corpus
+from parser import parse_ast
+from parser.indexed import IndexedCollection
+from parser.py_ast_dict import DictASTFilterParser
+
+INDEXES = [("a", "hash"), ("a", "range"), ("name", "prefix"), ("name", "hash"), ("tags", "hash"), ("b.a", "range")]
+FIXED = [
+    "a eq 1",
+    "a in [1, 'x']",
+    "a gt 1 AND a le 5",
+    "1 lt a",
+    "name startswith 'al'",
+    "name eq 'alpha' OR a ge 5",
+    "tags has 'x'",
+    "tags contains 1",
+    "b.a lt 2 AND name startswith 'AL'",
+    "a eq null",
+    "b.a ge 0 OR length(name) gt 2",
+]
+
+
+def _collection(rows: list[dict], indexes=INDEXES) -> IndexedCollection:
+    collection = IndexedCollection(rows)
+    for path, kind in indexes:
+        collection.create_index(path, kind)
+    return collection
+
+
+def _check(collection: IndexedCollection, filters: list[str]) -> int:
+    python = DictASTFilterParser()
+    rows = list(collection)
+    checked = 0
+    for filter_string in filters:
+        try:
+            expected = python.apply_filter(filter_string, rows)
+        except Exception:
+            continue
+        assert collection.filter(filter_string) == expected, filter_string
+        assert collection.filter(filter_string, top=3, skip=1) == expected[1:4], filter_string
+        checked += 1
+    return checked
+
+
+@pytest.mark.parametrize("kind", ["hash", "range", "prefix"])
+def test_single_index_matches_a_full_scan(kind):
+    collection = _collection(corpus.rows(300, seed=30), [(path, kind) for path in ("a", "name", "tags", "b.a")])
+    assert _check(collection, FIXED + corpus.filters(500, seed=31)) > 250
+
+
+def test_indexed_filter_matches_a_full_scan():
+    collection = _collection(corpus.rows(300, seed=32))
+    assert _check(collection, FIXED + corpus.filters(1000, seed=33)) > 500
+
+
+def test_indexes_follow_updates_and_deletes():
+    rng = random.Random(34)
+    collection = _collection(corpus.rows(200, seed=35))
+    for _ in range(150):
+        key = rng.choice(list(collection.keys()))
+        if rng.random() < 0.3:
+            collection.delete(key)
+            collection.insert(corpus.random_row(rng))
+        else:
+            collection.update(key, corpus.random_row(rng))
+    assert _check(collection, FIXED + corpus.filters(500, seed=36)) > 250
+
+
+def test_plans_use_the_indexes():
+    collection = _collection([{"a": i % 10, "name": f"n{i}"} for i in range(100)])
+    assert collection.candidates(parse_ast("a eq 3")) == set(range(3, 100, 10))
+    assert collection.candidates(parse_ast("a ge 8 AND name startswith 'n9'")) == {9, 98, 99}
+    assert collection.candidates(parse_ast("a eq 3 OR length(name) gt 2")) is None
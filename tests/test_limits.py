@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+import parser
+from parser import FilterParser, parse_ast
+from parser.limits import FilterComplexityError, FilterLimits, parse_async, parse_with_deadline, set_limits
+
+LIMITS = FilterLimits(max_length=200, max_depth=5, max_nodes=20, max_collection=4)
+
+
+def _folding_parser() -> FilterParser:
+    return FilterParser(op_map=dict.fromkeys(("eq", "in", "AND"), lambda *args: args), func_map={})
+
+
+@pytest.fixture
+def limits():
+    set_limits(LIMITS)
+    yield LIMITS
+    set_limits(FilterLimits())
+
+
+@pytest.fixture
+def no_grammar(monkeypatch):
+    # any grammar work fails the test
+    def parse_tree(self, filter_string):
+        raise AssertionError(f"parsed {filter_string!r}")
+
+    monkeypatch.setattr(FilterParser, "_parse_tree", parse_tree)
+
+
+@pytest.mark.parametrize(
+    "filter_string, limit",
+    [
+        ("name eq '" + "x" * 300 + "'", "length"),
+        ("(" * 6 + "a eq 1" + ")" * 6, "depth"),
+        (" AND ".join(f"a{i} eq {i}" for i in range(8)), "nodes"),
+        ("a in [1, 2, 3, 4, 5]", "collection"),
+    ],
+    ids=["length", "depth", "nodes", "collection"],
+)
+def test_limits_raise_before_any_parsing(limits, no_grammar, filter_string, limit):
+    with pytest.raises(FilterComplexityError) as raised:
+        parse_ast(filter_string)
+    assert raised.value.limit == limit
+    assert raised.value.to_dict()["error"] == "filter_too_complex"
+    with pytest.raises(FilterComplexityError):
+        _folding_parser().parse(filter_string)
+
+
+def test_quoted_text_does_not_count(limits):
+    assert parse_ast("name eq '((((((( AND OR [1,2,3,4,5]'") is not None
+    assert parse_ast("(((((a eq 1)))))") is not None
+
+
+def test_limits_can_be_switched_off(no_grammar):
+    set_limits(None)
+    try:
+        with pytest.raises(AssertionError):
+            parse_ast("(" * 100 + "a eq 101" + ")" * 100)
+    finally:
+        set_limits(FilterLimits())
+
+
+def test_each_parse_checks_the_limits_once(monkeypatch):
+    calls = []
+    check = parser.check_filter
+    monkeypatch.setattr(parser, "check_filter", lambda filter_string: calls.append(filter_string) or check(filter_string))
+    parse_ast("a eq 1 AND b eq 'checked once'")
+    assert calls == ["a eq 1 AND b eq 'checked once'"]
+    _folding_parser().parse("a eq 2")
+    assert len(calls) == 2
+
+
+def _slow_parse(filter_string):
+    time.sleep(0.5)
+    return parse_ast(filter_string)
+
+
+def test_parse_with_deadline_times_out():
+    with pytest.raises(FilterComplexityError) as raised:
+        parse_with_deadline("a eq 1", 0.05, _slow_parse)
+    assert raised.value.limit == "time"
+    assert parse_with_deadline("a eq 1", 5) is parse_ast("a eq 1")
+
+
+def test_parse_async_times_out():
+    with pytest.raises(FilterComplexityError) as raised:
+        asyncio.run(parse_async("a eq 1", 0.05, _slow_parse))
+    assert raised.value.limit == "time"
+    assert asyncio.run(parse_async("a eq 1", 5)) is parse_ast("a eq 1")
@@ -0,0 +1,36 @@
+import datetime
+
+import pytest
+
+from parser import parse_ast
+from parser.nodes import BinOp, Column, Literal
+from parser.py_ast_dict import DictASTFilterParser
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("1", 1),
+        ("2.5", 2.5),
+        ("true", True),
+        ("false", False),
+        ("null", None),
+        ("'x'", "x"),
+        ("'null'", "null"),
+        ("'true'", "true"),
+        ("2024-01-05", datetime.datetime(2024, 1, 5)),
+        ("'10:30'", datetime.time(10, 30)),
+    ],
+)
+def test_literals_are_typed(text, value):
+    node = parse_ast(f"a eq {text}")
+    assert node == BinOp("eq", (Column("a"), Literal(value)))
+    assert type(node.right.value) is type(value)
+
+
+@pytest.mark.parametrize("name", ["nullable", "null_count", "trueish", "false_positives", "truth"])
+def test_columns_starting_with_a_keyword_stay_columns(name):
+    assert parse_ast(f"{name} eq 1") == BinOp("eq", (Column(name), Literal(1)))
+    rows = [{name: 1}, {name: None}]
+    assert DictASTFilterParser().apply_filter(f"{name} eq 1", rows) == [{name: 1}]
+    assert DictASTFilterParser().apply_filter(f"{name} eq null", rows) == [{name: None}]
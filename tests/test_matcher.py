@@ -0,0 +1,68 @@
+import random
+
+import corpus
+from parser.matcher import SubscriptionMatcher
+from parser.py_ast_dict import DictASTFilterParser
+
+EVENTS = corpus.rows(200, seed=40)
+FIXED = [
+    "a eq 1",
+    "a eq 1 AND name eq 'x'",
+    "a in [1, 'x'] OR n gt 2",
+    "a gt 1 AND a le 5",
+    "3 lt a",
+    "b.a ge 1 OR b.name eq 'alpha'",
+    "length(name) gt 2 OR a eq 5",
+    "a eq 5 OR length(name) gt 2",
+    "name startswith 'al' AND a lt 2.5",
+    "a eq null",
+]
+
+
+def _subscriptions(count: int, seed: int) -> dict[int, str]:
+    python, probe = DictASTFilterParser(), SubscriptionMatcher()
+    subscriptions = {}
+    for filter_string in FIXED + corpus.filters(count, seed=seed):
+        try:
+            python.create_predicate(filter_string)
+            probe.add(0, filter_string)
+        except Exception:
+            continue
+        subscriptions[len(subscriptions)] = filter_string
+    return subscriptions
+
+
+def _expected(subscriptions: dict[int, str], events: list[dict]) -> list[set[int]]:
+    python = DictASTFilterParser()
+    predicates = {key: python.create_predicate(filter_string) for key, filter_string in subscriptions.items()}
+    return [{key for key, predicate in predicates.items() if predicate(event)} for event in events]
+
+
+def test_match_equals_the_per_subscription_predicates():
+    subscriptions = _subscriptions(800, seed=41)
+    matcher = SubscriptionMatcher(subscriptions.items())
+    assert len(matcher) == len(subscriptions) > 400
+    expected = _expected(subscriptions, EVENTS)
+    for event, matched in zip(EVENTS, expected):
+        assert matcher.match(event) == matched, event
+    assert sum(map(len, expected)) > 1000
+    assert list(matcher.match_many(EVENTS[:20])) == expected[:20]
+
+
+def test_match_follows_adds_and_removes():
+    rng = random.Random(42)
+    subscriptions = _subscriptions(400, seed=43)
+    matcher = SubscriptionMatcher(subscriptions.items())
+    spare = list(_subscriptions(200, seed=44).values())
+    for _ in range(200):
+        key = rng.choice(list(subscriptions))
+        if rng.random() < 0.5:
+            matcher.remove(key)
+            del subscriptions[key]
+        else:
+            # replaces the subscription's filter
+            subscriptions[key] = rng.choice(spare)
+            matcher.add(key, subscriptions[key])
+    assert len(matcher) == len(subscriptions)
+    for event, matched in zip(EVENTS, _expected(subscriptions, EVENTS)):
+        assert matcher.match(event) == matched, event
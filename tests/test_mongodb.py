@@ -0,0 +1,109 @@
+import pytest
+
+from parser.mongodb import MongoDbFilterParser
+
+# exact documents of the planner-friendly normalization (mongo_and / mongo_or) and of the
+# anchored prefix mode
+
+
+def test_and_flattens_nested_and():
+    assert MongoDbFilterParser.mongo_and({"$and": [{"a": 1}]}, {"$and": [{"b": {"$eq": 2}}, {"c": {"$eq": 3}}]}) == {
+        "a": 1,
+        "b": {"$eq": 2},
+        "c": {"$eq": 3},
+    }
+    assert MongoDbFilterParser().create_filter("a eq 1 AND (b eq 2 AND c eq 3)") == {
+        "a": {"$eq": 1},
+        "b": {"$eq": 2},
+        "c": {"$eq": 3},
+    }
+
+
+def test_or_flattens_nested_or():
+    assert MongoDbFilterParser().create_filter("a eq 1 OR (b eq 2 OR c eq 3)") == {
+        "$or": [{"a": {"$eq": 1}}, {"b": {"$eq": 2}}, {"c": {"$eq": 3}}]
+    }
+
+
+def test_and_merges_a_range():
+    assert MongoDbFilterParser().create_filter("x gt 5 AND x lt 10") == {"x": {"$gt": 5, "$lt": 10}}
+    assert MongoDbFilterParser.mongo_and({"x": {"$gt": 5}}, {"y": 1}, {"x": {"$lt": 10}}) == {
+        "x": {"$gt": 5, "$lt": 10},
+        "y": 1,
+    }
+
+
+def test_and_keeps_repeated_operators_apart():
+    assert MongoDbFilterParser.mongo_and({"x": {"$gt": 5}}, {"x": {"$gt": 7}}) == {
+        "$and": [{"x": {"$gt": 5}}, {"x": {"$gt": 7}}]
+    }
+    # one condition on an array field can match different elements
+    assert MongoDbFilterParser().create_filter("x eq 1 AND x eq 2") == {
+        "$and": [{"x": {"$eq": 1}}, {"x": {"$eq": 2}}]
+    }
+    # a plain value does not merge with an operator document
+    assert MongoDbFilterParser.mongo_and({"x": 1}, {"x": {"$gt": 0}}) == {"$and": [{"x": 1}, {"x": {"$gt": 0}}]}
+
+
+def test_or_collapses_equalities_into_in():
+    assert MongoDbFilterParser().create_filter("x eq 1 OR x eq 2 OR y eq 3") == {
+        "$or": [{"x": {"$in": [1, 2]}}, {"y": {"$eq": 3}}]
+    }
+
+
+def test_in_collapse_keeps_true_and_1_apart():
+    assert MongoDbFilterParser().create_filter("x eq true OR x eq 1 OR x eq 1 OR x eq 2") == {
+        "x": {"$in": [True, 1, 2]}
+    }
+    assert MongoDbFilterParser.mongo_or({"x": {"$eq": 1}}, {"x": {"$eq": True}}, {"x": {"$eq": True}}) == {
+        "x": {"$in": [1, True]}
+    }
+
+
+def test_single_equality_is_left_alone():
+    assert MongoDbFilterParser().create_filter("x eq 1") == {"x": {"$eq": 1}}
+
+
+def test_case_sensitive_prefix_is_anchored_and_escaped():
+    parser = MongoDbFilterParser(case_sensitive_prefix=True)
+    assert parser.create_filter("s startswith 'a.b'") == {"s": {"$regex": "^a\\.b"}}
+    assert MongoDbFilterParser().create_filter("s startswith 'ab'") == {"s": {"$regex": "^ab", "$options": "i"}}
+
+
+_NAIVE_OPS = MongoDbFilterParser.op_map | {
+    "AND": lambda *docs: {"$and": list(docs)},
+    "OR": lambda *docs: {"$or": list(docs)},
+}
+
+
+class _NaiveParser(MongoDbFilterParser):
+    op_map = _NAIVE_OPS
+
+
+@pytest.mark.parametrize(
+    "filter_string",
+    [
+        "x gt 5 AND x lt 10",
+        "x eq 1 AND x eq 2",
+        "x eq true OR x eq 1 OR x eq 2",
+        "x eq 1 OR x eq 2 OR y eq 3",
+        "a eq 1 AND (b eq 2 AND c eq 3)",
+        "(x ge 2 AND x le 8) OR y eq 'b'",
+    ],
+)
+def test_normalized_documents_match_the_same_rows(filter_string):
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.rows
+    collection.insert_many(
+        [
+            {"_id": i, "x": x, "y": y, "a": i % 2, "b": i % 3, "c": i % 4}
+            for i, (x, y) in enumerate(
+                [(1, "a"), (2, "b"), (True, "c"), (5, "a"), (7, "b"), (10, "c"), ([1, 2], "a"), (None, "b"), (3, "b")]
+            )
+        ]
+    )
+    normalized = MongoDbFilterParser().create_filter(filter_string)
+    naive = _NaiveParser().create_filter(filter_string)
+    assert sorted(doc["_id"] for doc in collection.find(normalized)) == sorted(
+        doc["_id"] for doc in collection.find(naive)
+    )
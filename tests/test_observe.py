@@ -0,0 +1,155 @@
+import logging
+
+import numpy as np
+
+import corpus
+from parser import parse_ast
+from parser.columnar import ColumnarFilterParser
+from parser.mongodb import MongoDbFilterParser
+from parser.observe import (
+    FilterObserver,
+    LoggingObserver,
+    MetricsObserver,
+    MetricsRegistry,
+    MultiObserver,
+    SlowFilterSampler,
+    filter_text,
+    node_count,
+    observe_parsing,
+)
+from parser.py_ast_dict import DictASTFilterParser
+
+ROWS = corpus.rows(120, seed=90)
+
+
+class _Recorder(FilterObserver):
+
+    def __init__(self):
+        self.phases, self.caches, self.scans = [], [], []
+
+    def phase(self, backend, phase, seconds, filter_string=None, nodes=None):
+        assert seconds >= 0
+        self.phases.append((backend, phase, filter_string, nodes))
+
+    def cache(self, cache, hit):
+        self.caches.append((cache, hit))
+
+    def rows(self, backend, scanned, matched, filter_string=None):
+        self.scans.append((backend, scanned, matched, filter_string))
+
+
+def test_dict_backend_reports_phases_cache_and_rows():
+    recorder = _Recorder()
+    parser = DictASTFilterParser()
+    parser.observe(recorder)
+    result = parser.apply_filter("a gt 2", ROWS)
+    parser.apply_filter("a  gt 2", ROWS)
+    nodes = node_count(parse_ast("a gt 2"))
+    assert recorder.phases[:3] == [
+        ("DictASTFilterParser", "parse", "a gt 2", None),
+        ("DictASTFilterParser", "compile", "a gt 2", nodes),
+        ("DictASTFilterParser", "evaluate", "a gt 2", None),
+    ]
+    assert recorder.caches == [("dict_ast.predicates", False), ("dict_ast.predicates", True)]
+    assert recorder.scans[0] == ("DictASTFilterParser", len(ROWS), len(result), "a gt 2")
+    # detached again, nothing more is reported
+    parser.observe(None)
+    parser.apply_filter("a gt 3", ROWS)
+    assert len(recorder.phases) == 6 and len(recorder.caches) == 2
+
+
+def test_lazy_iteration_reports_what_it_pulled():
+    recorder = _Recorder()
+    parser = DictASTFilterParser()
+    parser.observe(recorder)
+    expected = DictASTFilterParser().apply_filter("a ge 0", ROWS)
+    assert len(list(parser.iter_filter("a ge 0", ROWS, top=2))) == 2
+    scanned = ROWS.index(expected[1]) + 1
+    assert recorder.scans == [("DictASTFilterParser", scanned, 2, "a ge 0")]
+
+
+def test_columnar_backend_reports_evaluation():
+    recorder = _Recorder()
+    parser = ColumnarFilterParser()
+    parser.observe(recorder)
+    columns = {"a": np.arange(10)}
+    parser.mask("a lt 4", columns)
+    assert recorder.phases[-1] == ("ColumnarFilterParser", "evaluate", "a lt 4", node_count(parse_ast("a lt 4")))
+    assert recorder.scans == [("ColumnarFilterParser", 10, 4, "a lt 4")]
+
+
+def test_query_backends_report_parse_optimize_compile():
+    recorder = _Recorder()
+    parser = MongoDbFilterParser()
+    parser.observe(recorder)
+    filter_string = "a eq 1 AND b lt 2"
+    parser.create_filter(filter_string)
+    nodes = node_count(parse_ast(filter_string))
+    assert recorder.phases == [
+        ("MongoDbFilterParser", "parse", filter_string, None),
+        ("MongoDbFilterParser", "optimize", filter_string, nodes),
+        ("MongoDbFilterParser", "compile", filter_string, nodes),
+    ]
+
+
+def test_observe_parsing_reports_grammar_and_fold():
+    recorder = _Recorder()
+    observe_parsing(recorder)
+    try:
+        # a filter text no earlier test has parsed, so it misses the parse_ast cache
+        parse_ast("observed eq 'grammar'")
+    finally:
+        observe_parsing(None)
+    assert [phase for _, phase, _, _ in recorder.phases] == ["grammar", "fold"]
+    assert {backend for backend, _, _, _ in recorder.phases} == {"_ASTBuilder"}
+
+
+def test_metrics_observer_counts_and_renders():
+    registry = MetricsRegistry(buckets=(0.5, 1.0))
+    metrics = MetricsObserver(registry)
+    metrics.phase("B", "compile", 0.25, "a eq 1", nodes=3)
+    metrics.phase("B", "compile", 2.0, "a eq 1", nodes=4)
+    metrics.phase("B", "evaluate", 0.75, "a eq 1", nodes=3)
+    metrics.cache("c", True)
+    metrics.cache("c", False)
+    metrics.cache("c", True)
+    metrics.rows("B", 10, 3)
+    metrics.rows("B", 5, 5)
+    assert registry.histogram("funnel_phase_seconds", backend="B", phase="compile") == (2.25, 2)
+    assert registry.histogram("funnel_phase_seconds", backend="X", phase="compile") == (0.0, 0)
+    # node counts come from compile phases only
+    assert registry.counter("funnel_compiled_nodes_total", backend="B") == 7
+    assert registry.counter("funnel_cache_lookups_total", cache="c", result="hit") == 2
+    assert registry.counter("funnel_rows_scanned_total", backend="B") == 15
+    assert registry.counter("funnel_rows_matched_total", backend="B") == 8
+    text = registry.render()
+    assert "# HELP funnel_phase_seconds Time spent per filter phase" in text
+    assert "# TYPE funnel_cache_lookups_total counter" in text
+    assert 'funnel_cache_lookups_total{cache="c",result="miss"} 1' in text
+    # buckets are cumulative and end in +Inf
+    assert 'funnel_phase_seconds_bucket{backend="B",phase="compile",le="0.5"} 1' in text
+    assert 'funnel_phase_seconds_bucket{backend="B",phase="compile",le="1"} 1' in text
+    assert 'funnel_phase_seconds_bucket{backend="B",phase="compile",le="+Inf"} 2' in text
+    assert 'funnel_phase_seconds_count{backend="B",phase="compile"} 2' in text
+
+
+def test_slow_filters_and_fan_out(caplog):
+    sunk = []
+    sampler = SlowFilterSampler(0.1, maxlen=2, sink=sunk.append)
+    recorder = _Recorder()
+    observer = MultiObserver(sampler, recorder, LoggingObserver(logging.getLogger("funnel.test")))
+    with caplog.at_level(logging.DEBUG, logger="funnel.test"):
+        for seconds, text in [(0.05, "fast"), (0.2, "slow 1"), (0.3, "slow 2"), (0.4, "slow 3")]:
+            observer.phase("B", "compile", seconds, text)
+        observer.cache("c", False)
+        observer.rows("B", 3, 1, "slow 3")
+    assert [sample.filter_string for sample in sampler.samples()] == ["slow 2", "slow 3"]
+    assert [sample.filter_string for sample in sunk] == ["slow 1", "slow 2", "slow 3"]
+    assert len(recorder.phases) == 4 and recorder.caches == [("c", False)]
+    assert "c cache miss" in caplog.messages and "B scanned=3 matched=1 filter='slow 3'" in caplog.messages
+
+
+def test_filter_text():
+    node = parse_ast("a eq 1")
+    assert filter_text("a eq 1") == "a eq 1"
+    assert filter_text(node) == repr(node)
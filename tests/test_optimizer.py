@@ -0,0 +1,73 @@
+import pytest
+
+import corpus
+from parser import parse_ast
+from parser.nodes import BinOp, BoolOp, Call, Column, Literal
+from parser.optimizer import optimize
+from parser.py_ast_dict import compile_predicate
+
+ROWS = corpus.rows(200, seed=1)
+
+
+def test_optimized_predicates_match_the_unoptimized_ones():
+    checked = changed = 0
+    for filter_string in corpus.filters(3000, seed=10):
+        try:
+            node = parse_ast(filter_string)
+            reference = compile_predicate(node)
+        except Exception:
+            continue
+        optimized = optimize(node)
+        changed += optimized is not node
+        predicate = compile_predicate(optimized)
+        for row in ROWS:
+            assert predicate(row) == reference(row), (filter_string, optimized, row)
+        checked += 1
+    assert checked > 1500 and changed > 500
+
+
+@pytest.mark.parametrize(
+    "filter_string",
+    ["a eq 1 AND a eq 2", "a gt 10 AND a lt 5", "a gt 5 AND a lt 5", "a gt 10 AND a lt 5 AND b eq 1"],
+)
+def test_contradictions_fold_to_false(filter_string):
+    assert optimize(parse_ast(filter_string)) is Literal(False)
+
+
+def test_contradictions_can_be_switched_off():
+    node = parse_ast("a eq 1 AND a eq 2")
+    assert optimize(node, contradictions=False) == BoolOp(
+        "AND", (BinOp("eq", (Column("a"), Literal(1))), BinOp("eq", (Column("a"), Literal(2))))
+    )
+
+
+def test_ranges_merge_to_the_tightest_bounds():
+    assert optimize(parse_ast("a gt 5 AND a lt 25 AND a gt 7 AND a le 30")) == BoolOp(
+        "AND", (BinOp("lt", (Column("a"), Literal(25))), BinOp("gt", (Column("a"), Literal(7))))
+    )
+    # a closed single point is not a contradiction
+    assert optimize(parse_ast("a ge 5 AND a le 5")) == BoolOp(
+        "AND", (BinOp("ge", (Column("a"), Literal(5))), BinOp("le", (Column("a"), Literal(5))))
+    )
+
+
+def test_conjuncts_are_reordered_in_lenient_positions():
+    length = BinOp("gt", (Call("length", (Column("name"),)), Literal(2)))
+    equal = BinOp("eq", (Column("a"), Literal(1)))
+    c_eq_3 = BinOp("eq", (Column("c"), Literal(3)))
+    # the root and the last operand of an OR: raising and False are the same there
+    assert optimize(parse_ast("length(name) gt 2 AND a eq 1")) == BoolOp("AND", (equal, length))
+    assert optimize(parse_ast("c eq 3 OR (length(name) gt 2 AND a eq 1)")) == BoolOp(
+        "OR", (c_eq_3, BoolOp("AND", (equal, length)))
+    )
+
+
+def test_conjuncts_keep_their_order_before_a_later_or_operand():
+    # length() may raise, which must fail the row before `c eq 3` is reached
+    node = parse_ast("(length(name) gt 2 AND a eq 1) OR c eq 3")
+    assert optimize(node) == node
+    # the same holds for range merging: a string `a` raises on `gt`
+    node = parse_ast("(a gt 10 AND a lt 5) OR c eq 3")
+    assert optimize(node) == node
+    row = {"a": "x", "c": 3}
+    assert compile_predicate(optimize(node))(row) == compile_predicate(node)(row)
@@ -0,0 +1,207 @@
+import asyncio
+import random
+
+import pytest
+from sqlalchemy import Integer, String, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from parser.mongodb import MongoDbFilterParser, _include
+from parser.paging import parse_orderby, seek_condition
+from parser.sqlalchemy import SqlAlchemyFilterParser
+
+
+async def _collect(rows) -> list:
+    return [row async for row in rows]
+
+
+def _field(doc, path: str):
+    for part in path.split("."):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def _null_first(value):
+    return (value is not None, value)
+
+
+# -------- seek conditions --------
+def _seek(keys, values):
+    return seek_condition(
+        keys,
+        values,
+        eq=lambda field, value: f"{field} = {value}",
+        after=lambda field, value, descending: f"{field} {'<' if descending else '>'} {value}",
+        all_of=lambda *terms: "(" + " AND ".join(terms) + ")",
+        any_of=lambda *terms: "(" + " OR ".join(terms) + ")",
+        is_null=lambda field: f"{field} IS NULL",
+        not_null=lambda field: f"{field} IS NOT NULL",
+    )
+
+
+def test_seek_condition_is_null_aware():
+    assert _seek([("a", False), ("id", False)], [1, 7]) == "(a > 1 OR (a = 1 AND id > 7))"
+    assert _seek([("a", False), ("id", False)], [None, 7]) == "(a IS NOT NULL OR (a IS NULL AND id > 7))"
+    assert _seek([("a", True), ("id", False)], [1, 7]) == "((a < 1 OR a IS NULL) OR (a = 1 AND id > 7))"
+    # nothing sorts after null in a descending key
+    assert _seek([("a", True), ("id", False)], [None, 7]) == "(a IS NULL AND id > 7)"
+
+
+# -------- MongoDB --------
+def _matches(doc, query) -> bool:
+    # the subset of find() the stream queries use
+    for key, condition in query.items():
+        if key == "$and":
+            ok = all(_matches(doc, part) for part in condition)
+        elif key == "$or":
+            ok = any(_matches(doc, part) for part in condition)
+        else:
+            value = _field(doc, key)
+            if not isinstance(condition, dict):
+                ok = value == condition
+            else:
+                ok = True
+                for op, arg in condition.items():
+                    if op in ("$eq", "$ne"):
+                        ok &= (value == arg) is (op == "$eq")
+                    elif value is None or arg is None:
+                        ok = False
+                    elif op == "$gt":
+                        ok &= value > arg
+                    elif op == "$lt":
+                        ok &= value < arg
+                    elif op == "$gte":
+                        ok &= value >= arg
+                    elif op == "$lte":
+                        ok &= value <= arg
+                    else:
+                        raise ValueError(op)
+        if not ok:
+            return False
+    return True
+
+
+class _Cursor:
+
+    def __init__(self, docs, query, projection):
+        self._docs = [doc for doc in docs if _matches(doc, query)]
+        self._sort = []
+        self._limit = 0
+
+    def sort(self, sort):
+        self._sort = sort
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, _):
+        return self
+
+    def __aiter__(self):
+        docs = list(self._docs)
+        for field, direction in reversed(self._sort):
+            docs.sort(key=lambda doc: _null_first(_field(doc, field)), reverse=direction < 0)
+        return _aiter(docs[: self._limit])
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _Collection:
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.projections = []
+
+    def find(self, query, projection=None):
+        self.projections.append(projection)
+        return _Cursor(self.docs, query, projection)
+
+
+def _mongo_docs():
+    rng = random.Random(2)
+    docs = []
+    for i in range(120):
+        doc = {"_id": i, "data": {"ts": rng.choice([None, 1, 2, 3, 4])}, "n": i % 7}
+        if rng.random() < 0.2:
+            del doc["data"]["ts"]
+        docs.append(doc)
+    return docs
+
+
+@pytest.mark.parametrize("orderby", ["data.ts", "data.ts desc", "data.ts desc, n", "n, data.ts desc"])
+def test_mongo_stream_keeps_rows_with_null_sort_keys(orderby):
+    docs = _mongo_docs()
+    streamed = asyncio.run(_collect(MongoDbFilterParser().stream(_Collection(docs), "n ge 0", orderby=orderby, page_size=7)))
+    assert sorted(doc["_id"] for doc in streamed) == list(range(len(docs)))
+    expected = list(docs)
+    for field, descending in reversed(parse_orderby(orderby) + [("_id", False)]):
+        expected.sort(key=lambda doc: _null_first(_field(doc, field)), reverse=descending)
+    assert [doc["_id"] for doc in streamed] == [doc["_id"] for doc in expected]
+
+
+def test_mongo_stream_projection_has_no_path_collisions():
+    collection = _Collection(_mongo_docs())
+    parser = MongoDbFilterParser()
+    asyncio.run(_collect(parser.stream(collection, "n ge 0", orderby="data.ts", projection={"data": 1})))
+    assert collection.projections[0] == {"data": 1, "_id": 1}
+    assert _include({"data.ts": 1, "n": 1}, ["data", "_id"]) == {"n": 1, "data": 1, "_id": 1}
+    assert _include({"data.ts": 0}, ["n"]) == {"data.ts": 0, "n": 1}
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(parser.stream(collection, "n ge 0", orderby="data.ts", projection={"data": 0})))
+
+
+# -------- SQLAlchemy --------
+class _Base(DeclarativeBase):
+    pass
+
+
+class Row(_Base):
+    __tablename__ = "paging_rows"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    score: Mapped[int | None] = mapped_column(Integer)
+    name: Mapped[str | None] = mapped_column(String)
+
+
+class _Result:
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def unique(self):
+        return self
+
+    def __aiter__(self):
+        return _aiter(self._rows)
+
+
+class _AsyncSession:
+    # just enough of AsyncSession over a synchronous Session
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    async def stream_scalars(self, statement, params=None):
+        return _Result(self._session.execute(statement, params).unique().scalars().all())
+
+
+@pytest.mark.parametrize("orderby", ["score", "score desc", "score desc, name", "name, score desc"])
+def test_sql_stream_keeps_rows_with_null_sort_keys(orderby):
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    rng = random.Random(4)
+    with Session(engine) as session:
+        session.add_all(
+            Row(id=i, score=rng.choice([None, 1, 2, 3]), name=rng.choice([None, "a", "b"])) for i in range(90)
+        )
+        session.commit()
+        parser = SqlAlchemyFilterParser(Row)
+        streamed = asyncio.run(_collect(parser.stream(_AsyncSession(session), "id ge 0", orderby=orderby, page_size=6)))
+        rows = list(session.execute(select(Row)).scalars())
+    assert sorted(row.id for row in streamed) == list(range(90))
+    for field, descending in reversed(parse_orderby(orderby) + [("id", False)]):
+        rows.sort(key=lambda row: _null_first(getattr(row, field)), reverse=descending)
+    assert [row.id for row in streamed] == [row.id for row in rows]
@@ -0,0 +1,100 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import corpus
+from parser.columnar import ColumnarFilterParser
+from parser.parallel import ParallelFilterParser
+from parser.py_ast_dict import DictASTFilterParser, DSLParseError
+
+ROWS = corpus.rows(300, seed=70)
+N = 400
+COLUMN_FILTERS = [
+    "i gt 3 AND f lt 2.5",
+    "s eq 'bb' OR t eq true",
+    "m eq null OR m ge 2",
+    "o eq 'x' OR o gt 1",
+    "u startswith 'a' AND length(u) gt 1",
+    "d lt 5 AND s ne 'a'",
+    "length(s) eq 2 OR i mul 2 gt 7",
+]
+
+
+@pytest.fixture(scope="module")
+def parallel():
+    # chunks of 37 rows over two worker processes, whatever the input size
+    with ParallelFilterParser(max_workers=2, serial_threshold=0, chunk_size=37) as parser:
+        yield parser
+
+
+@pytest.fixture(scope="module")
+def columns(tmp_path_factory):
+    rng = np.random.default_rng(71)
+    path = tmp_path_factory.mktemp("parallel") / "d.bin"
+    disk = np.memmap(path, dtype=np.int64, mode="w+", shape=(N,))
+    disk[:] = rng.integers(0, 10, N)
+    disk.flush()
+    words = np.array(["a", "bb", "ab", "ccc", ""])[rng.integers(0, 5, N)]
+    return {
+        "i": rng.integers(0, 10, N),
+        "f": rng.normal(2, 1, N),
+        "t": rng.random(N) < 0.5,
+        "s": words,
+        "m": np.ma.MaskedArray(rng.integers(0, 5, N), mask=rng.random(N) < 0.2),
+        "o": np.array([[None, "x", 1, 2.5, [1]][k] for k in rng.integers(0, 5, N)], dtype=object),
+        "u": words.astype(np.dtypes.StringDType()),
+        "d": np.memmap(path, dtype=np.int64, mode="r", shape=(N,)),
+    }
+
+
+def _shm() -> set[str]:
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+def test_rows_match_the_serial_backend(parallel):
+    python = DictASTFilterParser()
+    checked = 0
+    for filter_string in corpus.filters(60, seed=72):
+        try:
+            expected = python.apply_filter(filter_string, ROWS)
+        except Exception:
+            continue
+        result = parallel.apply_filter(filter_string, ROWS)
+        assert len(result) == len(expected) and all(a is b for a, b in zip(result, expected)), filter_string
+        checked += 1
+    assert checked > 20
+
+
+@pytest.mark.parametrize("filter_string", COLUMN_FILTERS)
+def test_columns_match_the_serial_backend(parallel, columns, filter_string):
+    before = _shm()
+    expected = ColumnarFilterParser().mask(filter_string, columns)
+    assert parallel.mask(filter_string, columns).tolist() == expected.tolist()
+    assert parallel.indices(filter_string, columns).tolist() == np.flatnonzero(expected).tolist()
+    # every shared segment is unlinked again
+    assert _shm() <= before
+
+
+def test_column_results_keep_masks(parallel, columns):
+    result = parallel.apply_filter("i gt 3", columns)
+    expected = ColumnarFilterParser().apply_filter("i gt 3", columns)
+    assert result.keys() == expected.keys()
+    for key in columns:
+        assert np.ma.getmaskarray(result[key]).tolist() == np.ma.getmaskarray(expected[key]).tolist()
+        assert result[key].tolist() == expected[key].tolist()
+
+
+def test_parse_errors_surface_in_the_caller(parallel):
+    with pytest.raises(DSLParseError):
+        parallel.apply_filter("a eq", ROWS)
+
+
+def test_small_inputs_stay_serial_and_injected_executors_stay_open():
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        parser = ParallelFilterParser(executor=executor, serial_threshold=100, chunk_size=10)
+        assert parser.apply_filter("a eq 1", ROWS[:50]) == DictASTFilterParser().apply_filter("a eq 1", ROWS[:50])
+        assert parser.apply_filter("a eq 1", ROWS) == DictASTFilterParser().apply_filter("a eq 1", ROWS)
+        parser.close()
+        assert executor.submit(int, "7").result() == 7
@@ -0,0 +1,129 @@
+import random
+
+import pytest
+
+from parser import _ASTBuilder, get_grammar
+from parser.nodes import OPERATORS
+from parser.pratt import FastPathError, get_pratt_grammar
+
+# The fast path must build exactly pyparsing's tree for everything it accepts and leave
+# everything else to pyparsing.
+
+MAIN_FILTERS = [
+    "duration gt 20 AND duration lt 100 AND call_id endswith '100'",
+    "type eq 'TRANSFER'",
+    "field1 gt 5 AND field1 lt 25",
+    "name startswith 'alp' OR name like 'mm'",
+    "name in ['alpha','delta']",
+    "tags has 'y'",
+    "nested.value eq 10",
+]
+
+EDGE_FILTERS = [
+    "name in ['a', 'b']",
+    "f(a, 'x', 2024-01-02) eq 1",
+    'a eq "q\\"x"',
+    "a eq 2024-1-2",
+    "a eq 1.2.3",
+    "(a eq 1)",
+    "((a eq 1) AND (b eq 2)) OR c eq 3",
+    "a eq 1 AND (b eq 2 OR c eq 3) AND d eq 4",
+    "substring(s, 1, 2) eq 'x'",
+    "a eq b.c",
+    "a eq 'it''s'",
+    "a eq [x, 'y']",
+    "a eqb",
+    "a  eq  1  AND  b eq 2",
+    "a eq 1ANDb eq 2",
+    "f() eq 1",
+    "tags hasNot 'x'",
+    "length(tolower(name)) gt 2",
+    "a eq 1 AND",
+]
+
+_COLUMNS = ["a", "b", "s", "n.v", "tags", "missing"]
+_LITERALS = ["1", "2", "0", "2.5", "'x'", "'ab'", "''", "null", "true", "false", "2024-01-02"]
+_FUNCTIONS = ["length", "tolower", "toupper", "trim", "round", "floor", "ceiling", "year"]
+_CONDITIONS = "eq ne gt lt ge le like startswith endswith has contains lacks in add sub mul div mod".split()
+
+
+def _operand(rng: random.Random) -> str:
+    r = rng.random()
+    if r < 0.55:
+        return rng.choice(_COLUMNS)
+    if r < 0.9:
+        return rng.choice(_LITERALS)
+    if r < 0.97:
+        return f"{rng.choice(_FUNCTIONS)}({rng.choice(_COLUMNS)})"
+    # nested calls: the fast path rejects them and the fallback must raise pyparsing's error
+    return f"{rng.choice(_FUNCTIONS)}({rng.choice(_FUNCTIONS)}({rng.choice(_COLUMNS)}))"
+
+
+def _expression(rng: random.Random, depth: int = 0) -> str:
+    if depth > 2 or rng.random() < 0.4:
+        return f"{_operand(rng)} {rng.choice(_CONDITIONS)} {_operand(rng)}"
+    parts = [_expression(rng, depth + 1) for _ in range(rng.randint(2, 4))]
+    parts = [f"({part})" if rng.random() < 0.5 else part for part in parts]
+    return rng.choice([" AND ", " OR "]).join(parts)
+
+
+def _generated(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [_expression(rng) for _ in range(count)]
+
+
+CORPUS = MAIN_FILTERS + EDGE_FILTERS + _generated(2000)
+
+
+def _pyparsing_tree(filter_string: str) -> list | None:
+    try:
+        tree = get_grammar(OPERATORS).parse_string(filter_string).asList()
+    except Exception:
+        return None
+    # the top-level group pyparsing wraps a single expression in
+    return tree[0] if len(tree) == 1 else tree
+
+
+def test_fast_path_trees_match_pyparsing():
+    fast = get_pratt_grammar(OPERATORS)
+    accepted = 0
+    for filter_string in CORPUS:
+        try:
+            tree = fast.parse(filter_string)
+        except FastPathError:
+            continue
+        accepted += 1
+        assert tree == _pyparsing_tree(filter_string), filter_string
+    # the corpus must actually exercise the fast path
+    assert accepted > len(CORPUS) // 2
+
+
+@pytest.mark.parametrize("filter_string", MAIN_FILTERS)
+def test_main_filters_take_the_fast_path(filter_string):
+    _, fast = _ASTBuilder()._parse_tree(filter_string)
+    assert fast
+
+
+def test_rejected_filters_fall_back_to_pyparsing():
+    builder = _ASTBuilder()
+    reference = _ASTBuilder()
+    reference.fast_grammar = None
+    rejected = 0
+    for filter_string in CORPUS:
+        try:
+            builder.fast_grammar.parse(filter_string)
+        except FastPathError:
+            pass
+        else:
+            continue
+        rejected += 1
+        try:
+            expected = reference.parse(filter_string)
+        except Exception as e:
+            with pytest.raises(type(e)):
+                builder.parse(filter_string)
+            continue
+        tree, fast = builder._parse_tree(filter_string)
+        assert not fast, filter_string
+        assert builder.parse(filter_string) == expected, filter_string
+    assert rejected
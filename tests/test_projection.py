@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import ForeignKey, Integer, String, create_engine, inspect, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+
+from parser import parse_select
+from parser.mongodb import MongoDbFilterParser
+from parser.py_ast_dict import DictASTFilterParser, DSLParseError
+from parser.sqlalchemy import SqlAlchemyFilterParser
+
+ROWS = [
+    {"id": 1, "name": "a", "data": {"kind": "x", "size": 3}},
+    {"id": 2, "name": "b", "data": {"kind": "y"}},
+    {"id": 3, "data": None},
+]
+
+
+def test_select_lists_parse_to_unique_paths():
+    assert parse_select("name, data.kind") == ("name", "data.kind")
+    assert parse_select(["name", "data.kind, name"]) == ("name", "data.kind")
+    with pytest.raises(ValueError):
+        parse_select("name,, id")
+
+
+# -------- dicts --------
+def test_dict_projection_shapes():
+    python = DictASTFilterParser()
+    assert [python.create_projection("name, data.kind")(row) for row in ROWS] == [
+        {"name": "a", "data.kind": "x"},
+        {"name": "b", "data.kind": "y"},
+        {"name": None, "data.kind": None},
+    ]
+    assert python.create_projection("data.size, id", as_tuple=True)(ROWS[0]) == (3, 1)
+    assert python.apply_filter("id gt 1", ROWS, fields="id") == [{"id": 2}, {"id": 3}]
+    assert list(python.iter_filter("id ge 1", ROWS, top=1, fields=["name"])) == [{"name": "a"}]
+    with pytest.raises(DSLParseError):
+        python.create_projection("name, 1st")
+
+
+# -------- MongoDB --------
+def test_mongo_projection_drops_paths_under_an_included_parent():
+    mongo = MongoDbFilterParser()
+    assert mongo.create_projection("name, data.kind") == {"name": 1, "data.kind": 1}
+    assert mongo.create_projection("data.kind, data, name") == {"data": 1, "name": 1}
+    assert mongo.create_projection(["data.kind", "data.size"]) == {"data.kind": 1, "data.size": 1}
+
+
+# -------- SQLAlchemy --------
+class _Base(DeclarativeBase):
+    pass
+
+
+class Owner(_Base):
+    __tablename__ = "projection_owners"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    label: Mapped[str] = mapped_column(String)
+    note: Mapped[str | None] = mapped_column(String)
+
+
+class Part(_Base):
+    __tablename__ = "projection_parts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    doc_id: Mapped[int] = mapped_column(ForeignKey("projection_docs.id"))
+    title: Mapped[str] = mapped_column(String)
+    body: Mapped[str | None] = mapped_column(String)
+
+
+class Doc(_Base):
+    __tablename__ = "projection_docs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    size: Mapped[int | None] = mapped_column(Integer)
+    owner_id: Mapped[int | None] = mapped_column(ForeignKey("projection_owners.id"))
+    owner: Mapped[Owner | None] = relationship(lazy="joined")
+    parts: Mapped[list[Part]] = relationship(lazy="selectin")
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Doc(id=1, name="d1", size=3, owner=Owner(id=1, label="o", note="n"), parts=[Part(id=1, title="t")]))
+        session.add(Doc(id=2, name="d2", parts=[Part(id=2, title="u", body="b")]))
+        session.commit()
+        yield session
+
+
+def _attributes(instance) -> list[str]:
+    state = inspect(instance)
+    return sorted(set(state.attrs.keys()) - state.unloaded)
+
+
+def _loaded(session: Session, fields: str) -> list[tuple]:
+    # the attributes each loaded Doc (and its loaded relations) holds without further SQL
+    session.expunge_all()
+    parser = SqlAlchemyFilterParser(Doc)
+    shapes = []
+    for doc in session.execute(parser.add_select(fields, select(Doc).order_by(Doc.id))).unique().scalars():
+        loaded = _attributes(doc)
+        shapes.append((loaded, _attributes(doc.parts[0]) if "parts" in loaded else None))
+    return shapes
+
+
+def test_sql_projection_loads_only_the_selected_columns(session):
+    # the primary key always comes along; unnamed relationships are not loaded at all
+    assert _loaded(session, "name") == [(["id", "name"], None)] * 2
+    assert _loaded(session, "name, size") == [(["id", "name", "size"], None)] * 2
+
+
+def test_sql_projection_follows_named_relationships(session):
+    assert _loaded(session, "name, parts.title") == [(["id", "name", "parts"], ["id", "title"])] * 2
+    # a bare relationship keeps its configured loading, with every column
+    assert _loaded(session, "parts") == [(["id", "parts"], ["body", "doc_id", "id", "title"])] * 2
+    assert _loaded(session, "owner.label")[0][0] == ["id", "owner"]
+
+
+def test_sql_projection_rejects_unknown_fields():
+    parser = SqlAlchemyFilterParser(Doc)
+    for fields in ("missing", "name.kind", "parts.missing"):
+        with pytest.raises(ValueError):
+            parser.create_projection(fields)
+
+
+def test_select_columns_returns_plain_rows(session):
+    parser = SqlAlchemyFilterParser(Doc)
+    query = parser.add_filter("size eq null OR size gt 1", parser.select_columns("id, name").order_by(Doc.id))
+    assert [tuple(row) for row in session.execute(query)] == [(1, "d1"), (2, "d2")]
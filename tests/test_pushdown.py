@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import Integer, String, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+import corpus
+from parser import parse_ast
+from parser.mongodb import MongoDbFilterParser
+from parser.nodes import BinOp, BoolOp, Call, Column, Literal
+from parser.py_ast_dict import DictASTFilterParser, compile_predicate
+from parser.sqlalchemy import SqlAlchemyFilterParser
+
+ROWS = corpus.rows(200, seed=60)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class Entry(_Base):
+    __tablename__ = "pushdown_entries"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    a: Mapped[int] = mapped_column(Integer)
+    name: Mapped[str] = mapped_column(String)
+
+    @property
+    def slug(self) -> str:
+        # not a column, so never pushed to SQL
+        return f"{self.name}-{self.a}"
+
+
+@pytest.mark.parametrize("parser", [MongoDbFilterParser(), SqlAlchemyFilterParser(Entry)], ids=["mongodb", "sqlalchemy"])
+def test_pushed_and_residual_equal_the_full_filter(parser):
+    # the pushed part runs in the backend, where a row that would raise in Python has no
+    # equivalent; those rows are left out, on all others pushed AND residual must be the
+    # full filter
+    split = checked = 0
+    for filter_string in corpus.filters(1500, seed=61, columns=["a", "name", "b.a", "n", "tags"]):
+        try:
+            full = compile_predicate(parse_ast(filter_string))
+        except Exception:
+            continue
+        pushed, residual = parser.split_filter(filter_string)
+        assert pushed is not None or residual is not None
+        in_backend = compile_predicate(pushed, guarded=False) if pushed is not None else lambda row: True
+        in_python = compile_predicate(residual) if residual is not None else lambda row: True
+        for row in ROWS:
+            try:
+                prefiltered = bool(in_backend(row))
+            except Exception:
+                continue
+            assert (prefiltered and in_python(row)) == full(row), (filter_string, pushed, residual, row)
+            checked += 1
+        split += pushed is not None and residual is not None
+    assert split > 50 and checked > 50_000
+
+
+def test_split_shapes():
+    mongo = MongoDbFilterParser()
+    a_gt_1 = BinOp("gt", (Column("a"), Literal(1)))
+    length = BinOp("gt", (Call("length", (Column("name"),)), Literal(2)))
+    assert mongo.split_filter("a gt 1") == (a_gt_1, None)
+    assert mongo.split_filter("length(name) gt 2") == (None, length)
+    assert mongo.split_filter("a gt 1 AND length(name) gt 2") == (a_gt_1, length)
+    # an OR is pushed as the supported condition it implies, and kept whole in the residual
+    either = parse_ast("(a gt 1 AND length(name) gt 2) OR a eq 0")
+    assert mongo.split_filter(either) == (
+        BoolOp("OR", (a_gt_1, BinOp("eq", (Column("a"), Literal(0))))),
+        either,
+    )
+    assert mongo.split_filter("length(name) gt 2 OR a eq 0") == (None, parse_ast("length(name) gt 2 OR a eq 0"))
+
+
+def test_mongo_hybrid_filter():
+    mongo = MongoDbFilterParser()
+    query, predicate = mongo.create_hybrid_filter("a gt 1 AND length(name) gt 2")
+    assert query == {"a": {"$gt": 1}}
+    assert [predicate(row) for row in ({"name": "abc"}, {"name": "ab"})] == [True, False]
+    assert mongo.create_hybrid_filter("a gt 1") == ({"a": {"$gt": 1}}, None)
+
+
+@pytest.mark.parametrize(
+    "filter_string",
+    [
+        "a lt 30",
+        "a lt 30 AND slug endswith '-7'",
+        "slug startswith 'n1' OR a eq 3",
+        "(a gt 10 AND slug like '2') OR a lt 3",
+        "length(slug) gt 6 AND name ne 'n5'",
+    ],
+)
+def test_sql_hybrid_filter_matches_python(filter_string):
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(Entry(id=i, a=i % 40, name=f"n{i % 13}") for i in range(120))
+        session.commit()
+        parser = SqlAlchemyFilterParser(Entry)
+        query, predicate = parser.add_hybrid_filter(filter_string, select(Entry).order_by(Entry.id))
+        loaded = list(session.execute(query).scalars())
+        hybrid = [entry.id for entry in loaded if predicate is None or predicate(entry)]
+        entries = list(session.execute(select(Entry).order_by(Entry.id)).scalars())
+        expected = [entry.id for entry in DictASTFilterParser().apply_filter(filter_string, entries)]
+    assert hybrid == expected
+    assert len(loaded) < 120 or predicate is None or "OR" in filter_string
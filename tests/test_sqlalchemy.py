@@ -0,0 +1,115 @@
+import random
+
+import pytest
+from sqlalchemy import ForeignKey, Integer, String, bindparam, create_engine, select
+from sqlalchemy.exc import CompileError
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+
+from parser.sqlalchemy import SqlAlchemyFilterParser
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class Tag(_Base):
+    __tablename__ = "tags"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id"))
+    label: Mapped[str] = mapped_column(String)
+
+
+class Item(_Base):
+    __tablename__ = "items"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str | None] = mapped_column(String)
+    duration: Mapped[int | None] = mapped_column(Integer)
+    tags: Mapped[list[Tag]] = relationship()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    rng = random.Random(0)
+    with Session(engine) as session:
+        for i in range(60):
+            session.add(
+                Item(
+                    id=i,
+                    name=rng.choice([None, f"name{i}", f"alpha{i % 7}", "Beta"]),
+                    duration=rng.choice([None, i, i * 3 % 50]),
+                    tags=[Tag(id=i * 2 + j, label=f"t{(i + j) % 4}") for j in range(i % 3)],
+                )
+            )
+        session.commit()
+    return engine
+
+
+def _ids(session: Session, statement) -> list[int]:
+    return sorted(item.id for item in session.execute(statement).scalars())
+
+
+# -------- bind-parameter mode --------
+_COLUMNS = ["id", "duration", "name"]
+_VALUES = ["0", "5", "17", "40", "'alpha'", "'name1'", "'Beta'", "null"]
+_OPERATORS = ["eq", "ne", "gt", "lt", "ge", "le", "like", "startswith", "endswith"]
+
+
+def _bound_filters(count: int) -> list[str]:
+    rng = random.Random(3)
+    filters = ["length(name) gt 5", "name contains 'name1, name2'", "duration gt 10 AND name lacks 'Beta'"]
+    for _ in range(count):
+        conditions = []
+        for _ in range(rng.randint(1, 3)):
+            operator = rng.choice(_OPERATORS)
+            column = "name" if operator in ("like", "startswith", "endswith") else rng.choice(_COLUMNS)
+            value = rng.choice(_VALUES[4:7]) if column == "name" else rng.choice(_VALUES[:4])
+            if operator in ("eq", "ne") and rng.random() < 0.1:
+                value = "null"
+            conditions.append(f"{column} {operator} {value}")
+        filters.append(f" {rng.choice(['AND', 'OR'])} ".join(conditions))
+    return filters
+
+
+def _rendered(statement, engine) -> str | None:
+    try:
+        return str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    except CompileError:
+        return None  # untyped parameters, e.g. compared with a function call
+
+
+def test_bound_queries_match_the_literal_ones(engine):
+    bound = SqlAlchemyFilterParser(Item, bind_params=True)
+    literal = SqlAlchemyFilterParser(Item)
+    rendered = 0
+    filters = _bound_filters(200)
+    with Session(engine) as session:
+        for filter_string in filters:
+            with_params = bound.add_filter(filter_string, select(Item))
+            plain = literal.add_filter(filter_string, select(Item))
+            assert _ids(session, with_params) == _ids(session, plain), filter_string
+            text = _rendered(with_params, engine)
+            if text is not None:
+                assert text == _rendered(plain, engine), filter_string
+                rendered += 1
+            statement, params = bound.prepared_select(filter_string)
+            assert sorted(item.id for item in session.execute(statement, params).scalars()) == _ids(session, plain)
+    assert rendered > 100
+    # one compiled clause per shape
+    assert bound.shape_cache.info().size < len(set(filters))
+
+
+def test_bound_parameters_do_not_collide_with_the_callers(engine):
+    parser = SqlAlchemyFilterParser(Item, bind_params=True)
+    _, params = parser.prepared_select("id lt 50")
+    assert list(params) == ["_funnel_p0"]
+    query = select(Item).where(Item.id == bindparam("p0"))
+    with Session(engine) as session:
+        assert _ids(session, parser.add_filter("id lt 50", query).params(p0=5)) == [5]
+
+
+def test_parameter_prefix_is_configurable():
+    parser = SqlAlchemyFilterParser(Item, bind_params=True, param_prefix="f_")
+    _, params = parser.create_parameterized_filter("id eq 1 AND name eq 'x'")
+    assert params == {"f_0": 1, "f_1": "x"}
@@ -0,0 +1,92 @@
+import corpus
+import parser.store as store_module
+from parser import parse_ast
+from parser.py_ast_dict import DictASTFilterParser, compile_predicate
+from parser.store import FilterStore, grammar_version, read_manifest, warm
+
+ROWS = corpus.rows(100, seed=80)
+FILTERS = ["a eq 1", "name like 'al' OR b.a gt 2", "length(name) ge 3 AND tags has 'x'", "n eq null"]
+
+
+def _saved(tmp_path) -> FilterStore:
+    store = FilterStore(tmp_path / "filters.store")
+    store.update(FILTERS)
+    store.save()
+    return store
+
+
+def test_round_trip_installs_working_predicates(tmp_path):
+    _saved(tmp_path)
+    store = FilterStore(tmp_path / "filters.store")
+    assert store.load() and len(store) == len(FILTERS)
+    assert all(filter_string in store for filter_string in FILTERS)
+    assert "a  eq 1" in store  # canonical form
+    parser = DictASTFilterParser()
+    assert store.install(parser) == len(FILTERS)
+    for filter_string in FILTERS:
+        reference = compile_predicate(parse_ast(filter_string))
+        predicate = parser.create_predicate(filter_string)
+        assert [predicate(row) for row in ROWS] == [reference(row) for row in ROWS]
+    assert parser.cache.info().misses == 0
+
+
+def test_round_trip_installs_shapes(tmp_path):
+    _saved(tmp_path)
+    store = FilterStore(tmp_path / "filters.store")
+    store.load()
+    parser = DictASTFilterParser(shapes=True)
+    store.install(parser)
+    # same shape as a stored filter, other literals
+    predicate = parser.create_predicate("a eq 5")
+    assert [predicate(row) for row in ROWS] == [row.get("a") == 5 for row in ROWS]
+    assert parser.cache.info().misses == 0
+
+
+def test_a_new_grammar_version_invalidates_the_store(tmp_path, monkeypatch):
+    _saved(tmp_path)
+    monkeypatch.setattr(store_module, "grammar_version", lambda: "another grammar")
+    store = FilterStore(tmp_path / "filters.store")
+    assert not store.load() and len(store) == 0
+
+
+def test_grammar_version_follows_the_store_format(monkeypatch):
+    current = grammar_version()
+    monkeypatch.setattr(store_module, "STORE_FORMAT", store_module.STORE_FORMAT + 1)
+    grammar_version.cache_clear()
+    try:
+        assert grammar_version() != current
+    finally:
+        monkeypatch.undo()
+        grammar_version.cache_clear()
+    assert grammar_version() == current
+
+
+def test_missing_and_corrupt_files_load_nothing(tmp_path):
+    assert not FilterStore(tmp_path / "missing.store").load()
+    (tmp_path / "corrupt.store").write_bytes(b"not a pickle")
+    assert not FilterStore(tmp_path / "corrupt.store").load()
+
+
+def test_warm_compiles_only_what_the_store_lacks(tmp_path, monkeypatch):
+    manifest = tmp_path / "filters.txt"
+    manifest.write_text("# hot filters\n\n" + "\n".join(FILTERS[:2]) + "\n")
+    assert read_manifest(manifest) == FILTERS[:2]
+    path = tmp_path / "warm.store"
+    assert len(warm(path, manifest)) == 2
+    added = []
+    add = FilterStore.add
+
+    def counted(self, filter_string):
+        added.append(filter_string)
+        add(self, filter_string)
+
+    monkeypatch.setattr(FilterStore, "add", counted)
+    parser = DictASTFilterParser()
+    store = warm(path, FILTERS, parser=parser)
+    assert added == FILTERS[2:] and len(store) == len(FILTERS)
+    assert parser.cache.info().size == len(FILTERS)
+    # a store written for another grammar is rebuilt from the manifest
+    monkeypatch.setattr(store_module, "grammar_version", lambda: "another grammar")
+    added.clear()
+    warm(path, FILTERS)
+    assert added == FILTERS
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+import corpus
+from parser.indexed import IndexedCollection
+from parser.py_ast_dict import DictASTFilterParser
+from parser.views import ADDED, CHANGED, REMOVED, FilterView
+
+FILTERS = [
+    "a eq 1",
+    "a gt 1 AND name like 'a'",
+    "b.a ge 1 OR tags has 'x'",
+    "length(name) gt 2",
+    "n eq null",
+    "b.b.a lt 5 AND a ne 0",
+]
+
+
+def _parsable(filters: list[str]) -> list[str]:
+    python = DictASTFilterParser()
+    parsed = []
+    for filter_string in filters:
+        try:
+            python.create_predicate(filter_string)
+        except Exception:
+            continue
+        parsed.append(filter_string)
+    return parsed
+
+
+def _changed(old: dict, new: dict) -> list[str]:
+    missing = object()
+    changed = []
+    for key in old.keys() | new.keys():
+        a, b = old.get(key, missing), new.get(key, missing)
+        if type(a) is not type(b) or a != b:
+            changed.append(key)
+    return changed
+
+
+def _mutate(rng: random.Random, row: dict) -> dict:
+    # a fresh row, or the old one with a single top-level field replaced or dropped
+    if rng.random() < 0.4:
+        return corpus.random_row(rng)
+    row = dict(row)
+    key = rng.choice(["a", "b", "name", "tags", "n"])
+    if rng.random() < 0.2:
+        row.pop(key, None)
+    else:
+        row[key] = corpus.random_row(rng) if key == "b" else rng.choice(corpus.VALUES)
+    return row
+
+
+@pytest.mark.parametrize("filter_string", FILTERS + _parsable(corpus.filters(30, seed=50)))
+@pytest.mark.parametrize("name_changes", [False, True])
+def test_view_contents_follow_inserts_updates_and_deletes(filter_string, name_changes):
+    rng = random.Random(51)
+    predicate = DictASTFilterParser().create_predicate(filter_string)
+    rows = dict(enumerate(corpus.rows(50, seed=52)))
+    view = FilterView(filter_string, rows)
+    mirror = dict(view.items())
+
+    def listen(event, key, row):
+        assert (event == ADDED) == (key not in mirror)
+        if event == REMOVED:
+            del mirror[key]
+        else:
+            assert event in (ADDED, CHANGED)
+            mirror[key] = row
+
+    view.subscribe(listen)
+    for step in range(300):
+        r = rng.random()
+        if r < 0.25 or not rows:
+            key = 1000 + step
+            rows[key] = corpus.random_row(rng)
+            view.insert(key, rows[key])
+        elif r < 0.4:
+            key = rng.choice(list(rows))
+            del rows[key]
+            view.delete(key)
+        else:
+            key = rng.choice(list(rows))
+            old, rows[key] = rows[key], _mutate(rng, rows[key])
+            view.update(key, rows[key], _changed(old, rows[key]) if name_changes else None)
+        expected = {key: row for key, row in rows.items() if predicate(row)}
+        assert dict(view.items()) == expected, (filter_string, step)
+    assert mirror == dict(view.items())
+
+
+def test_collection_views_follow_the_collection():
+    rng = random.Random(53)
+    collection = IndexedCollection(corpus.rows(100, seed=54))
+    collection.create_index("a", "hash")
+    views = [collection.create_view(filter_string) for filter_string in FILTERS]
+    for _ in range(300):
+        r = rng.random()
+        if r < 0.3:
+            collection.insert(corpus.random_row(rng))
+        elif r < 0.45:
+            collection.delete(rng.choice(list(collection.keys())))
+        else:
+            key = rng.choice(list(collection.keys()))
+            collection.update(key, _mutate(rng, collection[key]))
+    for view, filter_string in zip(views, FILTERS):
+        expected = DictASTFilterParser().apply_filter(filter_string, collection)
+        assert view.keys() <= collection.keys()
+        assert [collection[key] for key in sorted(view.keys())] == expected, filter_string
+
+
+def test_duplicate_and_unknown_keys_are_rejected():
+    view = FilterView("a eq 1", {1: {"a": 1}})
+    with pytest.raises(KeyError):
+        view.insert(1, {"a": 1})
+    with pytest.raises(KeyError):
+        view.update(2, {"a": 1})